@@ -3,6 +3,13 @@ ASGI config for asistencia_app project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+The live session stream (``attendance:session_events``) keeps its connections
+open only when served through this module, e.g.::
+
+    uvicorn asistencia_app.asgi:application
+
+Under WSGI it answers with the current state and lets the browser reconnect.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/6.0/howto/deployment/asgi/
 """
@@ -43,6 +43,8 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
+    'attendance.tenancy.CourseMiddleware',
+    'attendance.metrics.MetricsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -55,7 +57,7 @@ ROOT_URLCONF = 'asistencia_app.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'attendance.metrics.InstrumentedDjangoTemplates',
         'DIRS': [],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -63,6 +65,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'attendance.tenancy.course',
             ],
         },
     },
@@ -74,6 +77,21 @@ WSGI_APPLICATION = 'asistencia_app.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/6.0/ref/settings/#databases
 
+# SQLite ajustado para escrituras concurrentes: WAL permite leer mientras se
+# escribe, las transacciones empiezan con BEGIN IMMEDIATE (toman el bloqueo de
+# escritura al inicio y esperan en busy_timeout en lugar de fallar con
+# "database is locked") y las conexiones se reutilizan entre peticiones.
+# ATTENDANCE_SQLITE_TUNING=0 vuelve a la configuración por defecto de Django.
+
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 20000,          # milisegundos
+    'cache_size': -20000,           # negativo = KiB (~20 MB)
+    'mmap_size': 128 * 1024 * 1024,
+    'temp_store': 'MEMORY',
+}
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
@@ -81,6 +99,154 @@ DATABASES = {
     }
 }
 
+SQLITE_TUNING = {
+    'CONN_MAX_AGE': 600,
+    'CONN_HEALTH_CHECKS': True,
+    'OPTIONS': {
+        'transaction_mode': 'IMMEDIATE',
+        'timeout': SQLITE_PRAGMAS['busy_timeout'] / 1000,
+        'init_command': ';'.join(
+            f'PRAGMA {name} = {value}' for name, value in SQLITE_PRAGMAS.items()
+        ),
+    },
+}
+
+# Bases de datos por curso (attendance.tenancy): un curso grande puede vivir
+# en su propio archivo SQLite. ATTENDANCE_COURSE_DATABASES="alias=ruta,..."
+# declara los alias; el comando move_course copia un curso a uno de ellos.
+
+for entry in filter(None, os.environ.get('ATTENDANCE_COURSE_DATABASES', '').split(',')):
+    alias, _, path = entry.partition('=')
+    DATABASES[alias.strip()] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': path.strip(),
+    }
+
+DATABASE_ROUTERS = ['attendance.tenancy.CourseRouter']
+
+if os.environ.get('ATTENDANCE_SQLITE_TUNING', '1') != '0':
+    for database in DATABASES.values():
+        database.update(SQLITE_TUNING)
+
+# Curso que se muestra a quien no eligió uno (código); por defecto el primero
+ATTENDANCE_DEFAULT_COURSE = os.environ.get('ATTENDANCE_DEFAULT_COURSE', 'general')
+
+
+# Cache
+# https://docs.djangoproject.com/en/6.0/topics/cache/
+# Caché en memoria local por defecto; definir ATTENDANCE_CACHE_DIR para usar
+# un caché en disco compartido entre procesos.
+#
+# Las versiones de attendance.caching (de las que dependen las páginas
+# cacheadas, la lista de estudiantes y los mapas de bits) viven siempre en el
+# caché 'versions', en disco y compartido por todos los procesos: App Service
+# puede correr varios workers y un cambio hecho en uno debe invalidar lo que
+# guardan los demás en su memoria. Son pocas llaves pequeñas y no expiran.
+
+if os.environ.get('ATTENDANCE_CACHE_DIR'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.environ['ATTENDANCE_CACHE_DIR'],
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'asistencia',
+        }
+    }
+
+CACHES['versions'] = {
+    'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+    'LOCATION': os.environ.get('ATTENDANCE_VERSION_CACHE_DIR', os.path.join(BASE_DIR, 'cache', 'versions')),
+    'TIMEOUT': None,
+    'OPTIONS': {
+        # Una llave por sesión y estudiante con páginas cacheadas
+        'MAX_ENTRIES': 100_000,
+    },
+}
+
+# Tiempo de vida (segundos) de las páginas cacheadas por attendance.caching
+ATTENDANCE_CACHE_TIMEOUT = 60 * 60
+
+
+# Logging
+# Los loggers de attendance (peticiones lentas, presupuesto de consultas,
+# eventos) escriben en la consola, que App Service guarda en sus logs.
+# asistencia_app.test_settings silencia las peticiones lentas.
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'attendance': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
+
+
+# Métricas
+# attendance.metrics registra en el logger 'attendance.metrics' las peticiones
+# que superan estos umbrales (milisegundos), con sus consultas más lentas.
+
+ATTENDANCE_SLOW_REQUEST_MS = 500
+
+ATTENDANCE_SLOW_REQUEST_THRESHOLDS = {
+    'export_attendance': 5000,
+    'students_import': 2000,
+}
+
+# Presupuesto de consultas por vista (attendance.query_budget): registra una
+# advertencia con DEBUG y no mide nada en producción. asistencia_app.test_settings
+# lo cambia a 'raise' para que las pruebas fallen al superarlo.
+
+ATTENDANCE_QUERY_BUDGET = 'warn' if DEBUG else 'off'
+
+
+# Eventos en vivo (attendance.events)
+# Broker que reparte las actualizaciones de las sesiones a los clientes
+# conectados por SSE. LocalBroker solo sirve con un único proceso ASGI; con
+# varios procesos se necesita un broker compartido con la misma interfaz.
+
+ATTENDANCE_EVENT_BROKER = 'attendance.events.LocalBroker'
+
+# Vistas asíncronas: con ATTENDANCE_ASYNC_VIEWS=1 las rutas de lectura más
+# usadas (index, history, session_detail, students_list, student_detail) usan
+# sus variantes async. Solo conviene bajo un servidor ASGI; bajo WSGI cada
+# petición tendría que crear un event loop.
+
+ATTENDANCE_ASYNC_VIEWS = os.environ.get('ATTENDANCE_ASYNC_VIEWS') == '1'
+
+
+# Análisis de asistencia (attendance.bitmaps)
+# Carpeta con los mapas de bits por curso que escribe el comando
+# attendance_bitmaps; un proceso nuevo parte de ellos en lugar de recorrer
+# todos los registros. Sin definir, cada proceso arma el mapa en memoria.
+
+ATTENDANCE_BITMAP_DIR = os.environ.get('ATTENDANCE_BITMAP_DIR')
+
+# Estudiantes en riesgo (attendance.analytics, requiere numpy): sesiones de la
+# ventana de asistencia reciente y umbrales de alerta (ver DEFAULT_THRESHOLDS).
+
+ATTENDANCE_RISK_WINDOW = 5
+
+ATTENDANCE_RISK_THRESHOLDS = {
+    'min_rate': 70,
+    'min_recent_rate': 60,
+    'max_current_streak': 3,
+    'min_trend': -10,
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
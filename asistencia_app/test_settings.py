@@ -0,0 +1,40 @@
+"""
+Configuración para las pruebas::
+
+    python manage.py test --settings=asistencia_app.test_settings
+
+Con pytest-django: ``pytest --ds=asistencia_app.test_settings``.
+"""
+from .settings import *  # noqa: F401,F403
+
+# Superar el presupuesto de consultas de una vista hace fallar la prueba
+ATTENDANCE_QUERY_BUDGET = 'raise'
+
+# Versiones en la memoria del proceso: las pruebas no escriben en el árbol de
+# trabajo ni comparten versiones con un servidor de desarrollo
+CACHES = {
+    **CACHES,
+    'versions': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'versiones-pruebas',
+    },
+}
+
+# Las pruebas con miles de filas superan el umbral de petición lenta; sus
+# consultas no deben llenar la salida (MetricsTests las captura con assertLogs)
+LOGGING = {
+    **LOGGING,
+    'handlers': {
+        **LOGGING['handlers'],
+        'null': {
+            'class': 'logging.NullHandler',
+        },
+    },
+    'loggers': {
+        **LOGGING['loggers'],
+        'attendance.metrics': {
+            'handlers': ['null'],
+            'propagate': False,
+        },
+    },
+}
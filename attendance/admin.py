@@ -1,21 +1,58 @@
-from django.contrib import admin
-from .models import Student, AttendanceSession, AttendanceRecord, Competency, StudentCompetency
+from django.contrib import admin, messages
+from .models import (
+    Course, Student, AttendanceSession, AttendanceRecord, Competency, StudentCompetency,
+    StudentAttendanceSummary, SessionAttendanceSummary, normalize_text,
+)
+from .schedule import precreate_sessions, term_dates
+from .services import delete_records, save_record
+
+
+@admin.register(Course)
+class CourseAdmin(admin.ModelAdmin):
+    list_display = ('name', 'code', 'database', 'term_start', 'term_end', 'class_days', 'is_active', 'created_at')
+    list_filter = ('is_active',)
+    prepopulated_fields = {'code': ('name',)}
+    readonly_fields = ('database',)
+    actions = ['create_term_sessions']
+
+    @admin.action(description='Precrear las sesiones del periodo')
+    def create_term_sessions(self, request, queryset):
+        for course in queryset:
+            try:
+                dates = term_dates(course)
+            except ValueError as e:
+                self.message_user(request, f'{course}: {e}', messages.WARNING)
+                continue
+            created = precreate_sessions(course, dates)
+            self.message_user(
+                request, f'{course}: {created} sesiones nuevas de {len(dates)} días de clase.', messages.SUCCESS
+            )
 
 
 @admin.register(Student)
 class StudentAdmin(admin.ModelAdmin):
-    list_display = ('last_name', 'first_name', 'email', 'github_username', 'is_active', 'created_at')
-    list_filter = ('is_active',)
-    search_fields = ('first_name', 'last_name', 'email', 'github_username')
+    list_display = ('last_name', 'first_name', 'course', 'email', 'github_username', 'is_active', 'created_at')
+    list_filter = ('course', 'is_active')
+    list_select_related = ('course',)
+    search_fields = ('first_name_normalized', 'last_name_normalized', 'email', 'github_username')
     ordering = ('last_name', 'first_name')
 
+    def get_search_results(self, request, queryset, search_term):
+        # Buscar sobre los campos normalizados sin distinguir acentos
+        return super().get_search_results(request, queryset, normalize_text(search_term))
+
 
 @admin.register(AttendanceSession)
 class AttendanceSessionAdmin(admin.ModelAdmin):
-    list_display = ('date', 'description', 'present_count', 'absent_count', 'created_at')
-    list_filter = ('date',)
+    list_display = ('date', 'course', 'description', 'present_count', 'absent_count', 'created_at')
+    list_filter = ('course', 'date')
+    list_select_related = ('course',)
     ordering = ('-date',)
 
+    def get_queryset(self, request):
+        # Leer los conteos precalculados para evitar dos consultas por fila
+        return super().get_queryset(request).with_attendance_summary()
+
 
 @admin.register(AttendanceRecord)
 class AttendanceRecordAdmin(admin.ModelAdmin):
@@ -23,6 +60,16 @@ class AttendanceRecordAdmin(admin.ModelAdmin):
     list_filter = ('is_present', 'session__date')
     search_fields = ('student__first_name', 'student__last_name')
 
+    # Los cambios hechos desde el admin también se aplican a los resúmenes
+    def save_model(self, request, obj, form, change):
+        save_record(obj)
+
+    def delete_model(self, request, obj):
+        delete_records(AttendanceRecord.objects.filter(pk=obj.pk))
+
+    def delete_queryset(self, request, queryset):
+        delete_records(queryset)
+
 
 @admin.register(Competency)
 class CompetencyAdmin(admin.ModelAdmin):
@@ -35,3 +82,17 @@ class StudentCompetencyAdmin(admin.ModelAdmin):
     list_display = ('student', 'competency', 'is_achieved', 'updated_at')
     list_filter = ('is_achieved', 'competency')
     search_fields = ('student__first_name', 'student__last_name', 'competency__name')
+
+
+@admin.register(StudentAttendanceSummary)
+class StudentAttendanceSummaryAdmin(admin.ModelAdmin):
+    list_display = ('student', 'present_count', 'absent_count', 'total_count', 'updated_at')
+    list_select_related = ('student',)
+    readonly_fields = ('present_count', 'absent_count', 'total_count')
+
+
+@admin.register(SessionAttendanceSummary)
+class SessionAttendanceSummaryAdmin(admin.ModelAdmin):
+    list_display = ('session', 'present_count', 'absent_count', 'total_count', 'updated_at')
+    list_select_related = ('session',)
+    readonly_fields = ('present_count', 'absent_count', 'total_count')
@@ -0,0 +1,241 @@
+"""
+Análisis de riesgo de los estudiantes de un curso (requiere ``numpy``, opcional).
+
+La matriz estudiante × sesión de asistencia se arma desempacando los mapas de
+bits de ``attendance.bitmaps`` (que se mantienen al día con los registros
+nuevos, sin volver a recorrer ``AttendanceRecord``) en arreglos booleanos de
+NumPy. Sobre esa matriz se calculan, sin ciclos por estudiante:
+
+* el porcentaje de asistencia total y la serie de ventanas móviles (el de
+  las ``window`` sesiones que terminan en cada sesión), con sumas
+  acumuladas; la última ventana es la asistencia reciente;
+* las rachas de ausencias más larga y actual, restando a la suma acumulada de
+  ausencias su valor en la última sesión asistida; las sesiones sin registro
+  del estudiante no cortan ni alargan las rachas;
+* la tendencia: la pendiente de mínimos cuadrados de la asistencia contra el
+  ordinal de la sesión, en puntos porcentuales cada 10 sesiones;
+* la correlación entre el porcentaje de asistencia y el de competencias
+  logradas.
+
+Un estudiante queda marcado si cruza alguno de los umbrales de
+``settings.ATTENDANCE_RISK_THRESHOLDS``. El resultado se guarda en el caché
+bajo las versiones ``ROSTER``, ``STUDENTS`` y ``COMPETENCIES`` del curso.
+"""
+from django.conf import settings
+from django.core.cache import cache
+
+from .bitmaps import course_bitmaps
+from .caching import ROSTER, STUDENTS, COMPETENCIES, get_versions
+from .models import Competency, Student
+from .snapshot import roster_snapshot
+
+DEFAULT_WINDOW = 5
+# Sesiones a las que se refiere la tendencia (puntos porcentuales cada N sesiones)
+TREND_SPAN = 10
+
+DEFAULT_THRESHOLDS = {
+    # Porcentaje de asistencia total mínimo
+    'min_rate': 70,
+    # Porcentaje de asistencia mínimo en las últimas ``window`` sesiones
+    'min_recent_rate': 60,
+    # Ausencias seguidas hasta la última sesión a partir de las cuales se alerta
+    'max_current_streak': 3,
+    # Tendencia mínima (puntos porcentuales cada TREND_SPAN sesiones)
+    'min_trend': -10,
+}
+
+FLAG_LABELS = {
+    'min_rate': 'Asistencia baja',
+    'min_recent_rate': 'Asistencia reciente baja',
+    'max_current_streak': 'Racha de ausencias',
+    'min_trend': 'Tendencia a la baja',
+}
+
+
+def _numpy():
+    try:
+        import numpy
+    except ImportError as exc:
+        raise RuntimeError('El análisis de riesgo requiere instalar numpy.') from exc
+    return numpy
+
+
+def risk_settings():
+    """Retorna ``(window, umbrales)`` con los valores de settings sobre los por defecto."""
+    window = getattr(settings, 'ATTENDANCE_RISK_WINDOW', DEFAULT_WINDOW)
+    thresholds = {**DEFAULT_THRESHOLDS, **getattr(settings, 'ATTENDANCE_RISK_THRESHOLDS', {})}
+    return window, thresholds
+
+
+# ========================================
+# Matriz de asistencia
+# ========================================
+
+def _unpack(np, packed, rows, width, columns):
+    """Desempaca ``rows`` filas de ``width`` bytes en una matriz booleana ``rows × columns``."""
+    if not rows or not width:
+        return np.zeros((rows, columns), dtype=bool)
+    matrix = np.frombuffer(packed, dtype=np.uint8).reshape(rows, width)
+    return np.unpackbits(matrix, axis=1, count=columns, bitorder='little').astype(bool)
+
+
+def presence_matrix(bitmaps, student_ids):
+    """Retorna ``(presentes, con registro)``: matrices booleanas estudiante × sesión de ``student_ids``."""
+    np = _numpy()
+    present, recorded, width = bitmaps.packed_rows(student_ids)
+    columns = len(bitmaps.sessions)
+    return (
+        _unpack(np, present, len(student_ids), width, columns),
+        _unpack(np, recorded, len(student_ids), width, columns),
+    )
+
+
+# ========================================
+# Indicadores
+# ========================================
+
+def _percentage(np, part, whole):
+    return np.divide(part * 100.0, whole, out=np.zeros(part.shape), where=whole > 0)
+
+
+def _windowed(np, matrix, window):
+    """Suma de cada fila en las ``window`` columnas que terminan en cada columna."""
+    total = np.cumsum(matrix, axis=1)
+    before = np.zeros_like(total)
+    before[:, window:] = total[:, :-window]
+    return total - before
+
+
+def _streaks(np, absent, recorded):
+    """
+    Rachas de ausencias ``(más larga, actual)`` de cada fila, contadas solo
+    sobre las sesiones con registro del estudiante: una sesión sin registro
+    no corta la racha, así que la actual nunca supera a la más larga.
+    """
+    if not absent.shape[1]:
+        zeros = np.zeros(absent.shape[0], dtype=int)
+        return zeros, zeros
+    count = np.cumsum(absent, axis=1)
+    # Suma acumulada en la última sesión asistida (con registro de asistencia)
+    attended = recorded & ~absent
+    reset = np.maximum.accumulate(np.where(attended, count, 0), axis=1)
+    run = count - reset
+    return run.max(axis=1), run[:, -1]
+
+
+def _trend(np, present, recorded):
+    """Pendiente por fila de asistencia (0/1) contra el ordinal de sesión, solo con sesiones con registro."""
+    x = np.arange(present.shape[1], dtype=float)
+    w = recorded.astype(float)
+    y = present.astype(float) * w
+    sw, swx, swxx = w.sum(axis=1), w @ x, w @ (x * x)
+    swy, swxy = y.sum(axis=1), y @ x
+    denominator = sw * swxx - swx * swx
+    slope = np.divide(sw * swxy - swx * swy, denominator, out=np.zeros(sw.shape), where=denominator > 0)
+    return slope * 100 * TREND_SPAN
+
+
+def _correlation(np, x, y):
+    if len(x) < 2 or x.std() == 0 or y.std() == 0:
+        return None
+    return float(np.corrcoef(x, y)[0, 1])
+
+
+def compute_risk(present, recorded, achieved, window, thresholds):
+    """
+    Calcula los indicadores de riesgo sobre matrices booleanas estudiante ×
+    sesión. ``achieved`` es el porcentaje de competencias logradas de cada
+    estudiante. Retorna un diccionario de arreglos (uno por indicador;
+    ``rolling_rate`` es estudiante × sesión), la lista de motivos de alerta de
+    cada estudiante y la correlación.
+    """
+    np = _numpy()
+    absent = recorded & ~present
+
+    rate = _percentage(np, present.sum(axis=1), recorded.sum(axis=1))
+    recent = slice(max(present.shape[1] - window, 0), None)
+    rolling_rate = _percentage(np, _windowed(np, present, window), _windowed(np, recorded, window))
+    recent_rate = rolling_rate[:, -1] if present.shape[1] else np.zeros(present.shape[0])
+    longest_streak, current_streak = _streaks(np, absent, recorded)
+    trend = _trend(np, present, recorded)
+    has_records = recorded.any(axis=1)
+
+    checks = {
+        'min_rate': has_records & (rate < thresholds['min_rate']),
+        'min_recent_rate': recorded[:, recent].any(axis=1) & (recent_rate < thresholds['min_recent_rate']),
+        'max_current_streak': current_streak >= thresholds['max_current_streak'],
+        'min_trend': trend < thresholds['min_trend'],
+    }
+    flags = [
+        [name for name, check in checks.items() if check[i]]
+        for i in range(present.shape[0])
+    ]
+    return {
+        'rate': rate,
+        'rolling_rate': rolling_rate,
+        'recent_rate': recent_rate,
+        'longest_streak': longest_streak,
+        'current_streak': current_streak,
+        'trend': trend,
+    }, flags, _correlation(np, rate[has_records], np.asarray(achieved, dtype=float)[has_records])
+
+
+def _competency_percentages(course, student_ids):
+    total = Competency.objects.count()
+    achieved = dict(
+        Student.objects.filter(course=course, is_active=True).with_competency_stats().values_list('id', 'num_achieved')
+    )
+    return [achieved.get(student_id, 0) * 100 / total if total else 0 for student_id in student_ids]
+
+
+def risk_report(course):
+    """
+    Retorna el reporte de riesgo de los estudiantes activos de ``course``,
+    leyéndolo del caché si las versiones no cambiaron. Lanza ``RuntimeError``
+    si ``numpy`` no está instalado.
+    """
+    _numpy()
+    window, thresholds = risk_settings()
+    versions = get_versions(ROSTER, STUDENTS, COMPETENCIES, course_id=course.id)
+    key = 'attendance:risk:{}:{}:{}:{}'.format(
+        course.id, window, ','.join(f'{name}={value}' for name, value in sorted(thresholds.items())), ':'.join(versions)
+    )
+    report = cache.get(key)
+    if report is None:
+        report = build_risk_report(course, window, thresholds)
+        cache.set(key, report, settings.ATTENDANCE_CACHE_TIMEOUT)
+    return report
+
+
+def build_risk_report(course, window, thresholds):
+    students = roster_snapshot(course).active
+    student_ids = [student.id for student in students]
+    bitmaps = course_bitmaps(course)
+    present, recorded = presence_matrix(bitmaps, student_ids)
+    achieved = _competency_percentages(course, student_ids)
+
+    metrics, flags, correlation = compute_risk(present, recorded, achieved, window, thresholds)
+    rows = []
+    for i, student in enumerate(students):
+        rows.append({
+            'student': student,
+            'rate': round(float(metrics['rate'][i]), 1),
+            'recent_rate': round(float(metrics['recent_rate'][i]), 1),
+            'longest_streak': int(metrics['longest_streak'][i]),
+            'current_streak': int(metrics['current_streak'][i]),
+            'trend': round(float(metrics['trend'][i]), 1),
+            'achieved': round(achieved[i], 1),
+            'flags': [FLAG_LABELS[name] for name in flags[i]],
+        })
+    # Primero los más alertados y, entre ellos, los de menor asistencia
+    rows.sort(key=lambda row: (-len(row['flags']), row['rate']))
+
+    return {
+        'rows': rows,
+        'flagged': sum(1 for row in rows if row['flags']),
+        'sessions': len(bitmaps.sessions),
+        'window': window,
+        'thresholds': thresholds,
+        'correlation': round(correlation, 2) if correlation is not None else None,
+        'class_rate': round(bitmaps.attendance_rate(bitmaps.cohort(student_ids)) * 100, 1),
+    }
@@ -0,0 +1,447 @@
+"""
+Banco de pruebas de rendimiento para todas las rutas de ``attendance.urls``.
+
+``seed_data`` genera estudiantes, sesiones y competencias con inserciones en
+bloque. ``build_requests`` arma una petición representativa para cada ruta y
+se mide de dos formas: con el cliente de pruebas de Django (latencia y número
+de consultas por petición) y con un generador de carga HTTP de varios hilos
+contra un servidor WSGI local (peticiones por segundo). ``find_regressions``
+compara los resultados con una corrida anterior guardada en JSON.
+
+``measure_asgi`` aplica la misma carga contra uvicorn (opcional) y, junto con
+``async_views``, permite comparar las vistas síncronas con sus variantes async.
+"""
+import importlib
+import json
+import os
+import random
+import socket
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from contextlib import contextmanager
+from http.cookiejar import CookieJar
+from datetime import date, timedelta
+from socketserver import ThreadingMixIn
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+from django.conf import settings
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.db import connection, connections
+from django.test import Client, override_settings
+from django.test.client import encode_multipart
+from django.test.utils import CaptureQueriesContext
+from django.urls import clear_url_caches, reverse
+
+from .caching import STUDENTS, bump_versions
+from .models import Student, Competency, StudentCompetency, AttendanceSession, AttendanceRecord
+from .services import rebuild_attendance_summaries
+from .tenancy import default_course, invalidate_courses
+
+BOUNDARY = 'BenchmarkBoundary'
+JSON = 'application/json'
+MULTIPART = f'multipart/form-data; boundary={BOUNDARY}'
+
+# Tolerancia por defecto antes de considerar que una latencia empeoró
+LATENCY_TOLERANCE = 0.25
+# Diferencias menores a esto (ms) se consideran ruido de medición
+LATENCY_NOISE_MS = 2.0
+
+BATCH_SIZE = 2000
+
+# Rutas con variante async (ver ``ATTENDANCE_ASYNC_VIEWS``)
+ASYNC_VIEW_ROUTES = ('index', 'history', 'session_detail', 'students_list', 'student_detail')
+
+
+@contextmanager
+def temporary_database():
+    """
+    Crea la base de datos de pruebas en un archivo temporal, para que los
+    hilos de los servidores HTTP compartan los datos generados, y la
+    destruye al salir.
+    """
+    with tempfile.TemporaryDirectory() as tmpdir:
+        test_settings = connection.settings_dict.setdefault('TEST', {})
+        previous_test_name = test_settings.get('NAME')
+        test_settings['NAME'] = os.path.join(tmpdir, 'benchmark.sqlite3')
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        # La lista de cursos en caché es la de la base anterior
+        invalidate_courses()
+        try:
+            yield
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            test_settings['NAME'] = previous_test_name
+            invalidate_courses()
+
+
+def _reload_urls():
+    importlib.reload(importlib.import_module('attendance.urls'))
+    importlib.reload(importlib.import_module(settings.ROOT_URLCONF))
+    clear_url_caches()
+
+
+@contextmanager
+def async_views(enabled=True):
+    """Activa o desactiva ``ATTENDANCE_ASYNC_VIEWS`` recargando las rutas."""
+    try:
+        with override_settings(ATTENDANCE_ASYNC_VIEWS=enabled):
+            _reload_urls()
+            yield
+    finally:
+        _reload_urls()
+
+
+# ========================================
+# Datos de prueba
+# ========================================
+
+def seed_data(students=300, sessions=60, competencies=8, seed=0, course=None):
+    """
+    Crea ``students`` estudiantes, ``sessions`` sesiones (la última es hoy) y
+    ``competencies`` competencias, con un registro de asistencia por
+    estudiante y sesión y el estado de cada competencia por estudiante.
+    Los estudiantes y sesiones son de ``course`` (por defecto el curso por
+    defecto).
+    """
+    rng = random.Random(seed)
+    course = course or default_course()
+
+    competency_objs = Competency.objects.bulk_create([
+        Competency(name=f'Competencia de prueba {i + 1}', order=i) for i in range(competencies)
+    ])
+
+    student_objs = [
+        Student(course=course, first_name=f'Nombre{i}', last_name=f'Apellido{i}', email=f'estudiante{i}@eafit.edu.co')
+        for i in range(students)
+    ]
+    for student in student_objs:
+        student.update_normalized_fields()
+    student_objs = Student.objects.bulk_create(student_objs, batch_size=BATCH_SIZE)
+
+    first_day = date.today() - timedelta(days=sessions - 1)
+    session_objs = AttendanceSession.objects.bulk_create([
+        AttendanceSession(course=course, date=first_day + timedelta(days=i), description=f'Clase {i + 1}')
+        for i in range(sessions)
+    ])
+
+    AttendanceRecord.objects.bulk_create(
+        (
+            AttendanceRecord(student=student, session=session, is_present=rng.random() < 0.85)
+            for session in session_objs
+            for student in student_objs
+        ),
+        batch_size=BATCH_SIZE,
+    )
+    StudentCompetency.objects.bulk_create(
+        (
+            StudentCompetency(student=student, competency=competency, is_achieved=rng.random() < 0.5)
+            for student in student_objs
+            for competency in competency_objs
+        ),
+        batch_size=BATCH_SIZE,
+    )
+    rebuild_attendance_summaries()
+    # bulk_create no emite señales
+    bump_versions(STUDENTS, course_id=course.id)
+
+    return {'students': students, 'sessions': sessions, 'competencies': competencies}
+
+
+# ========================================
+# Peticiones
+# ========================================
+
+def _json(payload):
+    return json.dumps(payload).encode()
+
+
+def build_requests(sample_size=30):
+    """
+    Retorna una petición por ruta de ``attendance.urls`` como diccionarios
+    ``{'name', 'method', 'path', 'body', 'content_type'}``.
+
+    Las peticiones POST son idempotentes (vuelven a guardar los mismos datos
+    o usan ``dry_run``) para que repetirlas no cambie la base de datos. Las
+    peticiones no llevan la cookie del curso, así que usan el curso por defecto.
+    """
+    course = default_course()
+    student = Student.objects.filter(course=course, is_active=True).order_by('id').first()
+    session = AttendanceSession.objects.filter(course=course).order_by('-date').first()
+    if student is None or session is None:
+        raise ValueError('Se necesitan estudiantes y sesiones para el banco de pruebas.')
+
+    student_ids = list(
+        Student.objects.filter(course=course, is_active=True).order_by('id').values_list('id', flat=True)[:sample_size]
+    )
+    attendance = dict(session.records.filter(student_id__in=student_ids).values_list('student_id', 'is_present'))
+    attendance_payload = {'attendance': {str(sid): attendance.get(sid, True) for sid in student_ids}}
+    competencies = dict(student.student_competencies.values_list('competency_id', 'is_achieved'))
+    grid = {}
+    for student_id, competency_id, is_achieved in StudentCompetency.objects.filter(
+        student_id__in=student_ids
+    ).values_list('student_id', 'competency_id', 'is_achieved'):
+        grid.setdefault(str(student_id), {})[str(competency_id)] = is_achieved
+    roster_csv = 'first_name,last_name,email\n' + ''.join(
+        f'{first_name},{last_name},{email or ""}\n'
+        for first_name, last_name, email in Student.objects.filter(id__in=student_ids)
+        .values_list('first_name', 'last_name', 'email')
+    )
+
+    def get(name, *args, query=''):
+        return {'name': name, 'method': 'GET', 'path': reverse(f'attendance:{name}', args=args) + query,
+                'body': b'', 'content_type': ''}
+
+    def post(name, *args, body, content_type=JSON):
+        return {'name': name, 'method': 'POST', 'path': reverse(f'attendance:{name}', args=args),
+                'body': body, 'content_type': content_type}
+
+    return [
+        get('index'),
+        post('save_attendance', body=_json(attendance_payload)),
+        get('history'),
+        get('history_more', query=f'?before={session.date.isoformat()}'),
+        get('export_attendance', query='?format=csv'),
+        get('session_detail', session.id),
+        get('edit_session', session.id),
+        post('save_session_attendance', session.id, body=_json(attendance_payload)),
+        get('session_stats', session.id),
+        post('sync_session_attendance', session.id, body=_json({
+            'batch_id': 'benchmark', 'changes': attendance_payload['attendance'],
+        })),
+        # Bajo WSGI el stream envía el estado actual y termina
+        get('session_events', session.id),
+        get('students_list'),
+        get('students_manage'),
+        post('students_import', content_type=MULTIPART, body=encode_multipart(BOUNDARY, {
+            'roster_file': _UploadedRoster(roster_csv), 'dry_run': '1',
+        })),
+        get('students_search', query='?q=apellido1'),
+        get('students_risk'),
+        get('student_detail', student.id),
+        post('save_student_competencies', student.id, body=_json({
+            'competencies': {str(cid): achieved for cid, achieved in competencies.items()},
+        })),
+        post('update_student_profile', student.id, body=_json({
+            'email': student.email or '', 'github_username': student.github_username or '',
+        })),
+        get('competency_matrix'),
+        post('save_competency_matrix', body=_json({'cells': grid})),
+        get('cache_stats'),
+        get('metrics'),
+    ]
+
+
+class _UploadedRoster:
+    """Archivo en memoria aceptado por ``encode_multipart``."""
+    name = 'roster.csv'
+
+    def __init__(self, content):
+        self.content = content.encode()
+
+    def read(self):
+        return self.content
+
+
+# ========================================
+# Medición
+# ========================================
+
+def percentile(sorted_values, fraction):
+    """Percentil por rango más cercano de una lista ya ordenada."""
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, round(fraction * len(sorted_values) + 0.5) - 1))
+    return sorted_values[index]
+
+
+def _summarize(latencies_ms, elapsed=None):
+    latencies_ms = sorted(latencies_ms)
+    summary = {
+        'requests': len(latencies_ms),
+        'p50_ms': round(percentile(latencies_ms, 0.50), 2),
+        'p95_ms': round(percentile(latencies_ms, 0.95), 2),
+        'p99_ms': round(percentile(latencies_ms, 0.99), 2),
+    }
+    if elapsed:
+        summary['rps'] = round(len(latencies_ms) / elapsed, 1)
+    return summary
+
+
+def _client_call(client, spec):
+    response = client.generic(spec['method'], spec['path'], spec['body'], content_type=spec['content_type'])
+    if getattr(response, 'streaming', False):
+        b''.join(response.streaming_content)
+    return response
+
+
+def measure_client(specs, iterations=20, warmup=2):
+    """
+    Ejecuta cada petición ``iterations`` veces con el cliente de pruebas y
+    retorna, por ruta, los percentiles de latencia, las consultas por
+    petición (máximo observado), las peticiones por segundo y los errores.
+    """
+    client = Client(raise_request_exception=False)
+    results = {}
+    for spec in specs:
+        for _ in range(warmup):
+            _client_call(client, spec)
+        latencies, queries, errors = [], 0, 0
+        started = time.perf_counter()
+        for _ in range(iterations):
+            with CaptureQueriesContext(connection) as ctx:
+                call_started = time.perf_counter()
+                response = _client_call(client, spec)
+                latencies.append((time.perf_counter() - call_started) * 1000)
+            queries = max(queries, len(ctx.captured_queries))
+            errors += response.status_code >= 400
+        summary = _summarize(latencies, time.perf_counter() - started)
+        summary.update(queries=queries, errors=errors, status=response.status_code)
+        results[spec['name']] = summary
+    return results
+
+
+class _ThreadingWSGIServer(ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+
+
+class _QuietHandler(WSGIRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+def _run_load(base_url, specs, threads, requests_per_thread):
+    """Recorre ``specs`` desde ``threads`` clientes concurrentes; retorna ``(muestras, segundos)``."""
+    samples = []
+    lock = threading.Lock()
+
+    def worker(offset):
+        # Cada cliente obtiene su cookie CSRF como lo haría el navegador
+        cookies = CookieJar()
+        opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(cookies))
+        opener.open(base_url + reverse('attendance:students_manage')).read()
+        csrf_token = next((cookie.value for cookie in cookies if cookie.name == 'csrftoken'), '')
+
+        local = []
+        for i in range(requests_per_thread):
+            spec = specs[(offset + i) % len(specs)]
+            headers = {'X-CSRFToken': csrf_token}
+            if spec['content_type']:
+                headers['Content-Type'] = spec['content_type']
+            request = urllib.request.Request(
+                base_url + spec['path'], method=spec['method'], headers=headers,
+                data=spec['body'] if spec['method'] == 'POST' else None,
+            )
+            started = time.perf_counter()
+            try:
+                with opener.open(request) as response:
+                    response.read()
+                    status = response.status
+            except urllib.error.HTTPError as e:
+                status = e.code
+            local.append((spec['name'], (time.perf_counter() - started) * 1000, status))
+        with lock:
+            samples.extend(local)
+
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    started = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return samples, time.perf_counter() - started
+
+
+def _load_results(specs, threads, samples, elapsed):
+    routes = {}
+    for spec in specs:
+        routes[spec['name']] = _summarize([ms for name, ms, _ in samples if name == spec['name']])
+    return {
+        'threads': threads,
+        'requests': len(samples),
+        'errors': sum(1 for *_, status in samples if status >= 400),
+        'rps': round(len(samples) / elapsed, 1),
+        'routes': routes,
+    }
+
+
+def measure_http(specs, threads=8, requests_per_thread=50):
+    """
+    Levanta un servidor WSGI local con varios hilos y lo carga desde
+    ``threads`` clientes concurrentes que recorren todas las rutas.
+
+    Retorna el total de peticiones por segundo, los errores y los percentiles
+    de latencia por ruta bajo carga.
+    """
+    server = make_server('127.0.0.1', 0, WSGIHandler(), server_class=_ThreadingWSGIServer,
+                         handler_class=_QuietHandler)
+    server_thread = threading.Thread(target=server.serve_forever, daemon=True)
+    server_thread.start()
+    try:
+        samples, elapsed = _run_load(f'http://127.0.0.1:{server.server_port}', specs, threads, requests_per_thread)
+    finally:
+        server.shutdown()
+        server.server_close()
+        connections.close_all()
+    return _load_results(specs, threads, samples, elapsed)
+
+
+def measure_asgi(specs, threads=64, requests_per_thread=20):
+    """
+    Como ``measure_http``, pero contra uvicorn sirviendo la aplicación ASGI
+    de Django en este proceso. Requiere ``uvicorn`` (opcional); lanza
+    ``RuntimeError`` si no está instalado.
+    """
+    try:
+        import uvicorn
+    except ImportError as exc:
+        raise RuntimeError('El banco de pruebas ASGI requiere instalar uvicorn.') from exc
+
+    sock = socket.socket()
+    sock.bind(('127.0.0.1', 0))
+    server = uvicorn.Server(uvicorn.Config(ASGIHandler(), log_level='warning', lifespan='off'))
+    server_thread = threading.Thread(target=server.run, kwargs={'sockets': [sock]}, daemon=True)
+    server_thread.start()
+    try:
+        deadline = time.monotonic() + 10
+        while not server.started:
+            if not server_thread.is_alive() or time.monotonic() > deadline:
+                raise RuntimeError('No se pudo iniciar uvicorn.')
+            time.sleep(0.01)
+        port = sock.getsockname()[1]
+        samples, elapsed = _run_load(f'http://127.0.0.1:{port}', specs, threads, requests_per_thread)
+    finally:
+        server.should_exit = True
+        server_thread.join()
+        sock.close()
+        connections.close_all()
+    return _load_results(specs, threads, samples, elapsed)
+
+
+# ========================================
+# Regresiones
+# ========================================
+
+def find_regressions(results, baseline, latency_tolerance=LATENCY_TOLERANCE):
+    """
+    Compara ``results`` con una corrida anterior y retorna una lista de
+    mensajes: rutas con errores, con más consultas por petición o con un p95
+    más de ``latency_tolerance`` (fracción) por encima de la línea base.
+    """
+    regressions = []
+    previous_routes = baseline.get('client', {})
+    for name, current in results['client'].items():
+        if current['errors']:
+            regressions.append(f'{name}: {current["errors"]} respuestas con error')
+        previous = previous_routes.get(name)
+        if previous is None:
+            continue
+        if current['queries'] > previous['queries']:
+            regressions.append(f'{name}: consultas {previous["queries"]} → {current["queries"]}')
+        limit = previous['p95_ms'] * (1 + latency_tolerance)
+        if current['p95_ms'] > limit and current['p95_ms'] - previous['p95_ms'] > LATENCY_NOISE_MS:
+            regressions.append(f'{name}: p95 {previous["p95_ms"]} ms → {current["p95_ms"]} ms')
+    return regressions
@@ -0,0 +1,442 @@
+"""
+Mapas de bits de asistencia para análisis.
+
+``AttendanceBitmaps`` guarda la asistencia de un curso en enteros de Python
+usados como conjuntos de bits, en dos orientaciones:
+
+* por estudiante, un bit por sesión (el ordinal de la sesión por fecha, entre
+  las ya ocurridas que tienen algún registro): ``present`` y ``recorded``
+  (sesiones con registro, para distinguir una ausencia de un registro que
+  falta);
+* por sesión, un bit por estudiante (su ordinal por id), para comparar
+  grupos de estudiantes con ``&`` y ``bit_count``.
+
+Así, el porcentaje de asistencia, las rachas de ausencias, las sesiones con
+poca asistencia y las comparaciones entre grupos son operaciones de bits
+sobre todo el curso, sin recorrer ``AttendanceRecord``.
+
+``course_bitmaps`` mantiene un mapa por curso en la memoria del proceso. Se
+arma una vez con una consulta y después se actualiza con los registros
+guardados desde la última sincronización (por ``updated_at``, que está
+indexado) cuando cambia la versión ``ROSTER`` del curso. El delta no ve los
+registros borrados, así que al borrar registros o sesiones
+``invalidate_bitmaps`` cambia la versión compartida ``BITMAPS`` y todos los
+procesos vuelven a armar el mapa, igual que si cambian los estudiantes
+(versión ``STUDENTS``). Con ``settings.ATTENDANCE_BITMAP_DIR`` un proceso
+nuevo parte del archivo que escribe el comando ``attendance_bitmaps``, leído
+con ``mmap``, si se escribió con la versión ``BITMAPS`` vigente.
+"""
+import json
+import mmap
+import os
+import tempfile
+import threading
+from datetime import date, datetime, timedelta
+
+from django.conf import settings
+from django.db.models import Max
+
+from .caching import BITMAPS, ROSTER, STUDENTS, bump_versions, get_versions
+from .models import AttendanceRecord, AttendanceSession, Student
+
+MAGIC = b'ATTBMP1\n'
+# Un registro guardado en una transacción que confirma después de leer el
+# delta tiene un updated_at anterior; el margen lo vuelve a leer
+SYNC_MARGIN = timedelta(seconds=60)
+
+# Protege _course_locks; cada curso se arma o sincroniza con su propio lock,
+# así que armar el mapa de un curso grande no bloquea a los demás
+_lock = threading.Lock()
+_course_locks = {}
+# course_id -> (versiones, AttendanceBitmaps)
+_bitmaps = {}
+
+
+class BitmapsOutdated(Exception):
+    """Los registros nuevos no caben en el mapa (otra sesión u otro estudiante); hay que rearmarlo."""
+
+
+def _width(bits):
+    return (bits + 7) // 8
+
+
+def _pack(rows, bits):
+    """Convierte listas de ordinales en enteros con esos bits encendidos."""
+    packed = []
+    for ordinals in rows:
+        buffer = bytearray(_width(bits))
+        for ordinal in ordinals:
+            buffer[ordinal >> 3] |= 1 << (ordinal & 7)
+        packed.append(int.from_bytes(buffer, 'little'))
+    return packed
+
+
+def _compress(bits, mask):
+    """Junta en los bits bajos los bits de ``bits`` en las posiciones de ``mask``."""
+    compressed = ordinal = 0
+    while mask:
+        lowest = mask & -mask
+        if bits & lowest:
+            compressed |= 1 << ordinal
+        ordinal += 1
+        mask ^= lowest
+    return compressed
+
+
+def _longest_run(bits):
+    # Cada paso acorta en uno todas las rachas de bits encendidos
+    length = 0
+    while bits:
+        bits &= bits << 1
+        length += 1
+    return length
+
+
+class AttendanceBitmaps:
+    """Asistencia de un curso como conjuntos de bits; ver el docstring del módulo."""
+
+    def __init__(self, course_id, student_ids, sessions, present, recorded,
+                 session_present, session_recorded, synced_at=None, version=None):
+        self.course_id = course_id
+        self.student_ids = list(student_ids)
+        self.student_index = {student_id: i for i, student_id in enumerate(self.student_ids)}
+        # (id, fecha) ordenadas por fecha; la posición es el ordinal de la sesión
+        self.sessions = list(sessions)
+        self.session_index = {session_id: i for i, (session_id, _) in enumerate(self.sessions)}
+        self.present = present
+        self.recorded = recorded
+        self.session_present = session_present
+        self.session_recorded = session_recorded
+        self.synced_at = synced_at
+        # Versión BITMAPS del curso con la que se armó
+        self.version = version
+
+    @classmethod
+    def from_records(cls, course_id, student_ids, sessions, records, synced_at=None, version=None):
+        """Arma el mapa a partir de filas ``(student_id, session_id, is_present)``."""
+        student_index = {student_id: i for i, student_id in enumerate(student_ids)}
+        session_index = {session_id: i for i, (session_id, _) in enumerate(sessions)}
+        present = [[] for _ in student_ids]
+        recorded = [[] for _ in student_ids]
+        session_present = [[] for _ in sessions]
+        session_recorded = [[] for _ in sessions]
+        for student_id, session_id, is_present in records:
+            student = student_index.get(student_id)
+            session = session_index.get(session_id)
+            if student is None or session is None:
+                continue
+            recorded[student].append(session)
+            session_recorded[session].append(student)
+            if is_present:
+                present[student].append(session)
+                session_present[session].append(student)
+        return cls(
+            course_id, student_ids, sessions,
+            _pack(present, len(sessions)), _pack(recorded, len(sessions)),
+            _pack(session_present, len(student_ids)), _pack(session_recorded, len(student_ids)),
+            synced_at, version,
+        )
+
+    @property
+    def session_ids(self):
+        return [session_id for session_id, _ in self.sessions]
+
+    def packed_rows(self, student_ids):
+        """
+        Filas de ``student_ids`` como bytes de ancho fijo (el bit ``i`` en orden
+        little-endian es la sesión ``i``). Retorna ``(presentes, con registro,
+        ancho)``; un estudiante sin fila queda en ceros.
+        """
+        width = _width(len(self.sessions))
+        present, recorded = [], []
+        for student_id in student_ids:
+            i = self.student_index.get(student_id)
+            present.append(self.present[i].to_bytes(width, 'little') if i is not None else bytes(width))
+            recorded.append(self.recorded[i].to_bytes(width, 'little') if i is not None else bytes(width))
+        return b''.join(present), b''.join(recorded), width
+
+    # ========================================
+    # Consultas por estudiante
+    # ========================================
+
+    def _row(self, student_id):
+        i = self.student_index[student_id]
+        return self.present[i], self.recorded[i]
+
+    def attendance_percentage(self, student_id):
+        """Porcentaje de asistencia sobre las sesiones con registro (0 si no hay)."""
+        present, recorded = self._row(student_id)
+        total = recorded.bit_count()
+        return round(present.bit_count() / total * 100, 1) if total else 0
+
+    def percentages(self, student_ids=None):
+        """Porcentaje de asistencia de cada estudiante (por defecto, de todos)."""
+        return {
+            student_id: self.attendance_percentage(student_id)
+            for student_id in (self.student_ids if student_ids is None else student_ids)
+        }
+
+    def absences(self, student_id):
+        """Bits de las sesiones en que el estudiante tiene registro de ausencia."""
+        present, recorded = self._row(student_id)
+        return recorded & ~present
+
+    # Las rachas se cuentan solo sobre las sesiones con registro del
+    # estudiante: una sesión sin registro no corta ni alarga una racha
+
+    def current_absence_streak(self, student_id):
+        """Ausencias registradas después de la última asistencia."""
+        present, recorded = self._row(student_id)
+        # Las ausencias por encima de la asistencia más reciente
+        return ((recorded & ~present) >> present.bit_length()).bit_count()
+
+    def longest_absence_streak(self, student_id):
+        """La racha más larga de ausencias registradas seguidas."""
+        present, recorded = self._row(student_id)
+        return _longest_run(_compress(recorded & ~present, recorded))
+
+    # ========================================
+    # Consultas por sesión y por grupo
+    # ========================================
+
+    def cohort(self, student_ids):
+        """Máscara (un bit por estudiante) de un grupo de estudiantes."""
+        ordinals = [self.student_index[student_id] for student_id in student_ids if student_id in self.student_index]
+        return _pack([ordinals], len(self.student_ids))[0]
+
+    def session_counts(self, cohort=None):
+        """Lista de ``(session_id, fecha, presentes, con registro)`` por sesión, opcionalmente de un grupo."""
+        counts = []
+        for (session_id, session_date), present, recorded in zip(
+            self.sessions, self.session_present, self.session_recorded
+        ):
+            if cohort is not None:
+                present, recorded = present & cohort, recorded & cohort
+            counts.append((session_id, session_date, present.bit_count(), recorded.bit_count()))
+        return counts
+
+    def sessions_below(self, fraction, cohort=None):
+        """Ids de las sesiones con registros en que asistió menos de ``fraction`` (0-1)."""
+        return [
+            session_id
+            for session_id, _, present, recorded in self.session_counts(cohort)
+            if recorded and present < fraction * recorded
+        ]
+
+    def attendance_rate(self, cohort=None):
+        """Fracción de asistencia (0-1) de todo el curso o de un grupo."""
+        present = recorded = 0
+        for _, _, session_present, session_recorded in self.session_counts(cohort):
+            present += session_present
+            recorded += session_recorded
+        return present / recorded if recorded else 0
+
+    def compare_cohorts(self, *cohorts):
+        """Fracción de asistencia de cada grupo (listas de ids de estudiantes)."""
+        return [self.attendance_rate(self.cohort(student_ids)) for student_ids in cohorts]
+
+    # ========================================
+    # Actualización incremental
+    # ========================================
+
+    def apply(self, records):
+        """
+        Aplica filas ``(student_id, session_id, fecha, is_present, updated_at)``
+        guardadas después de armar el mapa. Una sesión posterior a la última
+        se agrega al final con su primer registro, igual que en
+        ``build_bitmaps``; cualquier otra novedad lanza ``BitmapsOutdated``.
+        """
+        for student_id, session_id, session_date, is_present, updated_at in records:
+            if student_id not in self.student_index:
+                raise BitmapsOutdated(f'Estudiante {student_id} nuevo')
+            if session_id not in self.session_index:
+                if self.sessions and session_date <= self.sessions[-1][1]:
+                    raise BitmapsOutdated(f'Sesión {session_id} fuera de orden')
+                self.session_index[session_id] = len(self.sessions)
+                self.sessions.append((session_id, session_date))
+                self.session_present.append(0)
+                self.session_recorded.append(0)
+            student, session = self.student_index[student_id], self.session_index[session_id]
+            student_bit, session_bit = 1 << session, 1 << student
+            self.recorded[student] |= student_bit
+            self.session_recorded[session] |= session_bit
+            if is_present:
+                self.present[student] |= student_bit
+                self.session_present[session] |= session_bit
+            else:
+                self.present[student] &= ~student_bit
+                self.session_present[session] &= ~session_bit
+            if self.synced_at is None or updated_at > self.synced_at:
+                self.synced_at = updated_at
+
+    # ========================================
+    # Archivo
+    # ========================================
+
+    def dump(self, path):
+        """
+        Escribe el mapa en ``path``: la firma, el largo de la cabecera JSON, la
+        cabecera y las filas de ancho fijo (por estudiante y por sesión).
+        """
+        header = json.dumps({
+            'course_id': self.course_id,
+            'student_ids': self.student_ids,
+            'sessions': [[session_id, session_date.isoformat()] for session_id, session_date in self.sessions],
+            'synced_at': self.synced_at.isoformat() if self.synced_at else None,
+            'version': self.version,
+        }).encode()
+        student_width, session_width = _width(len(self.sessions)), _width(len(self.student_ids))
+        directory = os.path.dirname(os.path.abspath(path))
+        with tempfile.NamedTemporaryFile('wb', dir=directory, delete=False) as f:
+            f.write(MAGIC + len(header).to_bytes(8, 'little') + header)
+            for rows, width in (
+                (self.present, student_width), (self.recorded, student_width),
+                (self.session_present, session_width), (self.session_recorded, session_width),
+            ):
+                f.write(b''.join(row.to_bytes(width, 'little') for row in rows))
+        os.replace(f.name, path)
+
+    @classmethod
+    def load(cls, path):
+        """Lee un mapa escrito con ``dump``; lanza ``ValueError`` si el archivo no es válido."""
+        with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            if data[:len(MAGIC)] != MAGIC:
+                raise ValueError(f'{path} no es un mapa de asistencia')
+            offset = len(MAGIC) + 8
+            header_size = int.from_bytes(data[len(MAGIC):offset], 'little')
+            header = json.loads(data[offset:offset + header_size])
+            offset += header_size
+
+            student_ids = header['student_ids']
+            sessions = [(session_id, date.fromisoformat(day)) for session_id, day in header['sessions']]
+
+            def rows(count, width):
+                nonlocal offset
+                values = [
+                    int.from_bytes(data[offset + i * width:offset + (i + 1) * width], 'little')
+                    for i in range(count)
+                ]
+                offset += count * width
+                return values
+
+            student_width, session_width = _width(len(sessions)), _width(len(student_ids))
+            present = rows(len(student_ids), student_width)
+            recorded = rows(len(student_ids), student_width)
+            session_present = rows(len(sessions), session_width)
+            session_recorded = rows(len(sessions), session_width)
+
+        synced_at = datetime.fromisoformat(header['synced_at']) if header['synced_at'] else None
+        return cls(
+            header['course_id'], student_ids, sessions, present, recorded,
+            session_present, session_recorded, synced_at, header.get('version'),
+        )
+
+
+# ========================================
+# Mapas por curso
+# ========================================
+
+def _records(course):
+    # Como AttendanceSession.held(): sin las sesiones que aún no ocurren
+    return AttendanceRecord.objects.using(course.db_alias).filter(
+        session__course=course, session__date__lte=date.today()
+    )
+
+
+def build_bitmaps(course):
+    """
+    Arma el mapa de ``course`` recorriendo una vez sus registros. Las sesiones
+    sin registros (como la de hoy antes de tomar lista) no son columnas, igual
+    que en la actualización incremental, que solo las ve con sus registros.
+    """
+    db = course.db_alias
+    version, = get_versions(BITMAPS, course_id=course.id)
+    student_ids = list(Student.objects.using(db).filter(course=course).order_by('id').values_list('id', flat=True))
+    sessions = list(
+        AttendanceSession.objects.using(db).filter(course=course, records__isnull=False).held()
+        .distinct().order_by('date').values_list('id', 'date')
+    )
+    # Se lee antes que los registros: lo que cambie mientras tanto entra en el próximo delta
+    synced_at = _records(course).aggregate(latest=Max('updated_at'))['latest']
+    records = _records(course).values_list('student_id', 'session_id', 'is_present')
+    return AttendanceBitmaps.from_records(
+        course.id, student_ids, sessions, records.iterator(chunk_size=5000), synced_at, version
+    )
+
+
+def sync_bitmaps(bitmaps, course):
+    """Aplica al mapa los registros guardados desde su última sincronización."""
+    if bitmaps.synced_at is None:
+        changed = _records(course)
+    else:
+        changed = _records(course).filter(updated_at__gte=bitmaps.synced_at - SYNC_MARGIN)
+    bitmaps.apply(changed.values_list('student_id', 'session_id', 'session__date', 'is_present', 'updated_at'))
+
+
+def bitmap_path(course):
+    directory = getattr(settings, 'ATTENDANCE_BITMAP_DIR', None)
+    return os.path.join(directory, f'{course.code}.bitmap') if directory else None
+
+
+def _load_bitmaps(course, version):
+    """
+    Mapa del archivo de ``course`` si existe, se armó con la versión
+    ``BITMAPS`` ``version`` y tiene los mismos estudiantes; si no, ``None``.
+    """
+    path = bitmap_path(course)
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        bitmaps = AttendanceBitmaps.load(path)
+    except (OSError, ValueError):
+        return None
+    if bitmaps.version != version:
+        return None
+    student_ids = list(
+        Student.objects.using(course.db_alias).filter(course=course).order_by('id').values_list('id', flat=True)
+    )
+    if bitmaps.course_id != course.id or bitmaps.student_ids != student_ids:
+        return None
+    return bitmaps
+
+
+def _course_lock(course_id):
+    with _lock:
+        return _course_locks.setdefault(course_id, threading.Lock())
+
+
+def course_bitmaps(course):
+    """Retorna el mapa de ``course`` al día, armándolo o actualizándolo si hace falta."""
+    versions = get_versions(ROSTER, STUDENTS, BITMAPS, course_id=course.id)
+    held_versions, bitmaps = _bitmaps.get(course.id, (None, None))
+    if held_versions == versions:
+        return bitmaps
+    with _course_lock(course.id):
+        # Otro hilo pudo ponerlo al día mientras se esperaba el lock
+        held_versions, bitmaps = _bitmaps.get(course.id, (None, None))
+        if held_versions == versions:
+            return bitmaps
+        if bitmaps is None:
+            bitmaps = _load_bitmaps(course, versions[2])
+        elif held_versions[1:] != versions[1:]:
+            # Cambiaron los estudiantes o se borraron registros
+            bitmaps = None
+        try:
+            if bitmaps is None:
+                bitmaps = build_bitmaps(course)
+            else:
+                sync_bitmaps(bitmaps, course)
+        except BitmapsOutdated:
+            bitmaps = build_bitmaps(course)
+        _bitmaps[course.id] = (versions, bitmaps)
+        return bitmaps
+
+
+def invalidate_bitmaps(course_id):
+    """
+    Obliga a todos los procesos a volver a armar el mapa del curso (cambia la
+    versión compartida ``BITMAPS``) y lo descarta en este proceso. Se llama al
+    confirmarse el borrado de registros o sesiones.
+    """
+    bump_versions(BITMAPS, course_id=course_id)
+    _bitmaps.pop(course_id, None)
@@ -0,0 +1,169 @@
+"""
+Caché de páginas versionada.
+
+Cada entidad tiene una versión guardada en el caché de Django
+(``session:<id>``, ``student:<id>``, ``day:<fecha>``, ``roster``,
+``students``, ``bitmaps`` y ``competencies``). Las
+páginas cacheadas incluyen en su llave las versiones de las que dependen, de
+modo que al cambiar una versión las entradas anteriores quedan huérfanas y
+expiran solas. Las versiones son marcas de tiempo y no contadores: si una
+llave de versión es desalojada, la nueva versión nunca coincide con una
+página antigua.
+
+Las versiones son por curso (el activo en ``attendance.tenancy`` o el
+``course_id`` indicado), salvo las de ``GLOBAL_SCOPES``. Las llaves de las
+páginas incluyen además el curso, porque una misma URL muestra otro curso
+según la cookie.
+
+Las versiones se guardan en el caché ``versions`` (``VERSION_CACHE``), que
+debe ser compartido por todos los procesos: si un worker cambia una versión,
+los demás dejan de servir las páginas que guardaron en su propia memoria. Sin
+ese alias se usa el caché por defecto.
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.http import HttpResponse
+from django.template.loader import render_to_string
+
+from .tenancy import current_course
+
+ROSTER = 'roster'
+# Solo los datos de los estudiantes (ver attendance.snapshot), no sus estadísticas
+STUDENTS = 'students'
+# Registros o sesiones borrados: obliga a rearmar los mapas de bits (ver attendance.bitmaps)
+BITMAPS = 'bitmaps'
+COMPETENCIES = 'competencies'
+COURSES = 'courses'
+
+# Alcances compartidos por todos los cursos
+GLOBAL_SCOPES = {COMPETENCIES, COURSES}
+
+VERSION_CACHE = 'versions'
+
+
+def session_scope(session_id):
+    return f'session:{session_id}'
+
+
+def student_scope(student_id):
+    return f'student:{student_id}'
+
+
+def day_scope(day):
+    # Las sesiones precreadas aparecen en el historial al llegar su fecha
+    return f'day:{day.isoformat()}'
+
+
+def _version_key(scope, course_id=None):
+    if scope in GLOBAL_SCOPES:
+        return f'attendance:version:{scope}'
+    if course_id is None:
+        course = current_course()
+        course_id = course.id if course is not None else ''
+    return f'attendance:version:{course_id}:{scope}'
+
+
+def _version_cache():
+    return caches[VERSION_CACHE] if VERSION_CACHE in settings.CACHES else cache
+
+
+def _new_version():
+    return format(time.time_ns(), 'x')
+
+
+def get_versions(*scopes, course_id=None):
+    """Retorna las versiones actuales de ``scopes`` con una sola lectura del caché."""
+    keys = [_version_key(scope, course_id) for scope in scopes]
+    versions = _version_cache().get_many(keys)
+    missing = {key: _new_version() for key in keys if key not in versions}
+    if missing:
+        _version_cache().set_many(missing, timeout=None)
+        versions.update(missing)
+    return tuple(versions[key] for key in keys)
+
+
+def bump_versions(*scopes, course_id=None):
+    """Invalida todas las páginas que dependen de ``scopes``."""
+    if scopes:
+        version = _new_version()
+        _version_cache().set_many({_version_key(scope, course_id): version for scope in scopes}, timeout=None)
+
+
+# ========================================
+# Estadísticas de aciertos
+# ========================================
+
+_stats_lock = threading.Lock()
+_stats = {'hits': 0, 'misses': 0}
+
+
+def _record(outcome):
+    with _stats_lock:
+        _stats[outcome] += 1
+
+
+def cache_stats():
+    """Retorna los aciertos y fallos del caché de páginas en este proceso."""
+    with _stats_lock:
+        hits, misses = _stats['hits'], _stats['misses']
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_ratio': round(hits / total, 3) if total else 0,
+    }
+
+
+# ========================================
+# Renderizado cacheado
+# ========================================
+
+def _page_key(request, scopes):
+    # Las páginas muestran el selector de cursos
+    versions = get_versions(*scopes, COURSES)
+    course = getattr(request, 'course', None)
+    return 'attendance:page:{}:{}:{}:{}'.format(
+        course.id if course is not None else '', request.resolver_match.view_name,
+        request.get_full_path(), ':'.join(versions),
+    )
+
+
+def render_cached(request, template_name, scopes, build_context):
+    """
+    Renderiza ``template_name`` usando el caché de páginas.
+
+    ``build_context`` solo se invoca en un fallo, por lo que un acierto no
+    ejecuta ninguna consulta a la base de datos. Un acierto hace dos lecturas
+    de caché y no una: las versiones (una sola ``get_many`` al caché
+    compartido de versiones) y luego la página, porque su llave depende de
+    esas versiones y las páginas viven en otro caché (el por defecto).
+    """
+    key = _page_key(request, scopes)
+    content = cache.get(key)
+    if content is None:
+        _record('misses')
+        content = render_to_string(template_name, build_context(), request)
+        cache.set(key, content, settings.ATTENDANCE_CACHE_TIMEOUT)
+    else:
+        _record('hits')
+    return HttpResponse(content)
+
+
+async def arender_cached(request, template_name, scopes, build_context):
+    """
+    Versión de ``render_cached`` para vistas ``async``: ``build_context`` es
+    una corrutina y el contexto que retorna no debe tener consultas
+    pendientes, porque la plantilla se renderiza en el event loop.
+    """
+    key = _page_key(request, scopes)
+    content = cache.get(key)
+    if content is None:
+        _record('misses')
+        content = render_to_string(template_name, await build_context(), request)
+        cache.set(key, content, settings.ATTENDANCE_CACHE_TIMEOUT)
+    else:
+        _record('hits')
+    return HttpResponse(content)
@@ -0,0 +1,119 @@
+"""
+Validadores para GET condicional (ETag / Last-Modified).
+
+El ETag se arma con las versiones de ``attendance.caching`` y no consulta la
+base de datos; detecta cualquier cambio, incluidos renombres y eliminaciones.
+Last-Modified es la marca de tiempo más reciente de los datos mostrados,
+calculada con agregados ``Max`` sobre columnas indexadas. En los listados se
+toma el máximo de toda la base de datos del curso y no solo del curso: filtrar
+por curso obligaría a recorrer los registros, y una fecha posterior a la real
+solo hace que el navegador revalide con el ETag.
+
+``async_condition`` es el equivalente de ``condition`` para las vistas
+``async``: calcula los validadores en un hilo, porque consultan la base de
+datos, y deja el resto al decorador de Django.
+"""
+from datetime import date
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.db.models import Max
+from django.views.decorators.http import condition
+
+from .caching import ROSTER, STUDENTS, COMPETENCIES, COURSES, day_scope, get_versions, session_scope, student_scope
+from .models import Student, AttendanceSession, AttendanceRecord, StudentCompetency
+
+
+def _etag(name, *scopes):
+    # Las páginas muestran el selector de cursos
+    return '{}-{}'.format(name, '-'.join(get_versions(*scopes, COURSES)))
+
+
+def _latest(*timestamps):
+    timestamps = [ts for ts in timestamps if ts is not None]
+    return max(timestamps) if timestamps else None
+
+
+def _max_updated(queryset, field='updated_at'):
+    return queryset.aggregate(latest=Max(field))['latest']
+
+
+def history_etag(request, *args, **kwargs):
+    return _etag('history', ROSTER, day_scope(date.today()))
+
+
+def history_last_modified(request, *args, **kwargs):
+    return _latest(
+        _max_updated(AttendanceRecord.objects.all()),
+        _max_updated(AttendanceSession.objects.all(), 'created_at'),
+    )
+
+
+def students_list_etag(request, *args, **kwargs):
+    return _etag('students', ROSTER, COMPETENCIES)
+
+
+def students_risk_etag(request, *args, **kwargs):
+    return _etag('risk', ROSTER, STUDENTS, COMPETENCIES)
+
+
+def students_list_last_modified(request, *args, **kwargs):
+    return _latest(
+        _max_updated(AttendanceRecord.objects.all()),
+        _max_updated(StudentCompetency.objects.all()),
+        _max_updated(Student.objects.all(), 'created_at'),
+    )
+
+
+def competency_matrix_etag(request, *args, **kwargs):
+    return _etag('competency-matrix', ROSTER, COMPETENCIES)
+
+
+def session_etag(request, session_id, *args, **kwargs):
+    return _etag(f'session{session_id}', session_scope(session_id), ROSTER)
+
+
+def session_last_modified(request, session_id, *args, **kwargs):
+    return _latest(
+        _max_updated(AttendanceRecord.objects.filter(session_id=session_id)),
+        _max_updated(AttendanceSession.objects.filter(id=session_id), 'created_at'),
+    )
+
+
+def session_stats_etag(request, session_id, *args, **kwargs):
+    return _etag(f'session-stats{session_id}', session_scope(session_id))
+
+
+def student_etag(request, student_id, *args, **kwargs):
+    return _etag(f'student{student_id}', student_scope(student_id), COMPETENCIES)
+
+
+def student_last_modified(request, student_id, *args, **kwargs):
+    return _latest(
+        _max_updated(AttendanceRecord.objects.filter(student_id=student_id)),
+        _max_updated(StudentCompetency.objects.filter(student_id=student_id)),
+        _max_updated(Student.objects.filter(id=student_id), 'created_at'),
+    )
+
+
+def async_condition(etag_func=None, last_modified_func=None):
+    """``condition`` para vistas ``async`` con validadores síncronos."""
+    def validators(request, *args, **kwargs):
+        return (
+            etag_func(request, *args, **kwargs) if etag_func else None,
+            last_modified_func(request, *args, **kwargs) if last_modified_func else None,
+        )
+
+    def decorator(view_func):
+        @wraps(view_func)
+        async def inner(request, *args, **kwargs):
+            etag, last_modified = await sync_to_async(validators)(request, *args, **kwargs)
+            conditional_view = condition(
+                etag_func=lambda *a, **kw: etag,
+                last_modified_func=lambda *a, **kw: last_modified,
+            )(view_func)
+            return await conditional_view(request, *args, **kwargs)
+
+        return inner
+
+    return decorator
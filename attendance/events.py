@@ -0,0 +1,241 @@
+"""
+Eventos en vivo de las sesiones (Server-Sent Events).
+
+Cuando se confirma una escritura de asistencia, ``publish_session_update``
+publica un evento compacto en el canal de la sesión con los estudiantes que
+cambiaron y los nuevos totales. El mensaje se codifica una sola vez en el
+formato de SSE y el broker lo reparte a todos los suscriptores, de modo que
+muchos espectadores cuestan una difusión y no N consultas periódicas.
+
+El broker se elige con ``settings.ATTENDANCE_EVENT_BROKER`` (ruta a una
+subclase de ``EventBroker``). ``LocalBroker`` reparte los mensajes dentro del
+proceso: sirve con un único proceso ASGI (por ejemplo
+``uvicorn asistencia_app.asgi:application``); con varios procesos se necesita
+un broker compartido (p. ej. Redis pub/sub) que implemente la misma interfaz.
+"""
+import asyncio
+import json
+import logging
+import threading
+import weakref
+
+from django.conf import settings
+from django.db.models import Value
+from django.db.models.functions import Coalesce
+from django.utils.module_loading import import_string
+
+from .models import AttendanceSession, AttendanceRecord
+
+logger = logging.getLogger('attendance.events')
+
+DEFAULT_BROKER = 'attendance.events.LocalBroker'
+
+# Mensajes pendientes por suscriptor antes de considerarlo rezagado
+SUBSCRIBER_QUEUE_SIZE = 64
+# Segundos sin eventos tras los cuales se envía un comentario para mantener la conexión
+HEARTBEAT_SECONDS = 15
+# Espera del navegador antes de reconectarse tras perder la conexión
+RETRY_MS = 3000
+
+
+def session_channel(course_id, session_id):
+    # Los ids de sesión solo son únicos dentro de la base de datos de un curso
+    return f'session:{course_id}:{session_id}'
+
+
+def format_event(event, data, event_id=None):
+    """Codifica un evento en el formato de texto de SSE."""
+    lines = []
+    if event_id is not None:
+        lines.append(f'id: {event_id}')
+    lines.append(f'event: {event}')
+    lines.append('data: ' + json.dumps(data, separators=(',', ':')))
+    return '\n'.join(lines) + '\n\n'
+
+
+# ========================================
+# Brokers
+# ========================================
+
+class EventBroker:
+    """
+    Interfaz de un broker de publicación/suscripción.
+
+    Los mensajes son cadenas ya codificadas; el broker no los interpreta.
+    """
+
+    def publish(self, channel, message):
+        """Envía ``message`` a todos los suscriptores de ``channel``. Se puede llamar desde cualquier hilo."""
+        raise NotImplementedError
+
+    def subscribe(self, channel):
+        """Retorna una ``Subscription`` al canal; se llama desde el event loop que la va a consumir."""
+        raise NotImplementedError
+
+    def has_subscribers(self, channel):
+        """Indica si vale la pena preparar un evento para ``channel``."""
+        return True
+
+
+class Subscription:
+    """
+    Cola de mensajes de un suscriptor, ligada al event loop que la creó.
+
+    Si el suscriptor se atrasa más de ``SUBSCRIBER_QUEUE_SIZE`` mensajes se
+    descartan los pendientes y ``get`` retorna ``None``: el cliente debe
+    reconectarse para recibir un estado completo.
+    """
+
+    def __init__(self, broker, channel, maxsize=SUBSCRIBER_QUEUE_SIZE):
+        self.broker = broker
+        self.channel = channel
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize)
+        self.overflowed = False
+
+    def deliver(self, message):
+        """Encola ``message``; debe ejecutarse en ``self.loop``."""
+        if self.overflowed:
+            return
+        if self.queue.full():
+            self.overflowed = True
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(None)
+            return
+        self.queue.put_nowait(message)
+
+    async def get(self, timeout=None):
+        """Espera el siguiente mensaje; lanza ``asyncio.TimeoutError`` si no llega a tiempo."""
+        return await asyncio.wait_for(self.queue.get(), timeout)
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class LocalBroker(EventBroker):
+    """Broker en memoria para un solo proceso."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # Referencias débiles: una suscripción abandonada (el cliente se
+        # desconectó antes de empezar el stream) desaparece con el recolector
+        self._subscribers = {}
+
+    def publish(self, channel, message):
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.deliver, message)
+            except RuntimeError:
+                # El event loop del suscriptor ya se cerró
+                self.unsubscribe(subscription)
+
+    def subscribe(self, channel):
+        subscription = Subscription(self, channel)
+        with self._lock:
+            self._subscribers.setdefault(channel, weakref.WeakSet()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.channel)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.channel]
+
+    def has_subscribers(self, channel):
+        return bool(self._subscribers.get(channel))
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    """Retorna la instancia del broker configurado, creándola la primera vez."""
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                _broker = import_string(getattr(settings, 'ATTENDANCE_EVENT_BROKER', DEFAULT_BROKER))()
+    return _broker
+
+
+# ========================================
+# Eventos de sesión
+# ========================================
+
+def session_totals(session_id, course_id):
+    """
+    Retorna ``(version, present, absent, total)`` de una sesión del curso
+    leyendo su resumen. Lanza ``AttendanceSession.DoesNotExist``.
+    """
+    return (
+        AttendanceSession.objects.filter(pk=session_id, course_id=course_id)
+        .annotate(
+            present=Coalesce('summary__present_count', Value(0)),
+            absent=Coalesce('summary__absent_count', Value(0)),
+            total=Coalesce('summary__total_count', Value(0)),
+        )
+        .values_list('version', 'present', 'absent', 'total')
+        .get()
+    )
+
+
+def _payload(version, present, absent, total, **extra):
+    return {'version': version, **extra, 'present_count': present, 'absent_count': absent, 'total_count': total}
+
+
+def session_snapshot(session_id, course_id):
+    """
+    Retorna el evento ``snapshot`` con el estado completo de una sesión, que
+    se envía al conectarse. Lanza ``AttendanceSession.DoesNotExist``.
+    """
+    version, present, absent, total = session_totals(session_id, course_id)
+    records = {
+        str(student_id): is_present
+        for student_id, is_present in AttendanceRecord.objects.filter(session_id=session_id)
+        .values_list('student_id', 'is_present')
+    }
+    return format_event('snapshot', _payload(version, present, absent, total, records=records), version)
+
+
+def publish_session_update(session, version, changes):
+    """
+    Publica los cambios ``{student_id: is_present}`` ya confirmados en la
+    versión ``version`` de una sesión junto con sus totales. No hace nada si
+    nadie está suscrito.
+    """
+    broker = get_broker()
+    channel = session_channel(session.course_id, session.id)
+    if not broker.has_subscribers(channel):
+        return
+    _, present, absent, total = session_totals(session.id, session.course_id)
+    changes = {str(student_id): is_present for student_id, is_present in changes.items()}
+    broker.publish(channel, format_event('attendance', _payload(version, present, absent, total, changes=changes), version))
+
+
+async def stream_session(subscription, snapshot):
+    """
+    Generador asíncrono del cuerpo de la respuesta SSE: el estado inicial y
+    luego cada mensaje publicado, con un comentario periódico para mantener
+    viva la conexión. Termina si el suscriptor se rezaga.
+    """
+    try:
+        yield f'retry: {RETRY_MS}\n\n'
+        yield snapshot
+        while True:
+            try:
+                message = await subscription.get(HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                yield ': ping\n\n'
+                continue
+            if message is None:
+                logger.info('Suscriptor rezagado en %s; se cierra el stream', subscription.channel)
+                return
+            yield message
+    finally:
+        subscription.close()
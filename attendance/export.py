@@ -0,0 +1,96 @@
+"""
+Exportación de la matriz de asistencia estudiante × sesión.
+
+Las filas se generan a partir de una sola consulta ordenada que se recorre con
+``iterator(chunk_size=...)``, por lo que la memoria usada no depende del
+número de estudiantes. Las consultas indican la base de datos del curso
+porque el generador se consume después de que termina la vista.
+
+La exportación a XLSX requiere ``openpyxl`` (opcional) y escribe el archivo
+en disco en modo ``write_only``.
+"""
+import csv
+from itertools import groupby
+
+from .models import Student, AttendanceSession
+
+EXPORT_CHUNK_SIZE = 2000
+
+PRESENT, ABSENT, MISSING = 1, 0, ''
+
+
+def attendance_matrix_rows(course, include_inactive=False, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Genera la matriz de asistencia de ``course`` fila por fila, empezando por
+    el encabezado.
+
+    Cada celda de sesión es ``1`` (presente), ``0`` (ausente) o vacía si no
+    hay registro. Solo se exportan las sesiones ya ocurridas; los registros
+    de sesiones futuras se ignoran. Al final de cada fila se agregan los
+    totales del estudiante.
+    """
+    db = course.db_alias
+    sessions = list(
+        AttendanceSession.objects.using(db).filter(course=course).held().order_by('date').values_list('id', 'date')
+    )
+    column = {session_id: index for index, (session_id, _) in enumerate(sessions)}
+
+    yield (
+        ['Apellido', 'Nombre', 'Email']
+        + [session_date.isoformat() for _, session_date in sessions]
+        + ['Asistencias', 'Ausencias', 'Porcentaje']
+    )
+
+    students = Student.objects.using(db).filter(course=course)
+    if not include_inactive:
+        students = students.filter(is_active=True)
+    # LEFT JOIN para incluir también a los estudiantes sin registros
+    rows = students.order_by('last_name_normalized', 'first_name', 'id').values_list(
+        'id', 'last_name', 'first_name', 'email',
+        'attendance_records__session_id', 'attendance_records__is_present',
+    ).iterator(chunk_size=chunk_size)
+
+    for (_, last_name, first_name, email), records in groupby(rows, key=lambda row: row[:4]):
+        cells = [MISSING] * len(sessions)
+        present = absent = 0
+        for *_, session_id, is_present in records:
+            # Sin registros (LEFT JOIN) o de una sesión que no se exporta
+            index = column.get(session_id)
+            if index is None:
+                continue
+            cells[index] = PRESENT if is_present else ABSENT
+            if is_present:
+                present += 1
+            else:
+                absent += 1
+        total = present + absent
+        percentage = round(present / total * 100, 1) if total else 0
+        yield [last_name, first_name, email or ''] + cells + [present, absent, percentage]
+
+
+class Echo:
+    """Pseudo-buffer para ``csv.writer`` que retorna cada línea en lugar de guardarla."""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(rows):
+    """Convierte un iterable de filas en un generador de líneas CSV."""
+    writer = csv.writer(Echo())
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def write_xlsx(rows, path):
+    """Escribe las filas en un archivo XLSX usando el modo ``write_only`` de openpyxl."""
+    try:
+        from openpyxl import Workbook
+    except ImportError as exc:
+        raise RuntimeError('La exportación a XLSX requiere instalar openpyxl.') from exc
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('Asistencia')
+    for row in rows:
+        sheet.append(row)
+    workbook.save(path)
@@ -0,0 +1,63 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from attendance.bitmaps import bitmap_path, build_bitmaps
+from attendance.models import Course
+from attendance.tenancy import get_course
+
+
+class Command(BaseCommand):
+    help = (
+        'Arma el mapa de bits de asistencia de un curso, lo guarda en ATTENDANCE_BITMAP_DIR '
+        '(o en --output) para que los procesos nuevos partan de él y muestra un resumen.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--course', help='Código del curso (por defecto el curso por defecto).')
+        parser.add_argument('--output', '-o', help='Archivo donde guardar el mapa.')
+        parser.add_argument(
+            '--below',
+            type=float,
+            default=0.7,
+            help='Reporta las sesiones con asistencia menor a esta fracción (por defecto 0.7).',
+        )
+        parser.add_argument('--top', type=int, default=5, help='Rachas de ausencias a mostrar (por defecto 5).')
+
+    def handle(self, *args, **options):
+        try:
+            course = get_course(options['course'])
+        except Course.DoesNotExist:
+            raise CommandError(f"No existe el curso {options['course']}")
+
+        start = time.perf_counter()
+        bitmaps = build_bitmaps(course)
+        build_ms = (time.perf_counter() - start) * 1000
+        self.stdout.write(
+            f'{len(bitmaps.student_ids)} estudiantes × {len(bitmaps.sessions)} sesiones '
+            f'armados en {build_ms:.0f} ms'
+        )
+
+        start = time.perf_counter()
+        rate = bitmaps.attendance_rate()
+        below = bitmaps.sessions_below(options['below'])
+        streaks = sorted(
+            ((bitmaps.current_absence_streak(student_id), student_id) for student_id in bitmaps.student_ids),
+            reverse=True,
+        )[:options['top']]
+        query_ms = (time.perf_counter() - start) * 1000
+
+        self.stdout.write(f'Asistencia del curso: {rate * 100:.1f}%')
+        self.stdout.write(f"Sesiones con menos del {options['below'] * 100:.0f}%: {len(below)}")
+        for streak, student_id in streaks:
+            if streak:
+                self.stdout.write(f'  estudiante {student_id}: {streak} ausencias seguidas')
+        self.stdout.write(f'Consultas sobre el mapa en {query_ms:.2f} ms')
+
+        path = options['output'] or bitmap_path(course)
+        if path:
+            try:
+                bitmaps.dump(path)
+            except OSError as e:
+                raise CommandError(str(e))
+            self.stdout.write(self.style.SUCCESS(f'Mapa guardado en {path}'))
@@ -0,0 +1,84 @@
+import json
+import logging
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+from attendance.benchmark import (
+    ASYNC_VIEW_ROUTES, async_views, build_requests, measure_asgi, seed_data, temporary_database,
+)
+
+from .benchmark_attendance import DUMMY_CACHE
+
+
+class Command(BaseCommand):
+    help = (
+        'Compara bajo uvicorn las vistas de lectura síncronas con sus variantes async '
+        '(ATTENDANCE_ASYNC_VIEWS) usando muchos clientes concurrentes. Requiere uvicorn.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--students', type=int, default=300, help='Estudiantes a generar (por defecto 300).')
+        parser.add_argument('--sessions', type=int, default=60, help='Sesiones a generar (por defecto 60).')
+        parser.add_argument('--competencies', type=int, default=8, help='Competencias a generar (por defecto 8).')
+        parser.add_argument('--clients', type=int, default=64, help='Clientes concurrentes (por defecto 64).')
+        parser.add_argument('--requests', type=int, default=20, help='Peticiones por cliente (por defecto 20).')
+        parser.add_argument(
+            '--with-cache',
+            action='store_true',
+            help='Usa el caché configurado en lugar de medir las vistas sin caché.',
+        )
+        parser.add_argument('--output', '-o', help='Archivo JSON donde guardar los resultados.')
+
+    def handle(self, *args, **options):
+        # Bajo carga casi todas las peticiones superan el umbral de petición lenta
+        metrics_logger = logging.getLogger('attendance.metrics')
+        level = metrics_logger.level
+        metrics_logger.setLevel(logging.ERROR)
+        try:
+            with temporary_database():
+                if options['with_cache']:
+                    results = self._run(options)
+                else:
+                    with override_settings(CACHES=DUMMY_CACHE):
+                        results = self._run(options)
+        finally:
+            metrics_logger.setLevel(level)
+
+        self._report(results)
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                json.dump(results, f, indent=2, ensure_ascii=False)
+            self.stdout.write(f"Resultados guardados en {options['output']}")
+
+    def _run(self, options):
+        seed_data(options['students'], options['sessions'], options['competencies'])
+        specs = [spec for spec in build_requests() if spec['name'] in ASYNC_VIEW_ROUTES]
+
+        results = {}
+        for mode in ('sync', 'async'):
+            with async_views(mode == 'async'):
+                try:
+                    results[mode] = measure_asgi(specs, options['clients'], options['requests'])
+                except RuntimeError as e:
+                    raise CommandError(str(e))
+        return results
+
+    def _report(self, results):
+        sync, async_ = results['sync'], results['async']
+        self.stdout.write(
+            f"{sync['threads']} clientes, {sync['requests']} peticiones por modo"
+        )
+        self.stdout.write(
+            f"{'ruta':<18}{'sync p50':>10}{'sync p95':>10}{'async p50':>11}{'async p95':>11}"
+        )
+        for name in sync['routes']:
+            before, after = sync['routes'][name], async_['routes'][name]
+            self.stdout.write(
+                f"{name:<18}{before['p50_ms']:>10.2f}{before['p95_ms']:>10.2f}"
+                f"{after['p50_ms']:>11.2f}{after['p95_ms']:>11.2f}"
+            )
+        for mode, run in results.items():
+            line = f"{mode:<6} {run['rps']:>8.1f} req/s  {run['errors']} errores"
+            self.stdout.write(self.style.ERROR(line) if run['errors'] else line)
@@ -0,0 +1,118 @@
+import json
+import platform
+import sqlite3
+from datetime import datetime, timezone
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+from attendance.benchmark import (
+    LATENCY_TOLERANCE, build_requests, find_regressions, measure_client, measure_http, seed_data,
+    temporary_database,
+)
+
+DUMMY_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+
+
+class Command(BaseCommand):
+    help = (
+        'Mide latencia (p50/p95/p99), consultas por petición y peticiones por segundo de '
+        'todas las rutas de la aplicación sobre una base de datos temporal con datos generados.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--students', type=int, default=300, help='Estudiantes a generar (por defecto 300).')
+        parser.add_argument('--sessions', type=int, default=60, help='Sesiones a generar (por defecto 60).')
+        parser.add_argument('--competencies', type=int, default=8, help='Competencias a generar (por defecto 8).')
+        parser.add_argument('--iterations', type=int, default=20, help='Peticiones por ruta con el cliente de pruebas.')
+        parser.add_argument('--threads', type=int, default=8, help='Hilos del generador de carga HTTP (0 lo omite).')
+        parser.add_argument('--http-requests', type=int, default=50, help='Peticiones HTTP por hilo.')
+        parser.add_argument(
+            '--with-cache',
+            action='store_true',
+            help='Usa el caché configurado en lugar de medir las vistas sin caché.',
+        )
+        parser.add_argument('--output', '-o', help='Archivo JSON donde guardar los resultados.')
+        parser.add_argument('--baseline', help='Resultados JSON anteriores contra los cuales comparar.')
+        parser.add_argument(
+            '--latency-tolerance',
+            type=float,
+            default=LATENCY_TOLERANCE,
+            help=f'Aumento permitido del p95 respecto a la línea base (por defecto {LATENCY_TOLERANCE}).',
+        )
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options['baseline']:
+            try:
+                with open(options['baseline'], encoding='utf-8') as f:
+                    baseline = json.load(f)
+            except (OSError, ValueError) as e:
+                raise CommandError(f'No se pudo leer la línea base: {e}')
+
+        with temporary_database():
+            if options['with_cache']:
+                results = self._run(options)
+            else:
+                with override_settings(CACHES=DUMMY_CACHE):
+                    results = self._run(options)
+
+        self._report(results)
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                json.dump(results, f, indent=2, ensure_ascii=False)
+            self.stdout.write(f"Resultados guardados en {options['output']}")
+
+        if baseline is not None:
+            regressions = find_regressions(results, baseline, options['latency_tolerance'])
+            if regressions:
+                for message in regressions:
+                    self.stderr.write(self.style.ERROR(message))
+                raise CommandError(f'{len(regressions)} regresiones respecto a {options["baseline"]}.')
+            self.stdout.write(self.style.SUCCESS('Sin regresiones respecto a la línea base.'))
+
+    def _run(self, options):
+        dataset = seed_data(options['students'], options['sessions'], options['competencies'])
+        specs = build_requests()
+
+        results = {
+            'meta': {
+                'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+                'django': django.get_version(),
+                'python': platform.python_version(),
+                'sqlite': sqlite3.sqlite_version,
+                'cache': bool(options['with_cache']),
+                'iterations': options['iterations'],
+                **dataset,
+            },
+            'client': measure_client(specs, options['iterations']),
+        }
+        if options['threads'] > 0:
+            results['http'] = measure_http(specs, options['threads'], options['http_requests'])
+        return results
+
+    def _report(self, results):
+        meta = results['meta']
+        self.stdout.write(
+            f"{meta['students']} estudiantes, {meta['sessions']} sesiones, "
+            f"{meta['competencies']} competencias; {meta['iterations']} peticiones por ruta"
+        )
+        http_routes = results.get('http', {}).get('routes', {})
+        self.stdout.write(
+            f"{'ruta':<26}{'consultas':>10}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'req/s':>9}{'p95 carga':>11}"
+        )
+        for name, route in results['client'].items():
+            loaded = http_routes.get(name, {}).get('p95_ms', '')
+            line = (
+                f"{name:<26}{route['queries']:>10}{route['p50_ms']:>9.2f}{route['p95_ms']:>9.2f}"
+                f"{route['p99_ms']:>9.2f}{route['rps']:>9.1f}{loaded:>11}"
+            )
+            self.stdout.write(self.style.ERROR(line) if route['errors'] else line)
+        if 'http' in results:
+            http = results['http']
+            self.stdout.write(
+                f"HTTP: {http['threads']} hilos, {http['requests']} peticiones, "
+                f"{http['rps']} req/s, {http['errors']} errores"
+            )
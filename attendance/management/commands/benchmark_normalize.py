@@ -0,0 +1,46 @@
+import timeit
+
+from django.core.management.base import BaseCommand, CommandError
+
+from attendance.models import Student, _normalize_cached, _normalize_unicode, normalize_many
+
+
+class Command(BaseCommand):
+    help = 'Compara la normalización de texto original con la implementación actual sobre la lista de estudiantes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=200,
+            help='Número de pasadas sobre la lista de nombres (por defecto 200).',
+        )
+
+    def handle(self, *args, **options):
+        texts = [
+            text
+            for names in Student.objects.values_list('first_name', 'last_name')
+            for text in names
+        ]
+        if not texts:
+            raise CommandError('No hay estudiantes para medir.')
+
+        expected = [_normalize_unicode(text) for text in texts]
+        if normalize_many(texts) != expected:
+            raise CommandError('La normalización no coincide con la implementación original.')
+
+        uncached = _normalize_cached.__wrapped__
+        candidates = [
+            ('unicodedata (original)', lambda: [_normalize_unicode(text) for text in texts]),
+            ('tabla de traducción', lambda: [uncached(text) for text in texts]),
+            ('tabla + memo LRU', lambda: normalize_many(texts)),
+        ]
+
+        repeat = options['repeat']
+        baseline = None
+        self.stdout.write(f'{len(texts)} textos × {repeat} pasadas; resultados idénticos.')
+        for name, func in candidates:
+            elapsed = min(timeit.repeat(func, number=repeat, repeat=3))
+            per_text = elapsed / (repeat * len(texts)) * 1e9
+            baseline = baseline or elapsed
+            self.stdout.write(f'{name:<24} {per_text:8.1f} ns/texto  ({baseline / elapsed:.1f}x)')
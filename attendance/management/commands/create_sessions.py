@@ -0,0 +1,73 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from attendance.models import Course, parse_class_days
+from attendance.schedule import class_dates, precreate_sessions
+from attendance.tenancy import get_course
+
+
+def _parse_date(value):
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise CommandError(f'Fecha inválida: {value} (se espera AAAA-MM-DD)')
+
+
+class Command(BaseCommand):
+    help = (
+        'Precrea las sesiones de un curso para sus días de clase. Por defecto usa el calendario '
+        'del curso (inicio y fin del periodo y días de clase); las sesiones existentes se conservan.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--course', help='Código del curso (por defecto el curso por defecto).')
+        parser.add_argument('--from', dest='start', help='Primer día (AAAA-MM-DD); por defecto el inicio del periodo.')
+        parser.add_argument('--to', dest='end', help='Último día (AAAA-MM-DD); por defecto el fin del periodo.')
+        parser.add_argument(
+            '--days',
+            help='Días de la semana separados por comas (0 = lunes); por defecto los del curso.',
+        )
+        parser.add_argument(
+            '--skip',
+            action='append',
+            default=[],
+            help='Fecha sin clase (AAAA-MM-DD); se puede repetir.',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Solo muestra cuántas sesiones se crearían.',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            course = get_course(options['course'])
+        except Course.DoesNotExist:
+            raise CommandError(f"No existe el curso {options['course']}")
+
+        start = _parse_date(options['start']) if options['start'] else course.term_start
+        end = _parse_date(options['end']) if options['end'] else course.term_end
+        try:
+            weekdays = parse_class_days(options['days'] if options['days'] is not None else course.class_days)
+        except ValueError as e:
+            raise CommandError(str(e))
+        if not (start and end and weekdays):
+            raise CommandError(
+                f'El curso {course.code} no tiene calendario; indique --from, --to y --days'
+            )
+        if start > end:
+            raise CommandError('La fecha final es anterior a la inicial')
+
+        dates = class_dates(start, end, weekdays, [_parse_date(value) for value in options['skip']])
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING(
+                f'{len(dates)} días de clase entre {start} y {end} (sin guardar).'
+            ))
+            return
+
+        created = precreate_sessions(course, dates)
+        self.stdout.write(self.style.SUCCESS(
+            f'Curso {course.code}: {created} sesiones nuevas de {len(dates)} días de clase '
+            f'entre {start} y {end}.'
+        ))
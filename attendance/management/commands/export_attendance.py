@@ -0,0 +1,54 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from attendance.export import attendance_matrix_rows, stream_csv, write_xlsx
+from attendance.models import Course
+from attendance.tenancy import get_course
+
+
+class Command(BaseCommand):
+    help = 'Exporta la matriz de asistencia estudiante × sesión en CSV o XLSX.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--format',
+            choices=['csv', 'xlsx'],
+            default='csv',
+            help='Formato de salida (por defecto csv).',
+        )
+        parser.add_argument(
+            '--output', '-o',
+            help='Archivo de salida. En CSV se usa la salida estándar si no se indica.',
+        )
+        parser.add_argument('--course', help='Código del curso (por defecto el curso por defecto).')
+        parser.add_argument(
+            '--include-inactive',
+            action='store_true',
+            help='Incluye también a los estudiantes inactivos.',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            course = get_course(options['course'])
+        except Course.DoesNotExist:
+            raise CommandError(f"No existe el curso {options['course']}")
+
+        rows = attendance_matrix_rows(course, include_inactive=options['include_inactive'])
+        output = options['output']
+
+        if options['format'] == 'xlsx':
+            if not output:
+                raise CommandError('La exportación a XLSX requiere --output.')
+            try:
+                write_xlsx(rows, output)
+            except RuntimeError as e:
+                raise CommandError(str(e))
+        elif output:
+            with open(output, 'w', newline='', encoding='utf-8') as f:
+                f.writelines(stream_csv(rows))
+        else:
+            sys.stdout.writelines(stream_csv(rows))
+
+        if output:
+            self.stderr.write(self.style.SUCCESS(f'Asistencia exportada a {output}'))
@@ -0,0 +1,50 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from attendance.models import Course
+from attendance.roster import import_roster, parse_roster
+from attendance.tenancy import get_course
+
+
+class Command(BaseCommand):
+    help = 'Importa una lista de estudiantes desde un archivo CSV o JSON.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Archivo CSV o JSON con la lista de estudiantes.')
+        parser.add_argument('--course', help='Código del curso (por defecto el curso por defecto).')
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Solo muestra los cambios sin guardarlos.',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            course = get_course(options['course'])
+        except Course.DoesNotExist:
+            raise CommandError(f"No existe el curso {options['course']}")
+
+        try:
+            with open(options['path'], 'rb') as f:
+                rows = parse_roster(f.read(), options['path'])
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+
+        report = import_roster(rows, course, dry_run=options['dry_run'])
+
+        for item in report['created']:
+            self.stdout.write(f"+ {item['name']}")
+        for item in report['updated']:
+            self.stdout.write(f"~ {item['name']}: {json.dumps(item['changes'], ensure_ascii=False)}")
+        for item in report['skipped']:
+            self.stdout.write(self.style.WARNING(f"! Fila {item['line']}: {item['reason']}"))
+
+        summary = (
+            f"{len(report['created'])} nuevos, {len(report['updated'])} actualizados, "
+            f"{report['unchanged']} sin cambios, {len(report['skipped'])} omitidos"
+        )
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING(f'{summary} (sin guardar).'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'{summary}.'))
@@ -0,0 +1,137 @@
+import copy
+import json
+import logging
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test import Client
+from django.urls import reverse
+
+# Configuración por defecto de Django para SQLite, usada como línea base
+BASELINE = {'CONN_MAX_AGE': 0, 'CONN_HEALTH_CHECKS': False, 'OPTIONS': {}}
+
+
+class Command(BaseCommand):
+    help = (
+        'Mide el rendimiento de guardados de asistencia concurrentes sobre una copia '
+        'de la base de datos, con y sin el ajuste de SQLite (WAL, BEGIN IMMEDIATE, '
+        'conexiones persistentes).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=8, help='Clientes concurrentes (por defecto 8).')
+        parser.add_argument('--requests', type=int, default=25, help='Guardados por cliente (por defecto 25).')
+        parser.add_argument('--students', type=int, default=30, help='Estudiantes por guardado (por defecto 30).')
+        parser.add_argument(
+            '--mode',
+            choices=['compare', 'baseline', 'tuned'],
+            default='compare',
+            help='Configuración a medir (por defecto ambas).',
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('La prueba de carga solo aplica a SQLite.')
+
+        modes = ['baseline', 'tuned'] if options['mode'] == 'compare' else [options['mode']]
+        source = str(connection.settings_dict['NAME'])
+        original = copy.deepcopy(connection.settings_dict)
+
+        self.stdout.write(
+            f"{options['workers']} clientes × {options['requests']} guardados de "
+            f"{options['students']} estudiantes sobre una copia de {os.path.basename(source)}"
+        )
+        request_logger = logging.getLogger('django.request')
+        level = request_logger.level
+        request_logger.setLevel(logging.CRITICAL)
+        try:
+            for mode in modes:
+                with tempfile.TemporaryDirectory() as tmpdir:
+                    path = os.path.join(tmpdir, 'loadtest.sqlite3')
+                    self._copy_database(source, path, wal=mode == 'tuned')
+                    connections.close_all()
+                    connection.settings_dict.update(
+                        copy.deepcopy(BASELINE if mode == 'baseline' else settings.SQLITE_TUNING),
+                        NAME=path,
+                    )
+                    try:
+                        self._report(mode, self._run(options))
+                    finally:
+                        connections.close_all()
+                        connection.settings_dict.clear()
+                        connection.settings_dict.update(original)
+        finally:
+            request_logger.setLevel(level)
+
+    def _copy_database(self, source, path, wal):
+        src = sqlite3.connect(source)
+        dst = sqlite3.connect(path)
+        try:
+            src.backup(dst)
+            dst.execute(f"PRAGMA journal_mode = {'WAL' if wal else 'DELETE'}")
+        finally:
+            src.close()
+            dst.close()
+
+    def _run(self, options):
+        from attendance.models import Student
+
+        student_ids = list(Student.objects.filter(is_active=True).values_list('id', flat=True))
+        connections.close_all()
+        if not student_ids:
+            raise CommandError('No hay estudiantes activos para la prueba.')
+
+        url = reverse('attendance:save_attendance')
+        sample_size = min(options['students'], len(student_ids))
+        results = []
+        lock = threading.Lock()
+        start_barrier = threading.Barrier(options['workers'])
+
+        def worker(seed):
+            rng = random.Random(seed)
+            client = Client(raise_request_exception=False)
+            timings = []
+            start_barrier.wait()
+            try:
+                for _ in range(options['requests']):
+                    payload = {
+                        str(student_id): rng.random() < 0.8
+                        for student_id in rng.sample(student_ids, sample_size)
+                    }
+                    started = time.perf_counter()
+                    response = client.post(url, json.dumps({'attendance': payload}), content_type='application/json')
+                    timings.append((time.perf_counter() - started, response.status_code))
+            finally:
+                connections.close_all()
+            with lock:
+                results.extend(timings)
+
+        threads = [threading.Thread(target=worker, args=(seed,)) for seed in range(options['workers'])]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return time.perf_counter() - started, results
+
+    def _report(self, mode, run):
+        elapsed, results = run
+        latencies = sorted(seconds * 1000 for seconds, _ in results)
+        ok = sum(1 for _, status in results if status == 200)
+        errors = len(results) - ok
+        p95 = latencies[int(len(latencies) * 0.95) - 1] if latencies else 0
+        line = (
+            f'{mode:<9} {ok / elapsed:7.1f} guardados/s  '
+            f'{errors:4d} errores  '
+            f'p50 {statistics.median(latencies):6.1f} ms  '
+            f'p95 {p95:6.1f} ms  máx {latencies[-1]:6.1f} ms'
+        )
+        self.stdout.write(self.style.WARNING(line) if errors else self.style.SUCCESS(line))
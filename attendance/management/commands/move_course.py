@@ -0,0 +1,63 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+
+from attendance.caching import ROSTER, STUDENTS, bump_versions
+from attendance.models import Course, Student, AttendanceSession
+
+
+class Command(BaseCommand):
+    help = (
+        'Mueve los estudiantes y sesiones de un curso a su propia base de datos SQLite. '
+        'El alias debe estar en settings.DATABASES (ATTENDANCE_COURSE_DATABASES) y su archivo '
+        'no debe tener aún las tablas de la aplicación.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('course', help='Código del curso.')
+        parser.add_argument('database', help='Alias de la base de datos de destino.')
+
+    def handle(self, *args, **options):
+        try:
+            course = Course.objects.get(code=options['course'])
+        except Course.DoesNotExist:
+            raise CommandError(f"No existe el curso {options['course']}")
+
+        source, target = course.db_alias, options['database']
+        if target not in connections:
+            raise CommandError(f'La base de datos {target} no está en settings.DATABASES')
+        if target == source:
+            raise CommandError(f'El curso ya está en {target}')
+        if connections[source].vendor != 'sqlite' or connections[target].vendor != 'sqlite':
+            raise CommandError('Solo se pueden mover cursos entre bases de datos SQLite')
+        if any(name.startswith('attendance_') for name in connections[target].introspection.table_names()):
+            raise CommandError(f'La base de datos {target} ya tiene datos de asistencia')
+
+        # Copia completa del archivo (esquema, índices, FTS5 y migraciones
+        # aplicadas) con la API de respaldo de SQLite, sin ejecutar migraciones
+        self.stdout.write(f'Copiando {source} → {target}...')
+        connections[target].close()
+        self.copy_database(source, target)
+
+        # En el destino solo se conservan los datos del curso
+        AttendanceSession.objects.using(target).exclude(course=course).delete()
+        Student.objects.using(target).exclude(course=course).delete()
+
+        course.database = target
+        course.save(update_fields=['database'])
+
+        with transaction.atomic(using=source):
+            _, sessions = AttendanceSession.objects.using(source).filter(course=course).delete()
+            _, students = Student.objects.using(source).filter(course=course).delete()
+        bump_versions(ROSTER, STUDENTS, course_id=course.id)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Curso {course.code} movido a {target}: "
+            f"{students.get('attendance.Student', 0)} estudiantes y "
+            f"{sessions.get('attendance.AttendanceSession', 0)} sesiones."
+        ))
+
+    def copy_database(self, source, target):
+        connections[source].ensure_connection()
+        connections[target].ensure_connection()
+        connections[source].connection.backup(connections[target].connection)
+        connections[target].close()
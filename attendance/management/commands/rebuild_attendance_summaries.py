@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from attendance.models import Course
+from attendance.services import rebuild_attendance_summaries
+from attendance.tenancy import course_context, get_course
+
+
+class Command(BaseCommand):
+    help = (
+        'Recalcula desde cero los resúmenes de asistencia y reporta las diferencias encontradas. '
+        'Recorre la base de datos del curso indicado (por defecto la base por defecto).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--course', help='Código de un curso cuya base de datos se revisa.')
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Solo reporta las diferencias sin modificar los resúmenes.',
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        try:
+            course = get_course(options['course']) if options['course'] else None
+        except Course.DoesNotExist:
+            raise CommandError(f"No existe el curso {options['course']}")
+
+        with course_context(course):
+            drift = rebuild_attendance_summaries(dry_run=dry_run)
+
+        for obj, expected, stored in drift:
+            stored_text = 'sin resumen' if stored is None else '{}/{}/{}'.format(*stored)
+            self.stdout.write(
+                f'{obj}: almacenado {stored_text}, esperado {expected[0]}/{expected[1]}/{expected[2]} '
+                '(presentes/ausentes/total)'
+            )
+
+        if not drift:
+            self.stdout.write(self.style.SUCCESS('Los resúmenes están al día.'))
+        elif dry_run:
+            self.stdout.write(self.style.WARNING(f'{len(drift)} resúmenes desactualizados (sin cambios).'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'{len(drift)} resúmenes reconstruidos.'))
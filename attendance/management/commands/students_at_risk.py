@@ -0,0 +1,64 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from attendance.analytics import build_risk_report, risk_settings
+from attendance.models import Course
+from attendance.tenancy import course_context, get_course
+
+
+class Command(BaseCommand):
+    help = (
+        'Lista los estudiantes activos de un curso que cruzan los umbrales de riesgo '
+        '(ATTENDANCE_RISK_THRESHOLDS): asistencia baja, rachas de ausencias o tendencia a la baja. '
+        'Requiere numpy.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--course', help='Código del curso (por defecto el curso por defecto).')
+        parser.add_argument('--window', type=int, help='Sesiones de la ventana de asistencia reciente.')
+        parser.add_argument('--all', action='store_true', help='Muestra también a los estudiantes sin alertas.')
+        parser.add_argument('--output', '-o', help='Archivo JSON donde guardar el reporte.')
+
+    def handle(self, *args, **options):
+        try:
+            course = get_course(options['course'])
+        except Course.DoesNotExist:
+            raise CommandError(f"No existe el curso {options['course']}")
+
+        window, thresholds = risk_settings()
+        if options['window']:
+            window = options['window']
+
+        start = time.perf_counter()
+        try:
+            with course_context(course):
+                report = build_risk_report(course, window, thresholds)
+        except RuntimeError as e:
+            raise CommandError(str(e))
+        elapsed_ms = (time.perf_counter() - start) * 1000
+
+        rows = report['rows'] if options['all'] else [row for row in report['rows'] if row['flags']]
+        for row in rows:
+            flags = ', '.join(row['flags']) or '-'
+            self.stdout.write(
+                f"{row['student'].full_name:<40}{row['rate']:>7.1f}%{row['recent_rate']:>7.1f}%"
+                f"{row['current_streak']:>4}{row['longest_streak']:>4}{row['trend']:>+8.1f}  {flags}"
+            )
+
+        correlation = report['correlation']
+        self.stdout.write(
+            f"{report['flagged']} de {len(report['rows'])} estudiantes con alertas en {report['sessions']} sesiones; "
+            f"asistencia del curso {report['class_rate']}%, correlación con competencias "
+            f"{'-' if correlation is None else correlation} ({elapsed_ms:.0f} ms)"
+        )
+
+        if options['output']:
+            payload = dict(report, rows=[
+                dict(row, student={'id': row['student'].id, 'full_name': row['student'].full_name})
+                for row in report['rows']
+            ])
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                json.dump(payload, f, indent=2, ensure_ascii=False)
+            self.stdout.write(f"Reporte guardado en {options['output']}")
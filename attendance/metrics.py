@@ -0,0 +1,288 @@
+"""
+Métricas de rendimiento por ruta en formato Prometheus.
+
+``MetricsMiddleware`` mide cada petición resuelta a una ruta ``attendance:*``:
+tiempo total, número y tiempo de consultas a la base de datos del curso (con
+``execute_wrapper``), tiempo de renderizado de plantillas (con el backend
+``InstrumentedDjangoTemplates``) y tamaño de la respuesta. Los valores se
+acumulan en histogramas de cubetas fijas, uno por hilo, de modo que registrar
+una petición no toma ningún bloqueo; ``render_prometheus`` suma los
+histogramas de todos los hilos.
+
+Las peticiones que superan el umbral de su ruta (``ATTENDANCE_SLOW_REQUEST_MS``
+o ``ATTENDANCE_SLOW_REQUEST_THRESHOLDS``) se registran en el logger
+``attendance.metrics`` junto con sus consultas más lentas.
+"""
+import contextvars
+import heapq
+import itertools
+import logging
+import threading
+import time
+from bisect import bisect_left
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+from django.template.backends.django import DjangoTemplates
+
+from .tenancy import course_db
+
+logger = logging.getLogger('attendance.metrics')
+
+SLOW_REQUEST_MS = 500
+SLOW_QUERIES_LOGGED = 3
+
+# Nombre de la métrica → (descripción, cubetas)
+HISTOGRAMS = {
+    'request_duration_seconds': (
+        'Tiempo total de la petición',
+        (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+    ),
+    'db_queries': (
+        'Consultas SQL por petición',
+        (0, 1, 2, 3, 5, 10, 20, 50, 100),
+    ),
+    'db_duration_seconds': (
+        'Tiempo en consultas SQL por petición',
+        (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+    ),
+    'template_render_seconds': (
+        'Tiempo de renderizado de plantillas por petición',
+        (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1),
+    ),
+    'response_size_bytes': (
+        'Tamaño del cuerpo de la respuesta (sin respuestas en streaming)',
+        (256, 1024, 4096, 16384, 65536, 262144, 1048576),
+    ),
+}
+
+
+# ========================================
+# Histogramas por hilo
+# ========================================
+
+_shards = []
+_shards_lock = threading.Lock()
+_local = threading.local()
+
+
+def _shard():
+    """Retorna los histogramas del hilo actual, creándolos la primera vez."""
+    shard = getattr(_local, 'shard', None)
+    if shard is None:
+        shard = _local.shard = {'histograms': {}, 'responses': {}}
+        with _shards_lock:
+            _shards.append(shard)
+    return shard
+
+
+def observe(metric, route, value):
+    """Agrega ``value`` al histograma ``metric`` de ``route``."""
+    histograms = _shard()['histograms']
+    key = (metric, route)
+    counts = histograms.get(key)
+    if counts is None:
+        # Una cubeta por límite más +Inf, seguidas de la suma y el total
+        counts = histograms[key] = [0] * (len(HISTOGRAMS[metric][1]) + 3)
+    counts[bisect_left(HISTOGRAMS[metric][1], value)] += 1
+    counts[-2] += value
+    counts[-1] += 1
+
+
+def count_response(route, status):
+    responses = _shard()['responses']
+    key = (route, status)
+    responses[key] = responses.get(key, 0) + 1
+
+
+def _merged():
+    with _shards_lock:
+        shards = list(_shards)
+    histograms, responses = {}, {}
+    for shard in shards:
+        for key, counts in list(shard['histograms'].items()):
+            total = histograms.setdefault(key, [0] * len(counts))
+            for i, value in enumerate(counts):
+                total[i] += value
+        for key, value in list(shard['responses'].items()):
+            responses[key] = responses.get(key, 0) + value
+    return histograms, responses
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render_prometheus():
+    """Retorna todas las métricas en el formato de texto de Prometheus."""
+    histograms, responses = _merged()
+    lines = []
+    for metric, (description, buckets) in HISTOGRAMS.items():
+        name = f'attendance_{metric}'
+        lines.append(f'# HELP {name} {description}')
+        lines.append(f'# TYPE {name} histogram')
+        for (key_metric, route), counts in sorted(histograms.items()):
+            if key_metric != metric:
+                continue
+            cumulative = itertools.accumulate(counts[:-2])
+            for bound, value in zip((*buckets, '+Inf'), cumulative):
+                lines.append(f'{name}_bucket{{route="{route}",le="{bound}"}} {value}')
+            lines.append(f'{name}_sum{{route="{route}"}} {_format_value(counts[-2])}')
+            lines.append(f'{name}_count{{route="{route}"}} {counts[-1]}')
+
+    lines.append('# HELP attendance_responses_total Respuestas por ruta y código de estado')
+    lines.append('# TYPE attendance_responses_total counter')
+    for (route, status), value in sorted(responses.items()):
+        lines.append(f'attendance_responses_total{{route="{route}",status="{status}"}} {value}')
+    return '\n'.join(lines) + '\n'
+
+
+# ========================================
+# Medición de una petición
+# ========================================
+
+class RequestStats:
+    __slots__ = ('queries', 'db_time', 'template_time', 'slow_queries', '_order')
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.slow_queries = []
+        self._order = itertools.count()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.queries += 1
+            self.db_time += elapsed
+            # Conserva solo las consultas más lentas (montículo de tamaño fijo)
+            entry = (elapsed, next(self._order), sql)
+            if len(self.slow_queries) < SLOW_QUERIES_LOGGED:
+                heapq.heappush(self.slow_queries, entry)
+            else:
+                heapq.heappushpop(self.slow_queries, entry)
+
+
+_current = contextvars.ContextVar('attendance_request_stats', default=None)
+
+
+def _slow_threshold_ms(route):
+    thresholds = getattr(settings, 'ATTENDANCE_SLOW_REQUEST_THRESHOLDS', {})
+    return thresholds.get(route, getattr(settings, 'ATTENDANCE_SLOW_REQUEST_MS', SLOW_REQUEST_MS))
+
+
+def _install_wrapper(stats):
+    wrapper = connections[course_db()].execute_wrapper(stats)
+    wrapper.__enter__()
+    return wrapper
+
+
+class MetricsMiddleware:
+    """
+    Registra las métricas de cada petición a una ruta ``attendance:*``.
+
+    Bajo ASGI funciona en modo asíncrono; el contador de consultas se instala
+    con ``sync_to_async`` en el hilo donde el ORM ejecuta las consultas.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        stats = RequestStats()
+        token = _current.set(stats)
+        started = time.perf_counter()
+        try:
+            with connections[course_db()].execute_wrapper(stats):
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.record(request, response, time.perf_counter() - started, stats)
+
+    async def __acall__(self, request):
+        stats = RequestStats()
+        token = _current.set(stats)
+        started = time.perf_counter()
+        try:
+            wrapper = await sync_to_async(_install_wrapper)(stats)
+            try:
+                response = await self.get_response(request)
+            finally:
+                await sync_to_async(wrapper.__exit__)(None, None, None)
+        finally:
+            _current.reset(token)
+        return self.record(request, response, time.perf_counter() - started, stats)
+
+    def record(self, request, response, elapsed, stats):
+        match = request.resolver_match
+        if match is None or not match.view_name.startswith('attendance:'):
+            return response
+        route = match.url_name
+
+        observe('request_duration_seconds', route, elapsed)
+        observe('db_queries', route, stats.queries)
+        observe('db_duration_seconds', route, stats.db_time)
+        observe('template_render_seconds', route, stats.template_time)
+        if not response.streaming:
+            observe('response_size_bytes', route, len(response.content))
+        count_response(route, response.status_code)
+
+        if elapsed * 1000 > _slow_threshold_ms(route):
+            self.log_slow_request(request, route, elapsed, stats)
+        return response
+
+    def log_slow_request(self, request, route, elapsed, stats):
+        slowest = ''.join(
+            f'\n  {seconds * 1000:.1f} ms: {sql}'
+            for seconds, _, sql in sorted(stats.slow_queries, reverse=True)
+        )
+        logger.warning(
+            'Petición lenta %s %s (%s): %.1f ms, %d consultas en %.1f ms, plantillas %.1f ms%s',
+            request.method, request.path, route, elapsed * 1000,
+            stats.queries, stats.db_time * 1000, stats.template_time * 1000, slowest,
+        )
+
+
+# ========================================
+# Plantillas
+# ========================================
+
+class _TimedTemplate:
+    """Envuelve una plantilla del backend para sumar su tiempo de renderizado."""
+
+    def __init__(self, template):
+        self.template = template
+
+    def __getattr__(self, name):
+        return getattr(self.template, name)
+
+    def render(self, context=None, request=None):
+        stats = _current.get()
+        if stats is None:
+            return self.template.render(context, request)
+        started = time.perf_counter()
+        try:
+            return self.template.render(context, request)
+        finally:
+            stats.template_time += time.perf_counter() - started
+
+
+class InstrumentedDjangoTemplates(DjangoTemplates):
+    """Backend de plantillas de Django que reporta el tiempo de renderizado a las métricas."""
+
+    def from_string(self, template_code):
+        return _TimedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return _TimedTemplate(super().get_template(template_name))
@@ -0,0 +1,44 @@
+# Generated by Django 6.0 on 2026-10-18 10:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0009_auto_20260127_1228'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SessionAttendanceSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('present_count', models.PositiveIntegerField(default=0, verbose_name='Presentes')),
+                ('absent_count', models.PositiveIntegerField(default=0, verbose_name='Ausentes')),
+                ('total_count', models.PositiveIntegerField(default=0, verbose_name='Total')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('session', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='summary', to='attendance.attendancesession', verbose_name='Sesión')),
+            ],
+            options={
+                'verbose_name': 'Resumen de Asistencia de la Sesión',
+                'verbose_name_plural': 'Resúmenes de Asistencia de Sesiones',
+            },
+        ),
+        migrations.CreateModel(
+            name='StudentAttendanceSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('present_count', models.PositiveIntegerField(default=0, verbose_name='Asistencias')),
+                ('absent_count', models.PositiveIntegerField(default=0, verbose_name='Ausencias')),
+                ('total_count', models.PositiveIntegerField(default=0, verbose_name='Total')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('student', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='attendance_summary', to='attendance.student', verbose_name='Estudiante')),
+            ],
+            options={
+                'verbose_name': 'Resumen de Asistencia del Estudiante',
+                'verbose_name_plural': 'Resúmenes de Asistencia de Estudiantes',
+            },
+        ),
+    ]
@@ -0,0 +1,55 @@
+from django.db import migrations
+from django.db.models import Count, Q
+
+
+def populate_summaries(apps, schema_editor):
+    """Calcular los resúmenes de asistencia a partir de los registros existentes."""
+    Student = apps.get_model('attendance', 'Student')
+    AttendanceSession = apps.get_model('attendance', 'AttendanceSession')
+    StudentAttendanceSummary = apps.get_model('attendance', 'StudentAttendanceSummary')
+    SessionAttendanceSummary = apps.get_model('attendance', 'SessionAttendanceSummary')
+
+    students = Student.objects.annotate(
+        present=Count('attendance_records', filter=Q(attendance_records__is_present=True)),
+        absent=Count('attendance_records', filter=Q(attendance_records__is_present=False)),
+    )
+    StudentAttendanceSummary.objects.bulk_create([
+        StudentAttendanceSummary(
+            student_id=student.id,
+            present_count=student.present,
+            absent_count=student.absent,
+            total_count=student.present + student.absent,
+        )
+        for student in students
+    ])
+
+    sessions = AttendanceSession.objects.annotate(
+        present=Count('records', filter=Q(records__is_present=True)),
+        absent=Count('records', filter=Q(records__is_present=False)),
+    )
+    SessionAttendanceSummary.objects.bulk_create([
+        SessionAttendanceSummary(
+            session_id=session.id,
+            present_count=session.present,
+            absent_count=session.absent,
+            total_count=session.present + session.absent,
+        )
+        for session in sessions
+    ])
+
+
+def remove_summaries(apps, schema_editor):
+    """Eliminar los resúmenes (reversión)."""
+    apps.get_model('attendance', 'StudentAttendanceSummary').objects.all().delete()
+    apps.get_model('attendance', 'SessionAttendanceSummary').objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0010_sessionattendancesummary_studentattendancesummary'),
+    ]
+
+    operations = [
+        migrations.RunPython(populate_summaries, remove_summaries),
+    ]
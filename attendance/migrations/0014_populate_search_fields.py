@@ -0,0 +1,36 @@
+from django.db import migrations
+import unicodedata
+
+
+def normalize_text(text):
+    """Normaliza texto quitando acentos para ordenamiento."""
+    if not text:
+        return ''
+    normalized = unicodedata.normalize('NFD', text)
+    return ''.join(c for c in normalized if unicodedata.category(c) != 'Mn').lower()
+
+
+def populate_search_fields(apps, schema_editor):
+    """Calcular los campos normalizados de todos los estudiantes."""
+    Student = apps.get_model('attendance', 'Student')
+
+    students = list(Student.objects.all())
+    for student in students:
+        student.last_name_normalized = normalize_text(student.last_name)
+        student.first_name_normalized = normalize_text(student.first_name)
+        student.email_local = normalize_text(student.email.split('@')[0]) if student.email else ''
+
+    Student.objects.bulk_update(
+        students, ['last_name_normalized', 'first_name_normalized', 'email_local']
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0013_student_search_fields'),
+    ]
+
+    operations = [
+        migrations.RunPython(populate_search_fields, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,63 @@
+from django.db import migrations
+
+FTS_TABLE = 'attendance_student_fts'
+FTS_COLUMNS = 'first_name_normalized, last_name_normalized, email_local'
+
+
+def create_fts_index(apps, schema_editor):
+    """Crear el índice FTS5 de estudiantes si la base de datos es SQLite con FTS5."""
+    connection = schema_editor.connection
+    if connection.vendor != 'sqlite':
+        return
+
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+        if not cursor.fetchone()[0]:
+            return
+
+        cursor.execute(
+            f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5("
+            f"{FTS_COLUMNS}, content='attendance_student', content_rowid='id', prefix='1 2 3')"
+        )
+        # Triggers para mantener el índice sincronizado con la tabla de estudiantes
+        cursor.execute(
+            f"CREATE TRIGGER {FTS_TABLE}_ai AFTER INSERT ON attendance_student BEGIN "
+            f"INSERT INTO {FTS_TABLE}(rowid, {FTS_COLUMNS}) "
+            f"VALUES (new.id, new.first_name_normalized, new.last_name_normalized, new.email_local); END"
+        )
+        cursor.execute(
+            f"CREATE TRIGGER {FTS_TABLE}_ad AFTER DELETE ON attendance_student BEGIN "
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {FTS_COLUMNS}) "
+            f"VALUES ('delete', old.id, old.first_name_normalized, old.last_name_normalized, old.email_local); END"
+        )
+        cursor.execute(
+            f"CREATE TRIGGER {FTS_TABLE}_au AFTER UPDATE ON attendance_student BEGIN "
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {FTS_COLUMNS}) "
+            f"VALUES ('delete', old.id, old.first_name_normalized, old.last_name_normalized, old.email_local); "
+            f"INSERT INTO {FTS_TABLE}(rowid, {FTS_COLUMNS}) "
+            f"VALUES (new.id, new.first_name_normalized, new.last_name_normalized, new.email_local); END"
+        )
+        cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+
+
+def drop_fts_index(apps, schema_editor):
+    """Eliminar el índice FTS5 (reversión)."""
+    connection = schema_editor.connection
+    if connection.vendor != 'sqlite':
+        return
+
+    with connection.cursor() as cursor:
+        for suffix in ('ai', 'ad', 'au'):
+            cursor.execute(f'DROP TRIGGER IF EXISTS {FTS_TABLE}_{suffix}')
+        cursor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0014_populate_search_fields'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fts_index, drop_fts_index),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 6.0 on 2026-10-18 11:30
+
+import importlib
+
+from django.db import migrations, models
+
+# La reconstrucción de attendance_student en SQLite (AlterField) elimina sus
+# triggers, así que el índice FTS5 se vuelve a crear al final
+student_fts = importlib.import_module('attendance.migrations.0015_student_fts')
+
+
+def rebuild_fts_index(apps, schema_editor):
+    student_fts.drop_fts_index(apps, schema_editor)
+    student_fts.create_fts_index(apps, schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0015_student_fts'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='student',
+            name='last_name_normalized',
+            field=models.CharField(blank=True, editable=False, max_length=100),
+        ),
+        migrations.AddIndex(
+            model_name='attendancerecord',
+            index=models.Index(fields=['session', 'is_present', 'student'], name='record_session_presence_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='attendancerecord',
+            index=models.Index(fields=['student', 'is_present'], name='record_student_presence_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='student',
+            index=models.Index(fields=['last_name_normalized', 'first_name'], name='student_order_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='student',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['last_name_normalized', 'first_name'], name='student_active_order_idx'),
+        ),
+        migrations.RunPython(rebuild_fts_index, migrations.RunPython.noop),
+    ]
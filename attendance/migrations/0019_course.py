@@ -0,0 +1,107 @@
+# Generated by Django 6.0 on 2026-10-18 13:10
+
+import importlib
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+import attendance.models
+
+DEFAULT_COURSE_CODE = 'general'
+
+# La reconstrucción de attendance_student en SQLite elimina sus triggers, así
+# que el índice FTS5 se vuelve a crear al final
+student_fts = importlib.import_module('attendance.migrations.0015_student_fts')
+
+
+def assign_default_course(apps, schema_editor):
+    """Crear el curso por defecto y asignarle los estudiantes y sesiones existentes."""
+    db_alias = schema_editor.connection.alias
+    Course = apps.get_model('attendance', 'Course')
+    Student = apps.get_model('attendance', 'Student')
+    AttendanceSession = apps.get_model('attendance', 'AttendanceSession')
+
+    course, _ = Course.objects.using(db_alias).get_or_create(
+        code=DEFAULT_COURSE_CODE,
+        defaults={'name': 'Fundamentos de Aprendizaje Automático'},
+    )
+    Student.objects.using(db_alias).filter(course__isnull=True).update(course=course)
+    AttendanceSession.objects.using(db_alias).filter(course__isnull=True).update(course=course)
+
+
+def rebuild_fts_index(apps, schema_editor):
+    student_fts.drop_fts_index(apps, schema_editor)
+    student_fts.create_fts_index(apps, schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0018_record_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Course',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, verbose_name='Nombre')),
+                ('code', models.SlugField(unique=True, verbose_name='Código')),
+                ('database', models.CharField(blank=True, editable=False, max_length=50, verbose_name='Base de datos')),
+                ('is_active', models.BooleanField(default=True, verbose_name='Activo')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Curso',
+                'verbose_name_plural': 'Cursos',
+                'ordering': ['name'],
+            },
+        ),
+        migrations.AddField(
+            model_name='student',
+            name='course',
+            field=models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='students', to='attendance.course', verbose_name='Curso'),
+        ),
+        migrations.AddField(
+            model_name='attendancesession',
+            name='course',
+            field=models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='sessions', to='attendance.course', verbose_name='Curso'),
+        ),
+        migrations.RunPython(assign_default_course, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='student',
+            name='course',
+            field=models.ForeignKey(db_index=False, default=attendance.models._default_course_id, on_delete=django.db.models.deletion.PROTECT, related_name='students', to='attendance.course', verbose_name='Curso'),
+        ),
+        migrations.AlterField(
+            model_name='attendancesession',
+            name='course',
+            field=models.ForeignKey(db_index=False, default=attendance.models._default_course_id, on_delete=django.db.models.deletion.PROTECT, related_name='sessions', to='attendance.course', verbose_name='Curso'),
+        ),
+        migrations.AlterField(
+            model_name='attendancesession',
+            name='date',
+            field=models.DateField(verbose_name='Fecha'),
+        ),
+        migrations.AddConstraint(
+            model_name='attendancesession',
+            constraint=models.UniqueConstraint(fields=('course', 'date'), name='session_course_date_uniq'),
+        ),
+        migrations.RemoveIndex(
+            model_name='student',
+            name='student_order_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='student',
+            name='student_active_order_idx',
+        ),
+        migrations.AddIndex(
+            model_name='student',
+            index=models.Index(fields=['course', 'last_name_normalized', 'first_name'], name='student_course_order_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='student',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['course', 'last_name_normalized', 'first_name'], name='student_course_active_idx'),
+        ),
+        migrations.RunPython(rebuild_fts_index, migrations.RunPython.noop),
+    ]
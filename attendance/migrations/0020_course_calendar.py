@@ -0,0 +1,29 @@
+# Generated by Django 6.0 on 2026-10-18 13:40
+
+import attendance.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0019_course'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='class_days',
+            field=models.CharField(blank=True, help_text='Días de la semana separados por comas (0 = lunes, 6 = domingo).', max_length=20, validators=[attendance.models.validate_class_days], verbose_name='Días de clase'),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='term_end',
+            field=models.DateField(blank=True, null=True, verbose_name='Fin del periodo'),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='term_start',
+            field=models.DateField(blank=True, null=True, verbose_name='Inicio del periodo'),
+        ),
+    ]
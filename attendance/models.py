@@ -1,37 +1,214 @@
-from django.db import models
+from django.core.exceptions import ValidationError
+from django.db import DEFAULT_DB_ALIAS, models
+from django.db.models import Count, Q, Value
+from django.db.models.functions import Coalesce
+from datetime import date
+from functools import lru_cache
 import unicodedata
 
 
+def _normalize_unicode(text):
+    """Normalización completa: descompone en NFD y filtra las marcas de acento."""
+    normalized = unicodedata.normalize('NFD', text)
+    return ''.join(c for c in normalized if unicodedata.category(c) != 'Mn').lower()
+
+
+# Rangos Latin-1 y Latin Extended-A: cubren los nombres del curso. Cada
+# carácter se traduce a su forma normalizada precalculada; el resto de textos
+# usa la normalización completa.
+_LATIN_LIMIT = '\u0180'
+_LATIN_TABLE = str.maketrans({
+    chr(code): _normalize_unicode(chr(code)) for code in range(ord(_LATIN_LIMIT))
+})
+
+
+@lru_cache(maxsize=4096)
+def _normalize_cached(text):
+    if text.isascii():
+        return text.lower()
+    if max(text) < _LATIN_LIMIT:
+        return text.translate(_LATIN_TABLE)
+    return _normalize_unicode(text)
+
+
 def normalize_text(text):
     """Normaliza texto quitando acentos para ordenamiento."""
     if not text:
         return ''
-    # Descomponer caracteres acentuados y filtrar las marcas de acento
-    normalized = unicodedata.normalize('NFD', text)
-    return ''.join(c for c in normalized if unicodedata.category(c) != 'Mn').lower()
+    return _normalize_cached(text)
+
+
+def normalize_many(texts):
+    """Normaliza una secuencia de textos; retorna una lista en el mismo orden."""
+    return [normalize_text(text) for text in texts]
+
+
+class StudentQuerySet(models.QuerySet):
+    """QuerySet de estudiantes con anotaciones de estadísticas agregadas."""
+
+    def with_attendance_stats(self):
+        """Anota asistencias, ausencias y total de registros en una sola consulta."""
+        return self.annotate(
+            num_present=Count('attendance_records', filter=Q(attendance_records__is_present=True), distinct=True),
+            num_absent=Count('attendance_records', filter=Q(attendance_records__is_present=False), distinct=True),
+            num_records=Count('attendance_records', distinct=True),
+        )
+
+    def with_competency_stats(self):
+        """Anota competencias logradas y evaluadas en una sola consulta."""
+        return self.annotate(
+            num_achieved=Count('student_competencies', filter=Q(student_competencies__is_achieved=True), distinct=True),
+            num_evaluated=Count('student_competencies', distinct=True),
+        )
+
+    def with_attendance_summary(self):
+        """Anota las estadísticas de asistencia leyendo la tabla de resumen precalculada."""
+        return self.annotate(
+            num_present=Coalesce('attendance_summary__present_count', Value(0)),
+            num_absent=Coalesce('attendance_summary__absent_count', Value(0)),
+            num_records=Coalesce('attendance_summary__total_count', Value(0)),
+        )
+
+
+class SessionQuerySet(models.QuerySet):
+    """QuerySet de sesiones con anotaciones de estadísticas agregadas."""
+
+    def with_attendance_stats(self):
+        """Anota presentes, ausentes y total de registros en una sola consulta."""
+        return self.annotate(
+            num_present=Count('records', filter=Q(records__is_present=True)),
+            num_absent=Count('records', filter=Q(records__is_present=False)),
+            num_records=Count('records'),
+        )
+
+    def with_attendance_summary(self):
+        """Anota las estadísticas de asistencia leyendo la tabla de resumen precalculada."""
+        return self.annotate(
+            num_present=Coalesce('summary__present_count', Value(0)),
+            num_absent=Coalesce('summary__absent_count', Value(0)),
+            num_records=Coalesce('summary__total_count', Value(0)),
+        )
+
+    def held(self, today=None):
+        """Excluye las sesiones precreadas del calendario que aún no ocurren."""
+        return self.filter(date__lte=today or date.today())
+
+
+def parse_class_days(value):
+    """Convierte ``"0,2,4"`` en ``(0, 2, 4)``; lanza ``ValueError`` si algún día es inválido."""
+    days = set()
+    for part in (value or '').split(','):
+        part = part.strip()
+        if not part:
+            continue
+        if not part.isdigit() or int(part) > 6:
+            raise ValueError(f'Día de la semana inválido: {part}')
+        days.add(int(part))
+    return tuple(sorted(days))
+
+
+def validate_class_days(value):
+    try:
+        parse_class_days(value)
+    except ValueError as e:
+        raise ValidationError(str(e))
+
+
+class Course(models.Model):
+    """
+    Curso o grupo. Los estudiantes y las sesiones pertenecen a un curso; con
+    ``database`` los datos del curso viven en otra base de datos (ver
+    ``attendance.tenancy``).
+    """
+    name = models.CharField(max_length=100, verbose_name="Nombre")
+    code = models.SlugField(max_length=50, unique=True, verbose_name="Código")
+    # Alias de settings.DATABASES con los datos del curso; vacío = base por defecto
+    database = models.CharField(max_length=50, blank=True, editable=False, verbose_name="Base de datos")
+    is_active = models.BooleanField(default=True, verbose_name="Activo")
+    # Calendario del periodo: las sesiones se precrean con el comando
+    # create_sessions o la acción del admin (ver attendance.schedule)
+    term_start = models.DateField(null=True, blank=True, verbose_name="Inicio del periodo")
+    term_end = models.DateField(null=True, blank=True, verbose_name="Fin del periodo")
+    class_days = models.CharField(
+        max_length=20,
+        blank=True,
+        validators=[validate_class_days],
+        verbose_name="Días de clase",
+        help_text="Días de la semana separados por comas (0 = lunes, 6 = domingo).",
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Curso"
+        verbose_name_plural = "Cursos"
+        ordering = ['name']
+
+    def __str__(self):
+        return self.name
+
+    @property
+    def db_alias(self):
+        """Alias de la base de datos donde están los estudiantes y sesiones del curso."""
+        return self.database or DEFAULT_DB_ALIAS
+
+
+def _default_course_id():
+    from .tenancy import current_course_id
+    return current_course_id()
 
 
 class Student(models.Model):
     """Modelo para representar un estudiante."""
+    course = models.ForeignKey(
+        Course,
+        on_delete=models.PROTECT,
+        related_name='students',
+        default=_default_course_id,
+        # Cubierto por student_course_order_idx
+        db_index=False,
+        verbose_name="Curso"
+    )
     first_name = models.CharField(max_length=100, verbose_name="Nombre")
     last_name = models.CharField(max_length=100, verbose_name="Apellido")
     email = models.EmailField(blank=True, null=True, verbose_name="Email")
     github_username = models.CharField(max_length=100, blank=True, null=True, verbose_name="Usuario GitHub")
     is_active = models.BooleanField(default=True, verbose_name="Activo")
     created_at = models.DateTimeField(auto_now_add=True)
-    # Campo para ordenamiento sin acentos (se genera automáticamente)
+    # Campos sin acentos para ordenamiento y búsqueda (se generan automáticamente)
     last_name_normalized = models.CharField(max_length=100, blank=True, editable=False)
+    first_name_normalized = models.CharField(max_length=100, blank=True, editable=False, db_index=True)
+    email_local = models.CharField(max_length=254, blank=True, editable=False, db_index=True)
+
+    objects = StudentQuerySet.as_manager()
 
     class Meta:
         verbose_name = "Estudiante"
         verbose_name_plural = "Estudiantes"
         ordering = ['last_name_normalized', 'first_name']
+        indexes = [
+            # Estudiantes de un curso en el orden por defecto
+            models.Index(fields=['course', 'last_name_normalized', 'first_name'], name='student_course_order_idx'),
+            # Listado de estudiantes activos del curso en el orden por defecto. Es
+            # un índice parcial porque SQLite no usa un índice para el filtro
+            # booleano "WHERE is_active" que genera Django.
+            models.Index(
+                fields=['course', 'last_name_normalized', 'first_name'],
+                condition=Q(is_active=True),
+                name='student_course_active_idx',
+            ),
+        ]
 
     def save(self, *args, **kwargs):
-        """Al guardar, normaliza el apellido para ordenamiento correcto."""
-        self.last_name_normalized = normalize_text(self.last_name)
+        """Al guardar, normaliza nombre, apellido y email para ordenamiento y búsqueda."""
+        self.update_normalized_fields()
         super().save(*args, **kwargs)
 
+    def update_normalized_fields(self):
+        """Calcula los campos normalizados (útil antes de bulk_create/bulk_update)."""
+        self.last_name_normalized = normalize_text(self.last_name)
+        self.first_name_normalized = normalize_text(self.first_name)
+        self.email_local = normalize_text(self.email.split('@')[0]) if self.email else ''
+
     def __str__(self):
         return f"{self.last_name}, {self.first_name}"
 
@@ -39,20 +216,30 @@ class Student(models.Model):
     def full_name(self):
         return f"{self.first_name} {self.last_name}"
 
+    # Las estadísticas usan el valor anotado por StudentQuerySet si existe;
+    # en caso contrario se calculan con una consulta.
+
     @property
     def attendance_count(self):
         """Número de clases a las que asistió."""
+        if hasattr(self, 'num_present'):
+            return self.num_present
         return self.attendance_records.filter(is_present=True).count()
 
     @property
     def absence_count(self):
         """Número de clases a las que faltó."""
+        if hasattr(self, 'num_absent'):
+            return self.num_absent
         return self.attendance_records.filter(is_present=False).count()
 
     @property
     def attendance_percentage(self):
         """Porcentaje de asistencia."""
-        total = self.attendance_records.count()
+        if hasattr(self, 'num_records'):
+            total = self.num_records
+        else:
+            total = self.attendance_records.count()
         if total == 0:
             return 0
         return round((self.attendance_count / total) * 100, 1)
@@ -60,11 +247,15 @@ class Student(models.Model):
     @property
     def competencies_achieved(self):
         """Número de competencias logradas."""
+        if hasattr(self, 'num_achieved'):
+            return self.num_achieved
         return self.student_competencies.filter(is_achieved=True).count()
 
     @property
     def competencies_total(self):
         """Total de competencias evaluadas."""
+        if hasattr(self, 'num_evaluated'):
+            return self.num_evaluated
         return self.student_competencies.count()
 
 
@@ -100,7 +291,7 @@ class StudentCompetency(models.Model):
     )
     is_achieved = models.BooleanField(default=False, verbose_name="Lograda")
     notes = models.TextField(blank=True, verbose_name="Notas")
-    updated_at = models.DateTimeField(auto_now=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     class Meta:
         verbose_name = "Competencia del Estudiante"
@@ -113,27 +304,54 @@ class StudentCompetency(models.Model):
 
 
 class AttendanceSession(models.Model):
-    """Modelo para representar una sesión de asistencia (por fecha)."""
-    date = models.DateField(unique=True, verbose_name="Fecha")
+    """Modelo para representar una sesión de asistencia (por curso y fecha)."""
+    course = models.ForeignKey(
+        Course,
+        on_delete=models.PROTECT,
+        related_name='sessions',
+        default=_default_course_id,
+        # Cubierto por session_course_date_uniq
+        db_index=False,
+        verbose_name="Curso"
+    )
+    date = models.DateField(verbose_name="Fecha")
     description = models.CharField(max_length=255, blank=True, verbose_name="Descripción")
     created_at = models.DateTimeField(auto_now_add=True)
+    # Se incrementa cada vez que cambia la asistencia de la sesión
+    version = models.PositiveIntegerField(default=0, editable=False, verbose_name="Versión")
+
+    objects = SessionQuerySet.as_manager()
 
     class Meta:
         verbose_name = "Sesión de Asistencia"
         verbose_name_plural = "Sesiones de Asistencia"
         ordering = ['-date']
+        constraints = [
+            # Una sesión por curso y día; su índice cubre el historial del curso
+            models.UniqueConstraint(fields=['course', 'date'], name='session_course_date_uniq'),
+        ]
 
     def __str__(self):
         return f"Sesión del {self.date.strftime('%d/%m/%Y')}"
 
     @property
     def present_count(self):
+        if hasattr(self, 'num_present'):
+            return self.num_present
         return self.records.filter(is_present=True).count()
 
     @property
     def absent_count(self):
+        if hasattr(self, 'num_absent'):
+            return self.num_absent
         return self.records.filter(is_present=False).count()
 
+    @property
+    def total_count(self):
+        if hasattr(self, 'num_records'):
+            return self.num_records
+        return self.records.count()
+
 
 class AttendanceRecord(models.Model):
     """Modelo para registrar la asistencia de un estudiante en una sesión."""
@@ -151,14 +369,63 @@ class AttendanceRecord(models.Model):
     )
     is_present = models.BooleanField(default=False, verbose_name="Presente")
     created_at = models.DateTimeField(auto_now_add=True)
-    updated_at = models.DateTimeField(auto_now=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+    # Versión de la sesión en la que cambió este registro por última vez
+    version = models.PositiveIntegerField(default=0, editable=False, verbose_name="Versión")
 
     class Meta:
         verbose_name = "Registro de Asistencia"
         verbose_name_plural = "Registros de Asistencia"
         unique_together = ['student', 'session']
+        indexes = [
+            # Cubre los conteos y el estado de asistencia por sesión
+            models.Index(fields=['session', 'is_present', 'student'], name='record_session_presence_idx'),
+            # Cubre los conteos de asistencia por estudiante
+            models.Index(fields=['student', 'is_present'], name='record_student_presence_idx'),
+        ]
 
     def __str__(self):
         status = "Presente" if self.is_present else "Ausente"
         return f"{self.student} - {self.session.date} - {status}"
 
+
+class StudentAttendanceSummary(models.Model):
+    """Contadores de asistencia precalculados por estudiante."""
+    student = models.OneToOneField(
+        Student,
+        on_delete=models.CASCADE,
+        related_name='attendance_summary',
+        verbose_name="Estudiante"
+    )
+    present_count = models.PositiveIntegerField(default=0, verbose_name="Asistencias")
+    absent_count = models.PositiveIntegerField(default=0, verbose_name="Ausencias")
+    total_count = models.PositiveIntegerField(default=0, verbose_name="Total")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Resumen de Asistencia del Estudiante"
+        verbose_name_plural = "Resúmenes de Asistencia de Estudiantes"
+
+    def __str__(self):
+        return f"{self.student} - {self.present_count}/{self.total_count}"
+
+
+class SessionAttendanceSummary(models.Model):
+    """Contadores de asistencia precalculados por sesión."""
+    session = models.OneToOneField(
+        AttendanceSession,
+        on_delete=models.CASCADE,
+        related_name='summary',
+        verbose_name="Sesión"
+    )
+    present_count = models.PositiveIntegerField(default=0, verbose_name="Presentes")
+    absent_count = models.PositiveIntegerField(default=0, verbose_name="Ausentes")
+    total_count = models.PositiveIntegerField(default=0, verbose_name="Total")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Resumen de Asistencia de la Sesión"
+        verbose_name_plural = "Resúmenes de Asistencia de Sesiones"
+
+    def __str__(self):
+        return f"{self.session} - {self.present_count}/{self.total_count}"
@@ -0,0 +1,138 @@
+"""
+Presupuesto de consultas por petición y detección de N+1.
+
+``query_budget`` funciona como administrador de contexto y como decorador de
+vistas::
+
+    @query_budget(max=5)
+    def students_list(request):
+        ...
+
+Cuenta las consultas ejecutadas y agrupa los SELECT por forma (el SQL con las
+listas de parámetros colapsadas). Si se supera ``max`` o una misma forma se
+repite más de ``max_repeats`` veces (la firma de un N+1), el comportamiento
+depende de ``settings.ATTENDANCE_QUERY_BUDGET``: ``'raise'`` lanza
+``QueryBudgetExceeded`` (pruebas), ``'warn'`` lo registra en el logger
+``attendance.query_budget`` (DEBUG) y ``'off'`` no mide nada.
+
+En las vistas ``async`` el contador se instala con ``sync_to_async``, en el
+mismo hilo donde el ORM asíncrono ejecuta las consultas de la petición. Sin
+``using`` se cuentan las consultas a la base de datos del curso activo.
+"""
+import logging
+import re
+from collections import Counter
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+
+from .tenancy import course_db
+
+logger = logging.getLogger('attendance.query_budget')
+
+# Veces que puede repetirse un mismo SELECT antes de considerarlo un N+1
+MAX_REPEATS = 2
+
+_PARAM_LIST_RE = re.compile(r'\(\s*%s(?:\s*,\s*%s)*\s*\)')
+# El control de transacciones depende de si ya hay una abierta (como en las
+# pruebas, que usan savepoints), así que no cuenta para el presupuesto
+_TRANSACTION_RE = re.compile(
+    r'\s*(?:BEGIN|COMMIT|ROLLBACK|(?:RELEASE |ROLLBACK TO )?SAVEPOINT)\b', re.IGNORECASE
+)
+
+
+class QueryBudgetExceeded(Exception):
+    """Una vista ejecutó más consultas de las presupuestadas o un N+1."""
+
+
+def query_shape(sql):
+    """Retorna el SQL con las listas ``(%s, %s, ...)`` colapsadas a ``(%s...)``."""
+    return _PARAM_LIST_RE.sub('(%s...)', sql)
+
+
+def budget_mode():
+    return getattr(settings, 'ATTENDANCE_QUERY_BUDGET', 'warn' if settings.DEBUG else 'off')
+
+
+class query_budget:
+    """Limita las consultas de un bloque o de una vista; ver el docstring del módulo."""
+
+    def __init__(self, max, max_repeats=MAX_REPEATS, using=None, label=None):
+        self.max = max
+        self.max_repeats = max_repeats
+        self.using = using
+        self.label = label
+        self.queries = []
+        self._wrapper = None
+
+    def __call__(self, view_func):
+        label = self.label or view_func.__name__
+
+        if iscoroutinefunction(view_func):
+            @wraps(view_func)
+            async def async_wrapper(*args, **kwargs):
+                if budget_mode() == 'off':
+                    return await view_func(*args, **kwargs)
+                budget = query_budget(self.max, self.max_repeats, self.using, label)
+                await sync_to_async(budget.__enter__)()
+                try:
+                    response = await view_func(*args, **kwargs)
+                except BaseException as exc:
+                    await sync_to_async(budget.__exit__)(type(exc), exc, exc.__traceback__)
+                    raise
+                await sync_to_async(budget.__exit__)(None, None, None)
+                return response
+
+            return async_wrapper
+
+        @wraps(view_func)
+        def wrapper(*args, **kwargs):
+            with query_budget(self.max, self.max_repeats, self.using, label):
+                return view_func(*args, **kwargs)
+
+        return wrapper
+
+    def _record(self, execute, sql, params, many, context):
+        if not _TRANSACTION_RE.match(sql):
+            self.queries.append(sql)
+        return execute(sql, params, many, context)
+
+    def __enter__(self):
+        self.mode = budget_mode()
+        if self.mode != 'off':
+            self._wrapper = connections[self.using or course_db()].execute_wrapper(self._record)
+            self._wrapper.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self._wrapper is None:
+            return
+        self._wrapper.__exit__(exc_type, exc_value, traceback)
+        self._wrapper = None
+        if exc_type is None:
+            self.check()
+
+    def violations(self):
+        """Retorna la lista de problemas encontrados en las consultas registradas."""
+        problems = []
+        if len(self.queries) > self.max:
+            problems.append(f'{len(self.queries)} consultas (presupuesto {self.max})')
+        shapes = Counter(
+            query_shape(sql) for sql in self.queries if sql.lstrip().upper().startswith('SELECT')
+        )
+        for shape, times in shapes.most_common():
+            if times <= self.max_repeats:
+                break
+            problems.append(f'consulta repetida {times} veces (posible N+1): {shape}')
+        return problems
+
+    def check(self):
+        problems = self.violations()
+        if not problems:
+            return
+        message = '{}: {}'.format(self.label or 'query_budget', '; '.join(problems))
+        if self.mode == 'raise':
+            raise QueryBudgetExceeded(message)
+        logger.warning(message)
@@ -0,0 +1,170 @@
+"""
+Importación masiva de estudiantes desde CSV o JSON.
+
+Los estudiantes existentes se cargan una sola vez en un índice en memoria por
+email y por nombre normalizado. Las filas nuevas se insertan con
+``bulk_create`` y las modificadas con ``bulk_update`` (con los campos
+normalizados precalculados), de modo que importar una lista completa toma un
+número constante de consultas.
+"""
+import csv
+import io
+import json
+
+from django.db import transaction
+
+from .caching import ROSTER, STUDENTS, bump_versions, student_scope
+from .models import Student, StudentAttendanceSummary, normalize_many, normalize_text
+
+# Nombres de columna aceptados para cada campo
+COLUMN_ALIASES = {
+    'first_name': ('first_name', 'nombre', 'nombres'),
+    'last_name': ('last_name', 'apellido', 'apellidos'),
+    'email': ('email', 'correo'),
+    'github_username': ('github_username', 'github', 'usuario github'),
+}
+
+UPDATABLE_FIELDS = ['first_name', 'last_name', 'email', 'github_username']
+
+
+def parse_roster(content, filename=''):
+    """
+    Convierte el contenido de un archivo CSV o JSON en una lista de filas.
+
+    El formato se detecta por la extensión de ``filename`` o, si no la hay,
+    por el primer carácter del contenido. Cada fila es un diccionario con las
+    llaves de ``COLUMN_ALIASES``. Lanza ``ValueError`` si el archivo no se
+    puede interpretar.
+    """
+    if isinstance(content, bytes):
+        content = content.decode('utf-8-sig')
+
+    try:
+        if filename.lower().endswith('.json') or content.lstrip().startswith('['):
+            raw_rows = json.loads(content)
+        else:
+            raw_rows = list(csv.DictReader(io.StringIO(content)))
+    except csv.Error as e:
+        raise ValueError(f'CSV inválido: {e}')
+
+    if not isinstance(raw_rows, list):
+        raise ValueError('Se esperaba una lista de estudiantes')
+
+    rows = []
+    for raw in raw_rows:
+        if not isinstance(raw, dict):
+            raise ValueError('Cada estudiante debe ser un objeto con sus campos')
+        raw = {str(key).strip().lower(): value for key, value in raw.items()}
+        row = {}
+        for field, aliases in COLUMN_ALIASES.items():
+            value = next((raw[alias] for alias in aliases if raw.get(alias)), '')
+            row[field] = str(value).strip()
+        rows.append(row)
+    return rows
+
+
+def _name_key(first_name, last_name):
+    return normalize_text(first_name), normalize_text(last_name)
+
+
+def import_roster(rows, course, dry_run=False):
+    """
+    Importa las filas en ``course`` deduplicando contra los estudiantes
+    existentes del curso.
+
+    Un estudiante coincide primero por email (sin distinguir mayúsculas) y
+    luego por nombre y apellido normalizados, esto último solo si la fila o
+    el estudiante no tienen email. Los campos vacíos de la fila no
+    sobrescriben los valores existentes y los estudiantes importados quedan
+    activos. Retorna un reporte con las filas creadas, actualizadas, sin
+    cambios y omitidas; con ``dry_run`` no se escribe nada.
+    """
+    db = course.db_alias
+    students = list(Student.objects.using(db).filter(course=course))
+    first_names = normalize_many([student.first_name for student in students])
+    last_names = normalize_many([student.last_name for student in students])
+
+    by_email = {}
+    by_name = {}
+    for student, name_key in zip(students, zip(first_names, last_names)):
+        if student.email:
+            by_email[student.email.lower()] = student
+        by_name[name_key] = student
+
+    to_create = []
+    to_update = {}
+    report = {'created': [], 'updated': [], 'unchanged': 0, 'skipped': []}
+
+    for line, row in enumerate(rows, start=1):
+        if not row['first_name'] or not row['last_name']:
+            report['skipped'].append({'line': line, 'reason': 'Nombre y apellido son obligatorios'})
+            continue
+
+        name_key = _name_key(row['first_name'], row['last_name'])
+        email = row['email'].lower()
+        student = by_email.get(email) if email else None
+        if student is None:
+            # Dos personas con el mismo nombre y emails distintos son distintas
+            namesake = by_name.get(name_key)
+            if namesake is not None and (not email or not namesake.email):
+                student = namesake
+
+        if student is None:
+            student = Student(
+                course=course,
+                first_name=row['first_name'],
+                last_name=row['last_name'],
+                email=row['email'] or None,
+                github_username=row['github_username'] or None,
+                is_active=True,
+            )
+            student.update_normalized_fields()
+            to_create.append(student)
+            report['created'].append({'line': line, 'name': student.full_name})
+        else:
+            changes = {}
+            for field in UPDATABLE_FIELDS:
+                value = row[field]
+                current = getattr(student, field)
+                if field == 'email' and current and value.lower() == current.lower():
+                    continue
+                # No reemplazar un nombre por una variante sin tildes o en otra capitalización
+                if field in ('first_name', 'last_name') and normalize_text(value) == normalize_text(current):
+                    continue
+                if value and value != current:
+                    changes[field] = (current, value)
+                    setattr(student, field, value)
+            if not student.is_active:
+                changes['is_active'] = (False, True)
+                student.is_active = True
+            if not changes:
+                report['unchanged'] += 1
+                continue
+            student.update_normalized_fields()
+            if student.pk is not None:
+                to_update[student.pk] = student
+            report['updated'].append({'line': line, 'name': student.full_name, 'changes': changes})
+
+        if student.email:
+            by_email[student.email.lower()] = student
+        by_name[_name_key(student.first_name, student.last_name)] = student
+
+    if dry_run:
+        return report
+
+    with transaction.atomic(using=db):
+        created = Student.objects.using(db).bulk_create(to_create)
+        StudentAttendanceSummary.objects.using(db).bulk_create(
+            [StudentAttendanceSummary(student=student) for student in created]
+        )
+        Student.objects.using(db).bulk_update(
+            to_update.values(),
+            UPDATABLE_FIELDS + ['is_active', 'last_name_normalized', 'first_name_normalized', 'email_local'],
+        )
+        changed_ids = [student.pk for student in created] + list(to_update)
+        if changed_ids:
+            transaction.on_commit(lambda: bump_versions(
+                ROSTER, STUDENTS, *(student_scope(student_id) for student_id in changed_ids), course_id=course.id
+            ), using=db)
+
+    return report
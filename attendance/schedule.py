@@ -0,0 +1,120 @@
+"""
+Calendario de sesiones de un curso.
+
+Las sesiones del periodo se precrean en bloque a partir del calendario del
+curso (``Course.term_start``, ``term_end`` y ``class_days``) con el comando
+``create_sessions`` o la acción del admin. La inserción usa
+``bulk_create(ignore_conflicts=True)`` (``ON CONFLICT DO NOTHING``), así que
+repetirla no duplica sesiones ni falla.
+
+Las vistas obtienen la sesión del día con ``todays_session``: el id se guarda
+en el caché y la sesión se lee por llave primaria, sin escribir nada. Solo si
+el día no estaba en el calendario se inserta la sesión con
+``ON CONFLICT DO NOTHING`` y se vuelve a leer, de modo que dos primeras
+peticiones simultáneas no chocan con la restricción única por curso y fecha.
+"""
+from datetime import date, timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+
+from .caching import ROSTER, bump_versions
+from .models import AttendanceSession, parse_class_days
+
+BATCH_SIZE = 500
+
+
+def session_description(day):
+    return f'Clase del {day.strftime("%d/%m/%Y")}'
+
+
+# ========================================
+# Calendario del periodo
+# ========================================
+
+def class_dates(start, end, weekdays, skip=()):
+    """Fechas entre ``start`` y ``end`` (inclusive) que caen en ``weekdays``, sin las de ``skip``."""
+    weekdays, skip = set(weekdays), set(skip)
+    days = []
+    day = start
+    while day <= end:
+        if day.weekday() in weekdays and day not in skip:
+            days.append(day)
+        day += timedelta(days=1)
+    return days
+
+
+def term_dates(course, skip=()):
+    """Fechas de clase del periodo de ``course``; lanza ``ValueError`` si el calendario está incompleto."""
+    weekdays = parse_class_days(course.class_days)
+    if not (course.term_start and course.term_end and weekdays):
+        raise ValueError('El curso no tiene definido su periodo y sus días de clase')
+    if course.term_start > course.term_end:
+        raise ValueError('El periodo termina antes de empezar')
+    return class_dates(course.term_start, course.term_end, weekdays, skip)
+
+
+def precreate_sessions(course, dates):
+    """
+    Crea las sesiones de ``course`` para ``dates`` que aún no existen, con una
+    lectura y una inserción por lote. Retorna cuántas sesiones se crearon.
+    """
+    if not dates:
+        return 0
+    sessions = AttendanceSession.objects.using(course.db_alias)
+    existing = set(
+        sessions.filter(course=course, date__range=(min(dates), max(dates))).values_list('date', flat=True)
+    )
+    new_sessions = [
+        AttendanceSession(course=course, date=day, description=session_description(day))
+        for day in sorted(set(dates) - existing)
+    ]
+    sessions.bulk_create(new_sessions, batch_size=BATCH_SIZE, ignore_conflicts=True)
+    if new_sessions:
+        # bulk_create no emite señales; el historial puede mostrar días pasados
+        bump_versions(ROSTER, course_id=course.id)
+    return len(new_sessions)
+
+
+# ========================================
+# Sesión del día
+# ========================================
+
+def _today_key(course_id, day):
+    return f'attendance:today:{course_id}:{day.isoformat()}'
+
+
+def todays_session(course, today=None):
+    """Retorna la sesión de ``course`` del día, creándola solo si no estaba en el calendario."""
+    today = today or date.today()
+    key = _today_key(course.id, today)
+    sessions = AttendanceSession.objects.using(course.db_alias)
+
+    session_id = cache.get(key)
+    if session_id is not None:
+        # La llave primaria ya identifica la sesión; el resto descarta un id obsoleto
+        session = sessions.filter(pk=session_id, course=course, date=today).first()
+    else:
+        session = None
+    if session is None:
+        session = sessions.filter(course=course, date=today).first()
+    if session is None:
+        sessions.bulk_create(
+            [AttendanceSession(course=course, date=today, description=session_description(today))],
+            ignore_conflicts=True,
+        )
+        session = sessions.get(course=course, date=today)
+    if session.pk != session_id:
+        cache.set(key, session.pk, settings.ATTENDANCE_CACHE_TIMEOUT)
+    return session
+
+
+async def atodays_session(course, today=None):
+    """Versión de ``todays_session`` para vistas ``async``."""
+    return await sync_to_async(todays_session)(course, today)
+
+
+def forget_session(session):
+    """Olvida el id cacheado de ``session`` (al eliminarla)."""
+    cache.delete(_today_key(session.course_id, session.date))
@@ -0,0 +1,147 @@
+"""
+Búsqueda de estudiantes sin distinguir acentos ni mayúsculas.
+
+Usa el índice FTS5 ``attendance_student_fts`` (creado por la migración 0015
+sobre los campos normalizados) cuando está disponible. En otro caso se usa un
+índice de prefijos en memoria: una lista ordenada de palabras normalizadas en
+la que los prefijos se buscan con ``bisect``, equivalente a recorrer un trie.
+El índice se construye en la primera búsqueda y se reconstruye cuando cambia
+la versión ``STUDENTS`` del curso (guardar asistencia no la cambia). Las búsquedas se limitan a un curso y
+usan la base de datos del curso.
+"""
+import re
+import threading
+from bisect import bisect_left
+
+from django.db import connections
+
+from .caching import STUDENTS, get_versions
+from .models import Student, normalize_text
+from .tenancy import current_course
+
+FTS_TABLE = 'attendance_student_fts'
+SEARCH_LIMIT = 10
+
+_WORD_RE = re.compile(r'[^\W_]+')
+
+
+def _tokens(query):
+    return _WORD_RE.findall(normalize_text(query))
+
+
+# ========================================
+# FTS5
+# ========================================
+
+_fts_tables = {}
+
+
+def fts_available(using):
+    """Indica si la base de datos ``using`` tiene el índice FTS5 de estudiantes."""
+    connection = connections[using]
+    if connection.alias not in _fts_tables:
+        _fts_tables[connection.alias] = (
+            connection.vendor == 'sqlite'
+            and FTS_TABLE in connection.introspection.table_names()
+        )
+    return _fts_tables[connection.alias]
+
+
+def _search_fts(course, tokens, limit):
+    match = ' '.join(f'"{token}"*' for token in tokens)
+    with connections[course.db_alias].cursor() as cursor:
+        cursor.execute(
+            f'SELECT s.id, s.first_name, s.last_name, s.email '
+            f'FROM {FTS_TABLE} f JOIN attendance_student s ON s.id = f.rowid '
+            f'WHERE {FTS_TABLE} MATCH %s AND s.is_active AND s.course_id = %s '
+            f'ORDER BY f.rank, s.last_name_normalized LIMIT %s',
+            [match, course.id, limit],
+        )
+        return cursor.fetchall()
+
+
+# ========================================
+# Índice de prefijos en memoria
+# ========================================
+
+class PrefixIndex:
+    """Índice inmutable de palabras normalizadas → ids de estudiantes."""
+    __slots__ = ('version', 'words', 'ids', 'students')
+
+    def __init__(self, version, rows):
+        self.version = version
+        self.students = {}
+        entries = set()
+        for student_id, first_name, last_name, email, *normalized in rows:
+            self.students[student_id] = (student_id, first_name, last_name, email)
+            for value in normalized:
+                for word in _WORD_RE.findall(value):
+                    entries.add((word, student_id))
+        entries = sorted(entries)
+        self.words = [word for word, _ in entries]
+        self.ids = [student_id for _, student_id in entries]
+
+    def lookup(self, prefix):
+        """Retorna el conjunto de ids con alguna palabra que empieza por ``prefix``."""
+        matches = set()
+        position = bisect_left(self.words, prefix)
+        while position < len(self.words) and self.words[position].startswith(prefix):
+            matches.add(self.ids[position])
+            position += 1
+        return matches
+
+    def search(self, tokens, limit):
+        matches = None
+        for token in tokens:
+            found = self.lookup(token)
+            matches = found if matches is None else matches & found
+            if not matches:
+                return []
+        results = sorted((self.students[student_id] for student_id in matches),
+                         key=lambda row: (normalize_text(row[2]), normalize_text(row[1])))
+        return results[:limit]
+
+
+# Un índice por curso
+_indexes = {}
+_index_lock = threading.Lock()
+
+
+def get_prefix_index(course):
+    """Retorna el índice en memoria del curso, reconstruyéndolo si cambió su listado de estudiantes."""
+    version = get_versions(STUDENTS, course_id=course.id)[0]
+    index = _indexes.get(course.id)
+    if index is None or index.version != version:
+        with _index_lock:
+            index = _indexes.get(course.id)
+            if index is None or index.version != version:
+                rows = Student.objects.using(course.db_alias).filter(course=course, is_active=True).values_list(
+                    'id', 'first_name', 'last_name', 'email',
+                    'first_name_normalized', 'last_name_normalized', 'email_local',
+                )
+                index = _indexes[course.id] = PrefixIndex(version, rows)
+    return index
+
+
+# ========================================
+# API
+# ========================================
+
+def search_students(query, limit=SEARCH_LIMIT, backend=None, course=None):
+    """
+    Busca estudiantes activos de ``course`` (por defecto el curso activo)
+    cuyas palabras empiecen por cada término de ``query``.
+
+    Retorna ``(backend, resultados)``, donde cada resultado es una tupla
+    ``(id, first_name, last_name, email)``. ``backend`` puede forzarse a
+    ``'fts5'`` o ``'trie'``.
+    """
+    course = course or current_course()
+    tokens = _tokens(query)
+    if backend is None:
+        backend = 'fts5' if fts_available(course.db_alias) else 'trie'
+    if not tokens:
+        return backend, []
+    if backend == 'fts5':
+        return backend, _search_fts(course, tokens, limit)
+    return backend, get_prefix_index(course).search(tokens, limit)
@@ -0,0 +1,470 @@
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Count, F, Value
+from django.db.models.functions import Coalesce
+from django.http import Http404
+
+from .bitmaps import invalidate_bitmaps
+from .caching import ROSTER, bump_versions, session_scope, student_scope
+from .events import publish_session_update
+from .tenancy import course_db
+from .models import (
+    Student, AttendanceSession, AttendanceRecord, Competency, StudentCompetency,
+    StudentAttendanceSummary, SessionAttendanceSummary,
+)
+
+
+class AttendanceConflict(Exception):
+    """
+    Otro usuario cambió la asistencia después de la versión en la que se basa
+    una escritura. ``version`` es la versión actual de la sesión y
+    ``conflicts`` la lista ``(student_id, is_present, version)`` del estado
+    actual de los registros en conflicto.
+    """
+
+    def __init__(self, version, conflicts):
+        super().__init__(f'{len(conflicts)} registros cambiaron desde la versión enviada')
+        self.version = version
+        self.conflicts = conflicts
+
+
+def _write_attendance(session, attendance_data, base_version=None):
+    """
+    Valida y escribe ``{student_id: is_present}`` para una sesión.
+
+    Valida todos los estudiantes (del curso de la sesión) con una sola
+    consulta ``in_bulk`` y escribe
+    los registros que cambian con un único ``bulk_create`` (upsert) dentro de
+    una transacción, junto con la actualización incremental de los resúmenes
+    y de la versión de la sesión. En la primera escritura de la sesión los
+    estudiantes activos que no vienen en los datos se registran como
+    ausentes, para que la sesión tenga un registro por estudiante. Retorna
+    ``(attendance, changed)``: los datos normalizados (con esos ausentes) y
+    los ids de los estudiantes cuya asistencia cambió. Al confirmarse, los
+    cambios se publican a los espectadores de la sesión.
+
+    Con ``base_version`` (la versión de la sesión que vio el cliente) la
+    escritura es optimista: si algún estudiante enviado fue modificado por
+    otro usuario después de esa versión y con un valor distinto, se lanza
+    ``AttendanceConflict`` sin escribir nada. Los cambios de otros usuarios
+    sobre estudiantes distintos no generan conflicto.
+    """
+    attendance = {
+        int(student_id): bool(is_present)
+        for student_id, is_present in attendance_data.items()
+    }
+
+    students = Student.objects.filter(course_id=session.course_id).in_bulk(list(attendance))
+    missing = set(attendance) - set(students)
+    if missing:
+        raise Http404(f'Estudiantes no encontrados: {sorted(missing)}')
+
+    db = course_db()
+    with transaction.atomic(using=db):
+        current_version = AttendanceSession.objects.filter(pk=session.pk).values_list('version', flat=True).get()
+        previous = {
+            student_id: (is_present, version)
+            for student_id, is_present, version in session.records.values_list('student_id', 'is_present', 'version')
+        }
+        if not previous:
+            # Primera escritura: los clientes envían solo las casillas que
+            # cambiaron, así que el resto de la lista activa queda ausente
+            roster = Student.objects.filter(course_id=session.course_id, is_active=True).values_list('id', flat=True)
+            attendance = {**dict.fromkeys(roster, False), **attendance}
+
+        if base_version is not None:
+            conflicts = [
+                (student_id, *previous[student_id])
+                for student_id, is_present in attendance.items()
+                if student_id in previous
+                and previous[student_id][1] > base_version
+                and previous[student_id][0] != is_present
+            ]
+            if conflicts:
+                raise AttendanceConflict(current_version, conflicts)
+
+        changes = {
+            student_id: is_present
+            for student_id, is_present in attendance.items()
+            if previous.get(student_id, (None,))[0] != is_present
+        }
+        if not changes:
+            return attendance, []
+
+        # Un solo UPDATE condicional: si otra transacción escribió desde la
+        # lectura anterior no se actualiza ninguna fila y se rechaza la escritura
+        new_version = current_version + 1
+        if not AttendanceSession.objects.filter(pk=session.pk, version=current_version).update(version=new_version):
+            raise AttendanceConflict(current_version, [])
+
+        AttendanceRecord.objects.bulk_create(
+            [
+                AttendanceRecord(student_id=student_id, session=session, is_present=is_present, version=new_version)
+                for student_id, is_present in changes.items()
+            ],
+            update_conflicts=True,
+            unique_fields=['student', 'session'],
+            update_fields=['is_present', 'version', 'updated_at'],
+        )
+        changed = update_attendance_summaries(
+            session, changes, {student_id: state[0] for student_id, state in previous.items()}
+        )
+        transaction.on_commit(lambda: bump_versions(
+            session_scope(session.id), ROSTER, *(student_scope(student_id) for student_id in changed),
+            course_id=session.course_id,
+        ), using=db)
+        # Un fallo al notificar a los espectadores no debe afectar la escritura
+        transaction.on_commit(
+            lambda: publish_session_update(session, new_version, changes), using=db, robust=True
+        )
+
+    session.version = new_version
+    return attendance, changed
+
+
+def bulk_save_attendance(session, attendance_data, base_version=None):
+    """
+    Guarda en bloque la asistencia de una sesión.
+
+    Retorna una tupla ``(present_count, absent_count)`` calculada a partir
+    de los datos recibidos. Ver ``_write_attendance`` para ``base_version``.
+    """
+    attendance, _ = _write_attendance(session, attendance_data, base_version)
+    present_count = sum(1 for is_present in attendance.values() if is_present)
+    return present_count, len(attendance) - present_count
+
+
+def apply_attendance_changes(session, changes, base_version=None):
+    """
+    Aplica un lote de cambios ``{student_id: is_present}`` enviado por el
+    diario de cambios del cliente.
+
+    Cada cambio es el estado final del estudiante y no un "alternar", así que
+    aplicar dos veces el mismo lote (un reintento cuya respuesta se perdió)
+    no tiene efecto. Retorna ``(version, changed, summary)`` con la versión
+    resultante de la sesión, los ids que cambiaron y el resumen de la sesión.
+    """
+    _, changed = _write_attendance(session, changes, base_version)
+    version, present, absent, total = (
+        AttendanceSession.objects.filter(pk=session.pk)
+        .annotate(
+            present=Coalesce('summary__present_count', Value(0)),
+            absent=Coalesce('summary__absent_count', Value(0)),
+            total=Coalesce('summary__total_count', Value(0)),
+        )
+        .values_list('version', 'present', 'absent', 'total')
+        .get()
+    )
+    session.version = version
+    return version, changed, {'present_count': present, 'absent_count': absent, 'total_count': total}
+
+
+def bulk_save_competencies(student, competencies_data):
+    """
+    Guarda en bloque el estado de las competencias de un estudiante.
+
+    Valida las competencias con una sola consulta ``in_bulk`` y las escribe
+    con un único ``bulk_create`` (upsert).
+    """
+    achieved = {
+        int(competency_id): bool(is_achieved)
+        for competency_id, is_achieved in competencies_data.items()
+    }
+
+    competencies = Competency.objects.in_bulk(list(achieved))
+    missing = set(achieved) - set(competencies)
+    if missing:
+        raise Http404(f'Competencias no encontradas: {sorted(missing)}')
+
+    StudentCompetency.objects.bulk_create(
+        [
+            StudentCompetency(student=student, competency_id=competency_id, is_achieved=is_achieved)
+            for competency_id, is_achieved in achieved.items()
+        ],
+        update_conflicts=True,
+        unique_fields=['student', 'competency'],
+        update_fields=['is_achieved', 'updated_at'],
+    )
+    transaction.on_commit(
+        lambda: bump_versions(student_scope(student.id), ROSTER, course_id=student.course_id), using=course_db()
+    )
+
+
+def save_competency_grid(course, grid):
+    """
+    Guarda en bloque celdas de la matriz de competencias de un curso.
+
+    ``grid`` es ``{student_id: {competency_id: is_achieved}}``. Valida los
+    estudiantes (del curso) y las competencias con una consulta ``in_bulk``
+    por modelo, lee el estado actual de esas celdas y escribe solo las que
+    cambian con un único ``bulk_create`` (upsert). Retorna ``(changed,
+    totals)``: el número de celdas escritas y las competencias logradas por
+    cada estudiante enviado.
+    """
+    cells = {
+        (int(student_id), int(competency_id)): bool(is_achieved)
+        for student_id, row in grid.items()
+        for competency_id, is_achieved in row.items()
+    }
+    student_ids = {student_id for student_id, _ in cells}
+    competency_ids = {competency_id for _, competency_id in cells}
+
+    students = Student.objects.filter(course=course).in_bulk(list(student_ids))
+    missing = student_ids - set(students)
+    if missing:
+        raise Http404(f'Estudiantes no encontrados: {sorted(missing)}')
+    competencies = Competency.objects.in_bulk(list(competency_ids))
+    missing = competency_ids - set(competencies)
+    if missing:
+        raise Http404(f'Competencias no encontradas: {sorted(missing)}')
+
+    db = course_db()
+    with transaction.atomic(using=db):
+        current = {
+            (student_id, competency_id): is_achieved
+            for student_id, competency_id, is_achieved in StudentCompetency.objects.filter(
+                student_id__in=student_ids, competency_id__in=competency_ids,
+            ).values_list('student_id', 'competency_id', 'is_achieved')
+        }
+        changes = {cell: is_achieved for cell, is_achieved in cells.items() if current.get(cell) != is_achieved}
+        if changes:
+            StudentCompetency.objects.bulk_create(
+                [
+                    StudentCompetency(student_id=student_id, competency_id=competency_id, is_achieved=is_achieved)
+                    for (student_id, competency_id), is_achieved in changes.items()
+                ],
+                update_conflicts=True,
+                unique_fields=['student', 'competency'],
+                update_fields=['is_achieved', 'updated_at'],
+            )
+            changed_students = {student_id for student_id, _ in changes}
+            transaction.on_commit(lambda: bump_versions(
+                ROSTER, *(student_scope(student_id) for student_id in changed_students), course_id=course.id
+            ), using=db)
+
+    return len(changes), competency_totals(student_ids)
+
+
+def competency_totals(student_ids):
+    """Retorna ``{student_id: logradas}`` con una sola consulta agregada."""
+    totals = dict.fromkeys(student_ids, 0)
+    totals.update(
+        StudentCompetency.objects.filter(student_id__in=student_ids, is_achieved=True)
+        .values('student_id')
+        .annotate(achieved=Count('id'))
+        .values_list('student_id', 'achieved')
+    )
+    return totals
+
+
+# ========================================
+# Resúmenes de asistencia
+# ========================================
+
+def _summary_deltas(present, absent, total):
+    return {
+        'present_count': F('present_count') + present,
+        'absent_count': F('absent_count') + absent,
+        'total_count': F('total_count') + total,
+    }
+
+
+def update_attendance_summaries(session, attendance, previous):
+    """
+    Aplica de forma incremental a las tablas de resumen los cambios entre
+    ``previous`` y ``attendance`` (ambos ``{student_id: is_present}``).
+
+    Los estudiantes se agrupan por tipo de cambio, de modo que el número de
+    consultas es constante sin importar el tamaño del grupo. Retorna los ids
+    de los estudiantes cuya asistencia cambió.
+    """
+    groups = {}
+    for student_id, is_present in attendance.items():
+        was_present = previous.get(student_id)
+        if was_present is None:
+            delta = (1, 0, 1) if is_present else (0, 1, 1)
+        elif was_present != is_present:
+            delta = (1, -1, 0) if is_present else (-1, 1, 0)
+        else:
+            continue
+        groups.setdefault(delta, []).append(student_id)
+
+    if not groups:
+        return []
+
+    new_student_ids = [student_id for student_id in attendance if student_id not in previous]
+    if new_student_ids:
+        StudentAttendanceSummary.objects.bulk_create(
+            [StudentAttendanceSummary(student_id=student_id) for student_id in new_student_ids],
+            ignore_conflicts=True,
+        )
+    SessionAttendanceSummary.objects.bulk_create(
+        [SessionAttendanceSummary(session=session)],
+        ignore_conflicts=True,
+    )
+
+    for delta, student_ids in groups.items():
+        StudentAttendanceSummary.objects.filter(student_id__in=student_ids).update(
+            **_summary_deltas(*delta)
+        )
+
+    session_delta = [
+        sum(delta[i] * len(student_ids) for delta, student_ids in groups.items())
+        for i in range(3)
+    ]
+    SessionAttendanceSummary.objects.filter(session=session).update(
+        **_summary_deltas(*session_delta)
+    )
+    return [student_id for student_ids in groups.values() for student_id in student_ids]
+
+
+def discount_student_from_summaries(student_id, course, using=None):
+    """
+    Descuenta de los resúmenes de las sesiones de ``course`` los registros de
+    un estudiante que se va a eliminar.
+    """
+    SessionAttendanceSummary.objects.using(using).filter(
+        session__course=course,
+        session__records__student_id=student_id,
+        session__records__is_present=True,
+    ).update(**_summary_deltas(-1, 0, -1))
+    SessionAttendanceSummary.objects.using(using).filter(
+        session__course=course,
+        session__records__student_id=student_id,
+        session__records__is_present=False,
+    ).update(**_summary_deltas(0, -1, -1))
+
+
+def discount_session_from_summaries(session_id, using=None):
+    """
+    Descuenta de los resúmenes de los estudiantes los registros de una sesión
+    que se va a eliminar.
+    """
+    StudentAttendanceSummary.objects.using(using).filter(
+        student__attendance_records__session_id=session_id,
+        student__attendance_records__is_present=True,
+    ).update(**_summary_deltas(-1, 0, -1))
+    StudentAttendanceSummary.objects.using(using).filter(
+        student__attendance_records__session_id=session_id,
+        student__attendance_records__is_present=False,
+    ).update(**_summary_deltas(0, -1, -1))
+
+
+def discount_records_from_summaries(records):
+    """
+    Descuenta de los resúmenes los registros ``(student_id, session_id,
+    is_present)`` que se van a eliminar o a reemplazar.
+
+    Los estudiantes y las sesiones se agrupan por número de registros
+    descontados, así que el número de consultas no crece con los registros.
+    """
+    for summary_model, position in ((StudentAttendanceSummary, 0), (SessionAttendanceSummary, 1)):
+        counts = Counter((record[position], record[2]) for record in records)
+        groups = {}
+        for (owner_id, is_present), n in counts.items():
+            groups.setdefault((is_present, n), []).append(owner_id)
+        field = 'student_id__in' if summary_model is StudentAttendanceSummary else 'session_id__in'
+        for (is_present, n), owner_ids in groups.items():
+            delta = (-n, 0, -n) if is_present else (0, -n, -n)
+            summary_model.objects.filter(**{field: owner_ids}).update(**_summary_deltas(*delta))
+
+
+def _invalidate_records(records):
+    """Invalida las páginas y mapas de bits de los registros ``(student_id, session_id, is_present, course_id)``."""
+    scopes = {}
+    for student_id, session_id, _, course_id in records:
+        scopes.setdefault(course_id, set()).update((student_scope(student_id), session_scope(session_id)))
+
+    def invalidate():
+        for course_id, course_scopes in scopes.items():
+            bump_versions(ROSTER, *course_scopes, course_id=course_id)
+            invalidate_bitmaps(course_id)
+
+    transaction.on_commit(invalidate, using=course_db())
+
+
+def save_record(record):
+    """
+    Guarda un registro suelto (el admin de ``AttendanceRecord``) aplicando a
+    los resúmenes la diferencia con su estado anterior.
+    """
+    with transaction.atomic(using=course_db()):
+        previous = list(
+            AttendanceRecord.objects.filter(pk=record.pk)
+            .values_list('student_id', 'session_id', 'is_present', 'session__course_id')
+        ) if record.pk else []
+        record.save()
+        discount_records_from_summaries(previous)
+        update_attendance_summaries(record.session, {record.student_id: record.is_present}, {})
+        _invalidate_records(previous + [(record.student_id, record.session_id, record.is_present, record.session.course_id)])
+
+
+def delete_records(queryset):
+    """Elimina los registros de ``queryset`` descontándolos de los resúmenes."""
+    with transaction.atomic(using=course_db()):
+        records = list(queryset.values_list('student_id', 'session_id', 'is_present', 'session__course_id'))
+        discount_records_from_summaries(records)
+        queryset.delete()
+        _invalidate_records(records)
+
+
+def rebuild_attendance_summaries(dry_run=False):
+    """
+    Recalcula desde cero los resúmenes de asistencia de la base de datos del
+    curso activo (todos los cursos que comparten esa base).
+
+    Retorna una lista de tuplas ``(objeto, esperado, almacenado)`` con las
+    diferencias encontradas, donde ``esperado`` y ``almacenado`` son tuplas
+    ``(present, absent, total)``; ``almacenado`` es ``None`` si no existía
+    el resumen. Con ``dry_run`` solo se reportan las diferencias.
+    """
+    drift = []
+    targets = (
+        (Student.objects.with_attendance_stats(), StudentAttendanceSummary, 'student'),
+        (AttendanceSession.objects.with_attendance_stats(), SessionAttendanceSummary, 'session'),
+    )
+
+    db = course_db()
+    with transaction.atomic(using=db):
+        for queryset, summary_model, field in targets:
+            stored = {
+                row[0]: row[1:]
+                for row in summary_model.objects.values_list(
+                    f'{field}_id', 'present_count', 'absent_count', 'total_count'
+                )
+            }
+            summaries = []
+            for obj in queryset:
+                expected = (obj.num_present, obj.num_absent, obj.num_records)
+                current = stored.get(obj.id)
+                if current != expected:
+                    drift.append((obj, expected, current))
+                    summaries.append(summary_model(**{
+                        field: obj,
+                        'present_count': expected[0],
+                        'absent_count': expected[1],
+                        'total_count': expected[2],
+                    }))
+
+            if summaries and not dry_run:
+                summary_model.objects.bulk_create(
+                    summaries,
+                    update_conflicts=True,
+                    unique_fields=[field],
+                    update_fields=['present_count', 'absent_count', 'total_count', 'updated_at'],
+                )
+
+        if drift and not dry_run:
+            scopes = {}
+            for obj, _, _ in drift:
+                scope = student_scope(obj.id) if isinstance(obj, Student) else session_scope(obj.id)
+                scopes.setdefault(obj.course_id, []).append(scope)
+
+            def invalidate():
+                for course_id, course_scopes in scopes.items():
+                    bump_versions(ROSTER, *course_scopes, course_id=course_id)
+
+            transaction.on_commit(invalidate, using=db)
+
+    return drift
@@ -0,0 +1,57 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, pre_delete
+from django.dispatch import receiver
+
+from .caching import ROSTER, STUDENTS, COMPETENCIES, COURSES, bump_versions, student_scope
+from .models import Course, Student, Competency, AttendanceSession, AttendanceRecord
+from .bitmaps import invalidate_bitmaps
+from .schedule import forget_session
+from .services import discount_session_from_summaries, discount_student_from_summaries
+from .tenancy import invalidate_courses
+
+
+@receiver(post_save, sender=Student)
+@receiver(post_delete, sender=Student)
+def invalidate_student_pages(sender, instance, **kwargs):
+    """Invalida las páginas cacheadas y la lista de estudiantes que muestran al estudiante."""
+    bump_versions(student_scope(instance.pk), ROSTER, STUDENTS, course_id=instance.course_id)
+
+
+@receiver(pre_delete, sender=Student)
+def discount_deleted_student(sender, instance, using, **kwargs):
+    """Descuenta los registros del estudiante de los resúmenes de sus sesiones."""
+    discount_student_from_summaries(instance.pk, instance.course_id, using=using)
+
+
+@receiver(post_save, sender=Competency)
+@receiver(post_delete, sender=Competency)
+def invalidate_competency_pages(sender, instance, **kwargs):
+    """Invalida las páginas cacheadas que listan las competencias."""
+    bump_versions(COMPETENCIES)
+
+
+@receiver(post_save, sender=Course)
+@receiver(post_delete, sender=Course)
+def invalidate_course_pages(sender, instance, **kwargs):
+    """Invalida la lista de cursos y las páginas que muestran el selector de cursos."""
+    invalidate_courses()
+    bump_versions(COURSES)
+
+
+@receiver(pre_delete, sender=AttendanceSession)
+def discount_deleted_session(sender, instance, using, **kwargs):
+    """Descuenta los registros de la sesión de los resúmenes de sus estudiantes."""
+    student_ids = list(
+        AttendanceRecord.objects.using(using).filter(session_id=instance.pk).values_list('student_id', flat=True)
+    )
+    if student_ids:
+        discount_session_from_summaries(instance.pk, using=using)
+        bump_versions(ROSTER, *(student_scope(student_id) for student_id in student_ids), course_id=instance.course_id)
+
+
+@receiver(post_delete, sender=AttendanceSession)
+def forget_todays_session(sender, instance, using, **kwargs):
+    """Olvida el id cacheado de la sesión del día y el mapa de bits del curso."""
+    forget_session(instance)
+    # Después de confirmar, para que ningún proceso rearme el mapa con la sesión
+    transaction.on_commit(lambda: invalidate_bitmaps(instance.course_id), using=using)
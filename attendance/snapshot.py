@@ -0,0 +1,85 @@
+"""
+Instantánea de la lista de estudiantes de un curso.
+
+La lista cambia pocas veces por periodo, pero ``index``, ``edit_session`` y
+``students_manage`` la necesitan en cada petición. ``roster_snapshot`` la
+arma con una sola consulta ``values_list`` (sin instanciar modelos) en tuplas
+``RosterEntry`` inmutables, ordenadas como ``Student.Meta.ordering``, y la
+guarda en la memoria del proceso y en el caché de Django bajo la versión del
+alcance ``STUDENTS`` del curso.
+
+Esa versión solo cambia cuando cambian los estudiantes: las señales
+``post_save``/``post_delete`` de ``Student``, los ``update(is_active=...)`` de
+``students_manage``, la importación de listas y ``move_course``. Guardar
+asistencia no la invalida (a diferencia de ``ROSTER``, que también cubre las
+estadísticas). La versión se lee del caché compartido de versiones
+(``caching.VERSION_CACHE``) en cada llamada, así que un cambio hecho en otro
+proceso invalida también la copia en memoria de este; un acierto en memoria
+solo cuesta esa lectura.
+"""
+from typing import NamedTuple
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .caching import STUDENTS, get_versions
+from .models import Student
+
+_FIELDS = ('id', 'first_name', 'last_name', 'email', 'github_username', 'is_active')
+
+# course_id -> (versión, RosterSnapshot); un solo snapshot por curso
+_snapshots = {}
+
+
+class RosterEntry(NamedTuple):
+    """Estudiante de la instantánea; expone los atributos que usan las plantillas."""
+    id: int
+    first_name: str
+    last_name: str
+    email: str
+    github_username: str
+    is_active: bool
+
+    @property
+    def full_name(self):
+        return f"{self.first_name} {self.last_name}"
+
+
+class RosterSnapshot(NamedTuple):
+    active: tuple
+    inactive: tuple
+
+
+def _snapshot_key(course_id, version):
+    return f'attendance:roster:{course_id}:{version}'
+
+
+def build_roster_snapshot(course):
+    """Lee los estudiantes de ``course`` con una consulta y arma la instantánea."""
+    entries = [
+        RosterEntry(*row)
+        for row in Student.objects.using(course.db_alias)
+        .filter(course=course)
+        .order_by('last_name_normalized', 'first_name', 'id')
+        .values_list(*_FIELDS)
+    ]
+    return RosterSnapshot(
+        active=tuple(entry for entry in entries if entry.is_active),
+        inactive=tuple(entry for entry in entries if not entry.is_active),
+    )
+
+
+def roster_snapshot(course):
+    """Retorna la instantánea vigente de ``course`` (memoria, luego caché, luego una consulta)."""
+    version, = get_versions(STUDENTS, course_id=course.id)
+    held = _snapshots.get(course.id)
+    if held is not None and held[0] == version:
+        return held[1]
+
+    key = _snapshot_key(course.id, version)
+    snapshot = cache.get(key)
+    if snapshot is None:
+        snapshot = build_roster_snapshot(course)
+        cache.set(key, snapshot, settings.ATTENDANCE_CACHE_TIMEOUT)
+    _snapshots[course.id] = (version, snapshot)
+    return snapshot
@@ -5,7 +5,11 @@
 
 document.addEventListener('DOMContentLoaded', function() {
     initThemeToggle();
-    initAttendanceControls();
+    const sync = initAttendanceControls();
+    initStudentSearch();
+    initLiveUpdates(sync);
+    initStatsPolling();
+    initHistoryLoadMore();
 });
 
 /* ========================================
@@ -41,31 +45,422 @@ function initAttendanceControls() {
     const deselectAllBtn = document.getElementById('deselectAll');
     const checkboxes = document.querySelectorAll('.student-checkbox');
     
+    // Pages that expose a sync URL save each change through the offline journal
+    const sync = typeof SESSION_SYNC_URL !== 'undefined'
+        ? new AttendanceSync(SESSION_SYNC_URL, SESSION_ID, SESSION_VERSION)
+        : null;
+    
+    function setAll(checked) {
+        const changed = Array.from(checkboxes).filter(cb => cb.checked !== checked);
+        changed.forEach(cb => cb.checked = checked);
+        updateStats();
+        if (sync) sync.record(changed);
+    }
+    
     // Select All
     if (selectAllBtn) {
-        selectAllBtn.addEventListener('click', function() {
-            checkboxes.forEach(cb => cb.checked = true);
-            updateStats();
-        });
+        selectAllBtn.addEventListener('click', () => setAll(true));
     }
     
     // Deselect All
     if (deselectAllBtn) {
-        deselectAllBtn.addEventListener('click', function() {
-            checkboxes.forEach(cb => cb.checked = false);
-            updateStats();
-        });
+        deselectAllBtn.addEventListener('click', () => setAll(false));
     }
     
     // Update stats on checkbox change
     checkboxes.forEach(checkbox => {
-        checkbox.addEventListener('change', updateStats);
+        checkbox.addEventListener('change', function() {
+            updateStats();
+            if (sync) sync.record([checkbox]);
+        });
     });
     
+    // Remember the saved state so edits only send what changed
+    checkboxes.forEach(cb => cb.dataset.saved = cb.checked);
+    
     // Save Attendance
     if (saveBtn) {
-        saveBtn.addEventListener('click', saveAttendance);
+        let save = saveAttendance;
+        if (sync) {
+            save = () => sync.flush(true);
+        } else if (typeof SAVE_URL !== 'undefined') {
+            save = saveSessionEdits;
+        }
+        saveBtn.addEventListener('click', save);
+    }
+    
+    if (sync) sync.start(checkboxes);
+    return sync;
+}
+
+/* ========================================
+   Session Editing (optimistic concurrency)
+   ======================================== */
+
+// Version of the session the page is based on (SESSION_VERSION until the first save)
+let sessionVersion = null;
+
+/**
+ * Sends only the students changed on this page together with the session
+ * version they were based on. If another editor changed any of them the
+ * server answers 409 with their current state, which is shown to the user
+ * before saving again.
+ */
+async function saveSessionEdits() {
+    const saveBtn = document.getElementById('saveAttendance');
+    const btnText = saveBtn.querySelector('.btn-text');
+    const btnLoading = saveBtn.querySelector('.btn-loading');
+    
+    const changed = Array.from(document.querySelectorAll('.student-checkbox'))
+        .filter(cb => String(cb.checked) !== cb.dataset.saved);
+    if (!changed.length) {
+        showToast('No hay cambios por guardar', 'success');
+        return;
+    }
+    
+    const attendanceData = {};
+    changed.forEach(cb => attendanceData[cb.getAttribute('data-student-id')] = cb.checked);
+    if (sessionVersion === null) sessionVersion = SESSION_VERSION;
+    
+    btnText.style.display = 'none';
+    btnLoading.style.display = 'inline';
+    saveBtn.disabled = true;
+    
+    try {
+        const response = await fetch(SAVE_URL, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ attendance: attendanceData, version: sessionVersion })
+        });
+        const result = await response.json();
+        
+        if (response.status === 409) {
+            sessionVersion = result.version;
+            applyServerState(result.conflicts);
+            showToast(result.error, 'error');
+        } else if (result.success) {
+            sessionVersion = result.version;
+            changed.forEach(cb => cb.dataset.saved = cb.checked);
+            showToast('✓ ' + result.message, 'success');
+            // Redirect back to detail after short delay
+            setTimeout(() => {
+                window.location.href = '/session/' + SESSION_ID + '/';
+            }, 1500);
+        } else {
+            showToast('Error: ' + (result.error || 'No se pudo guardar'), 'error');
+        }
+    } catch (error) {
+        console.error('Error saving attendance:', error);
+        showToast('Error al guardar la asistencia', 'error');
+    } finally {
+        btnText.style.display = 'inline';
+        btnLoading.style.display = 'none';
+        saveBtn.disabled = false;
+    }
+}
+
+// Shows the current server state of records changed by another editor
+function applyServerState(conflicts) {
+    conflicts.forEach(conflict => {
+        const checkbox = document.querySelector(`.student-checkbox[data-student-id="${conflict.student_id}"]`);
+        if (!checkbox) return;
+        checkbox.checked = conflict.is_present;
+        checkbox.dataset.saved = conflict.is_present;
+        checkbox.closest('.student-card').classList.add('conflict');
+    });
+    updateStats();
+}
+
+/* ========================================
+   Offline Attendance Journal
+   ======================================== */
+
+const JOURNAL_DB = 'attendance-journal';
+const JOURNAL_STORE = 'changes';
+const SYNC_DEBOUNCE_MS = 400;
+const SYNC_RETRY_MIN_MS = 1000;
+const SYNC_RETRY_MAX_MS = 60000;
+
+/**
+ * Local change journal with one entry per (session, student) holding the
+ * latest state, so repeated taps on the same student are coalesced.
+ * Entries live in IndexedDB and survive reloads; falls back to memory
+ * when IndexedDB is unavailable.
+ */
+class AttendanceJournal {
+    constructor(sessionId) {
+        this.sessionId = sessionId;
+        this.memory = new Map();
+        this.stamp = Date.now();
+        this.db = this.open();
+    }
+    
+    open() {
+        if (!window.indexedDB) return Promise.resolve(null);
+        return new Promise(resolve => {
+            const request = indexedDB.open(JOURNAL_DB, 1);
+            request.onupgradeneeded = () => {
+                request.result.createObjectStore(JOURNAL_STORE, { keyPath: ['sessionId', 'studentId'] });
+            };
+            request.onsuccess = () => resolve(request.result);
+            request.onerror = () => resolve(null);
+        });
+    }
+    
+    async run(mode, callback) {
+        const db = await this.db;
+        if (!db) return callback(null);
+        return new Promise((resolve, reject) => {
+            const tx = db.transaction(JOURNAL_STORE, mode);
+            let result;
+            Promise.resolve(callback(tx.objectStore(JOURNAL_STORE))).then(value => result = value);
+            tx.oncomplete = () => resolve(result);
+            tx.onerror = () => reject(tx.error);
+        });
+    }
+    
+    put(changes) {
+        const entries = changes.map(change => ({
+            sessionId: this.sessionId,
+            studentId: change.studentId,
+            isPresent: change.isPresent,
+            stamp: ++this.stamp,
+        }));
+        return this.run('readwrite', store => {
+            entries.forEach(entry => store ? store.put(entry) : this.memory.set(entry.studentId, entry));
+        });
+    }
+    
+    pending() {
+        return this.run('readonly', store => {
+            if (!store) return Array.from(this.memory.values());
+            return new Promise(resolve => {
+                const range = IDBKeyRange.bound([this.sessionId, 0], [this.sessionId, Number.MAX_SAFE_INTEGER]);
+                const request = store.getAll(range);
+                request.onsuccess = () => resolve(request.result);
+            });
+        });
+    }
+    
+    // Removes the sent entries unless the student changed again meanwhile
+    acknowledge(entries) {
+        return this.run('readwrite', store => {
+            entries.forEach(entry => {
+                if (!store) {
+                    const current = this.memory.get(entry.studentId);
+                    if (current && current.stamp === entry.stamp) this.memory.delete(entry.studentId);
+                    return;
+                }
+                const key = [this.sessionId, entry.studentId];
+                store.get(key).onsuccess = event => {
+                    const current = event.target.result;
+                    if (current && current.stamp === entry.stamp) store.delete(key);
+                };
+            });
+        });
+    }
+}
+
+/**
+ * Sends the journal to the server as batches of deltas. Changes are final
+ * states, so retrying a batch whose response was lost is harmless. Failed
+ * batches are retried with exponential backoff and jitter.
+ */
+class AttendanceSync {
+    constructor(url, sessionId, version) {
+        this.url = url;
+        this.version = version;
+        this.journal = new AttendanceJournal(sessionId);
+        this.timer = null;
+        this.inFlight = false;
+        this.flushAgain = false;
+        this.retryDelay = 0;
+    }
+    
+    async start(checkboxes) {
+        // Restore taps that were not sent before the page was closed
+        const pending = await this.journal.pending();
+        const states = new Map(pending.map(entry => [String(entry.studentId), entry.isPresent]));
+        checkboxes.forEach(cb => {
+            const state = states.get(cb.getAttribute('data-student-id'));
+            if (state !== undefined) cb.checked = state;
+        });
+        updateStats();
+        
+        window.addEventListener('online', () => this.flush());
+        window.addEventListener('offline', () => this.updateStatus());
+        document.addEventListener('visibilitychange', () => {
+            if (document.hidden) this.flush();
+        });
+        this.flush();
     }
+    
+    async record(checkboxes) {
+        if (!checkboxes.length) return;
+        await this.journal.put(checkboxes.map(cb => ({
+            studentId: Number(cb.getAttribute('data-student-id')),
+            isPresent: cb.checked,
+        })));
+        this.updateStatus();
+        this.schedule(SYNC_DEBOUNCE_MS);
+    }
+    
+    schedule(delay) {
+        clearTimeout(this.timer);
+        this.timer = setTimeout(() => this.flush(), delay);
+    }
+    
+    async flush(manual = false) {
+        if (this.inFlight) {
+            this.flushAgain = true;
+            return;
+        }
+        
+        const entries = await this.journal.pending();
+        if (!entries.length) {
+            if (manual) showToast('✓ Asistencia guardada correctamente', 'success');
+            this.updateStatus();
+            return;
+        }
+        if (!navigator.onLine) {
+            // The 'online' event flushes again
+            if (manual) showToast('Sin conexión: los cambios se enviarán al reconectar', 'error');
+            this.updateStatus();
+            return;
+        }
+        
+        const changes = {};
+        entries.forEach(entry => changes[entry.studentId] = entry.isPresent);
+        
+        this.inFlight = true;
+        try {
+            const response = await fetch(this.url, {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify({ batch_id: newBatchId(), base_version: this.version, changes: changes })
+            });
+            if (response.status >= 500) throw new Error('HTTP ' + response.status);
+            const result = await response.json();
+            
+            if (response.status === 409) {
+                // Another editor wins for the students in conflict; resend the rest
+                const conflicting = new Set(result.conflicts.map(conflict => conflict.student_id));
+                await this.journal.acknowledge(entries.filter(entry => conflicting.has(entry.studentId)));
+                this.version = result.version;
+                applyServerState(result.conflicts);
+                showToast(result.error, 'error');
+                this.flushAgain = true;
+            } else if (result.success) {
+                await this.journal.acknowledge(entries);
+                this.version = result.version;
+                this.retryDelay = 0;
+                if (manual) showToast('✓ Asistencia guardada correctamente', 'success');
+            } else {
+                // Rejected batches (e.g. a past session) will never apply
+                await this.journal.acknowledge(entries);
+                showToast('Error: ' + (result.error || 'No se pudo guardar'), 'error');
+            }
+        } catch (error) {
+            console.error('Error syncing attendance:', error);
+            this.retryDelay = Math.min(this.retryDelay ? this.retryDelay * 2 : SYNC_RETRY_MIN_MS, SYNC_RETRY_MAX_MS);
+            this.schedule(this.retryDelay + Math.random() * this.retryDelay * 0.2);
+            if (manual) showToast('Sin conexión: los cambios se enviarán automáticamente', 'error');
+        } finally {
+            this.inFlight = false;
+            this.updateStatus();
+            if (this.flushAgain) {
+                this.flushAgain = false;
+                this.schedule(0);
+            }
+        }
+    }
+    
+    // Applies changes made by other editors, except for students with unsent local changes
+    async applyRemote(version, states) {
+        const pending = new Set((await this.journal.pending()).map(entry => String(entry.studentId)));
+        let skipped = false;
+        Object.entries(states).forEach(([studentId, isPresent]) => {
+            const checkbox = document.querySelector(`.student-checkbox[data-student-id="${studentId}"]`);
+            if (!checkbox || checkbox.checked === isPresent) return;
+            if (pending.has(studentId)) {
+                skipped = true;
+                return;
+            }
+            checkbox.checked = isPresent;
+        });
+        // A skipped remote change must still show up as a conflict on the next flush
+        if (!skipped) this.version = Math.max(this.version, version);
+        updateStats();
+    }
+    
+    async updateStatus() {
+        const statusEl = document.getElementById('syncStatus');
+        if (!statusEl) return;
+        
+        const count = (await this.journal.pending()).length;
+        statusEl.classList.toggle('offline', !navigator.onLine);
+        statusEl.classList.toggle('pending', count > 0);
+        if (!count) {
+            statusEl.textContent = '✓ Sincronizado';
+        } else if (!navigator.onLine) {
+            statusEl.textContent = '📴 Sin conexión · ' + count + ' pendientes';
+        } else {
+            statusEl.textContent = '⏳ ' + count + ' pendientes';
+        }
+    }
+}
+
+function newBatchId() {
+    if (window.crypto && crypto.randomUUID) return crypto.randomUUID();
+    return Date.now().toString(36) + Math.random().toString(36).slice(2);
+}
+
+/* ========================================
+   Student Search
+   ======================================== */
+
+const SEARCH_DEBOUNCE_MS = 150;
+
+function initStudentSearch() {
+    const searchInput = document.getElementById('studentSearch');
+    if (!searchInput) return;
+    
+    const cards = document.querySelectorAll('.student-card');
+    let timer = null;
+    let lastQuery = '';
+    
+    function showOnly(ids) {
+        cards.forEach(card => {
+            const visible = ids === null || ids.has(card.getAttribute('data-student-id'));
+            card.style.display = visible ? '' : 'none';
+        });
+    }
+    
+    async function search(query) {
+        try {
+            const params = new URLSearchParams({ q: query, limit: cards.length || 1 });
+            const response = await fetch(searchInput.dataset.searchUrl + '?' + params.toString());
+            const result = await response.json();
+            
+            // Ignore responses for queries that are no longer current
+            if (query !== lastQuery) return;
+            showOnly(new Set(result.results.map(student => String(student.id))));
+        } catch (error) {
+            console.error('Error searching students:', error);
+        }
+    }
+    
+    searchInput.addEventListener('input', function() {
+        clearTimeout(timer);
+        lastQuery = searchInput.value.trim();
+        
+        if (!lastQuery) {
+            showOnly(null);
+            return;
+        }
+        
+        timer = setTimeout(() => search(lastQuery), SEARCH_DEBOUNCE_MS);
+    });
 }
 
 function updateStats() {
@@ -127,6 +522,131 @@ async function saveAttendance() {
     }
 }
 
+/* ========================================
+   Live Session Updates
+   ======================================== */
+
+// Server-Sent Events stream of the session; stats polling pauses while it is active
+let liveSource = null;
+
+/**
+ * Subscribes to the session stream. The first event is a snapshot of the
+ * whole session and each save then sends only the students that changed
+ * plus the new totals. Pages with checkboxes update them; other pages
+ * only update the counters.
+ */
+function initLiveUpdates(sync) {
+    if (typeof SESSION_EVENTS_URL === 'undefined' || !window.EventSource) return;
+    
+    let version = -1;
+    
+    function handle(event) {
+        const data = JSON.parse(event.data);
+        // Snapshots after a reconnect always apply; deltas only if newer
+        if (event.type !== 'snapshot' && data.version <= version) return;
+        version = data.version;
+        
+        if (sync) {
+            sync.applyRemote(data.version, event.type === 'snapshot' ? data.records : data.changes);
+            return;
+        }
+        const presentCountEl = document.getElementById('presentCount');
+        const absentCountEl = document.getElementById('absentCount');
+        if (presentCountEl) presentCountEl.textContent = data.present_count;
+        if (absentCountEl) absentCountEl.textContent = data.absent_count;
+    }
+    
+    liveSource = new EventSource(SESSION_EVENTS_URL);
+    liveSource.addEventListener('snapshot', handle);
+    liveSource.addEventListener('attendance', handle);
+}
+
+/* ========================================
+   Stats Polling
+   ======================================== */
+
+const STATS_POLL_INTERVAL = 15000;
+
+function initStatsPolling() {
+    if (typeof SESSION_STATS_URL === 'undefined') return;
+    
+    let etag = null;
+    
+    async function poll() {
+        if (document.hidden) return;
+        // The live stream (or its reconnection loop) already keeps the counters current
+        if (liveSource && liveSource.readyState !== EventSource.CLOSED) return;
+        
+        try {
+            // The server answers 304 without a body when nothing changed
+            const headers = etag ? { 'If-None-Match': etag } : {};
+            const response = await fetch(SESSION_STATS_URL, { headers: headers, cache: 'no-store' });
+            if (response.status !== 200) return;
+            
+            etag = response.headers.get('ETag');
+            const stats = await response.json();
+            
+            const presentCountEl = document.getElementById('presentCount');
+            const absentCountEl = document.getElementById('absentCount');
+            if (presentCountEl) presentCountEl.textContent = stats.present_count;
+            if (absentCountEl) absentCountEl.textContent = stats.absent_count;
+        } catch (error) {
+            console.error('Error polling session stats:', error);
+        }
+    }
+    
+    poll();
+    setInterval(poll, STATS_POLL_INTERVAL);
+}
+
+/* ========================================
+   History Pagination
+   ======================================== */
+
+function initHistoryLoadMore() {
+    const loadMoreBtn = document.getElementById('loadMoreSessions');
+    const sessionsList = document.getElementById('sessionsList');
+    if (!loadMoreBtn || !sessionsList || typeof HISTORY_MORE_URL === 'undefined') return;
+    
+    loadMoreBtn.addEventListener('click', async function() {
+        const btnText = loadMoreBtn.querySelector('.btn-text');
+        const btnLoading = loadMoreBtn.querySelector('.btn-loading');
+        
+        const params = new URLSearchParams({ before: loadMoreBtn.dataset.before });
+        if (HISTORY_FILTERS.from) params.set('from', HISTORY_FILTERS.from);
+        if (HISTORY_FILTERS.to) params.set('to', HISTORY_FILTERS.to);
+        
+        btnText.style.display = 'none';
+        btnLoading.style.display = 'inline';
+        loadMoreBtn.disabled = true;
+        
+        try {
+            const response = await fetch(HISTORY_MORE_URL + '?' + params.toString());
+            const result = await response.json();
+            
+            if (!result.success) {
+                showToast('Error: ' + (result.error || 'No se pudo cargar'), 'error');
+                return;
+            }
+            
+            sessionsList.insertAdjacentHTML('beforeend', result.html);
+            
+            if (result.next_before) {
+                loadMoreBtn.dataset.before = result.next_before;
+            } else {
+                loadMoreBtn.parentElement.remove();
+            }
+        } catch (error) {
+            console.error('Error loading sessions:', error);
+            showToast('Error al cargar el historial', 'error');
+        } finally {
+            btnText.style.display = 'inline';
+            btnLoading.style.display = 'none';
+            loadMoreBtn.disabled = false;
+        }
+    });
+}
+
 /* ========================================
    Toast Notifications
    ======================================== */
@@ -0,0 +1,211 @@
+"""
+Cursos: alcance de cada petición y partición de los datos por curso.
+
+``CourseMiddleware`` resuelve el curso de la petición (``?course=<código>``,
+que se recuerda en una cookie, luego la cookie y por último el curso por
+defecto) y lo deja en ``request.course`` y en una variable de contexto que
+consultan el resto de módulos con ``current_course``. La lista de cursos se
+guarda en el caché, de modo que resolver el curso no cuesta consultas.
+
+Un curso grande puede vivir en su propia base de datos SQLite: si
+``Course.database`` tiene un alias de ``settings.DATABASES``, ``CourseRouter``
+envía allí las consultas de los modelos de ``attendance`` (salvo ``Course``,
+que siempre está en la base por defecto) mientras ese curso esté activo.
+El comando ``move_course`` copia un curso a otra base de datos.
+"""
+import contextvars
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.cache import patch_vary_headers
+
+from .models import Course
+
+COURSE_PARAM = 'course'
+COURSE_COOKIE = 'course'
+COURSE_COOKIE_MAX_AGE = 365 * 24 * 60 * 60
+
+_COURSES_KEY = 'attendance:courses'
+
+_current = contextvars.ContextVar('attendance_course', default=None)
+
+
+# ========================================
+# Curso actual
+# ========================================
+
+def current_course():
+    """Retorna el curso activo en este contexto o ``None``."""
+    return _current.get()
+
+
+def current_course_id():
+    """Id del curso activo o, fuera de una petición, del curso por defecto."""
+    course = _current.get()
+    if course is not None:
+        return course.id
+    courses = cache.get(_COURSES_KEY)
+    if courses is not None:
+        course = default_course(courses)
+        return course.id if course is not None else None
+    # Sin instanciar Course: este es el default de las FK al curso y también se
+    # evalúa en las migraciones, cuando la tabla aún no tiene todas sus columnas
+    codes = dict(Course.objects.using(DEFAULT_DB_ALIAS).values_list('code', 'id'))
+    code = getattr(settings, 'ATTENDANCE_DEFAULT_COURSE', None)
+    return codes.get(code, min(codes.values(), default=None))
+
+
+def course_db():
+    """Alias de la base de datos del curso activo."""
+    course = _current.get()
+    return course.db_alias if course is not None else DEFAULT_DB_ALIAS
+
+
+@contextmanager
+def course_context(course):
+    """Activa ``course`` dentro del bloque (comandos de administración, pruebas)."""
+    token = _current.set(course)
+    try:
+        yield course
+    finally:
+        _current.reset(token)
+
+
+# ========================================
+# Lista de cursos
+# ========================================
+
+def get_courses():
+    """Retorna todos los cursos, leyéndolos del caché si es posible."""
+    courses = cache.get(_COURSES_KEY)
+    if courses is None:
+        courses = list(Course.objects.using(DEFAULT_DB_ALIAS).order_by('name', 'id'))
+        cache.set(_COURSES_KEY, courses, settings.ATTENDANCE_CACHE_TIMEOUT)
+    return courses
+
+
+def invalidate_courses():
+    cache.delete(_COURSES_KEY)
+
+
+def default_course(courses=None):
+    """
+    Curso por defecto: el de código ``settings.ATTENDANCE_DEFAULT_COURSE`` o
+    el primero que se creó.
+    """
+    courses = get_courses() if courses is None else courses
+    code = getattr(settings, 'ATTENDANCE_DEFAULT_COURSE', None)
+    for course in courses:
+        if course.code == code:
+            return course
+    return min(courses, key=lambda course: course.id, default=None)
+
+
+def get_course(code=None):
+    """Retorna el curso con código ``code`` (o el por defecto); lanza ``Course.DoesNotExist``."""
+    course = resolve_course(code)[0] if code is None else Course.objects.using(DEFAULT_DB_ALIAS).get(code=code)
+    if course is None:
+        raise Course.DoesNotExist('No hay cursos.')
+    return course
+
+
+def resolve_course(code):
+    """Retorna ``(curso, cursos)`` para un código, usando el curso por defecto si no existe."""
+    courses = get_courses()
+    for course in courses:
+        if course.code == code:
+            return course, courses
+    return default_course(courses), courses
+
+
+# ========================================
+# Middleware y contexto de plantillas
+# ========================================
+
+class CourseMiddleware:
+    """Activa el curso de cada petición; ver el docstring del módulo."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        selected = self.select(request, *resolve_course(self.requested_code(request)))
+        token = _current.set(selected)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.process_response(request, response)
+
+    async def __acall__(self, request):
+        selected = self.select(request, *await sync_to_async(resolve_course)(self.requested_code(request)))
+        token = _current.set(selected)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.process_response(request, response)
+
+    def requested_code(self, request):
+        return request.GET.get(COURSE_PARAM) or request.COOKIES.get(COURSE_COOKIE)
+
+    def select(self, request, course, courses):
+        request.course = course
+        request.courses = courses
+        return course
+
+    def process_response(self, request, response):
+        course = request.course
+        if course is not None and request.COOKIES.get(COURSE_COOKIE) != course.code:
+            response.set_cookie(COURSE_COOKIE, course.code, max_age=COURSE_COOKIE_MAX_AGE, samesite='Lax')
+        # La misma URL muestra datos distintos según el curso de la cookie
+        patch_vary_headers(response, ('Cookie',))
+        return response
+
+
+def course(request):
+    """Procesador de contexto con el curso activo y la lista de cursos."""
+    return {
+        'course': getattr(request, 'course', None),
+        'courses': [c for c in getattr(request, 'courses', ()) if c.is_active],
+    }
+
+
+# ========================================
+# Router de bases de datos
+# ========================================
+
+class CourseRouter:
+    """
+    Envía las consultas de ``attendance`` a la base de datos del curso
+    activo. Un objeto ya cargado se queda en la base de la que vino.
+    """
+
+    def _db_for_model(self, model, **hints):
+        if model._meta.app_label != 'attendance' or model is Course:
+            return None
+        instance = hints.get('instance')
+        if instance is not None and not isinstance(instance, Course) and instance._state.db:
+            return instance._state.db
+        course = _current.get()
+        if course is None:
+            return None
+        return course.database or None
+
+    db_for_read = _db_for_model
+    db_for_write = _db_for_model
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Los cursos viven en la base por defecto y sus datos en la del curso
+        if isinstance(obj1, Course) or isinstance(obj2, Course):
+            return True
+        return None
@@ -1,3 +1,1377 @@
-from django.test import TestCase
+import csv
+import io
+import json
+import os
+import re
+import tempfile
+from asyncio import iscoroutinefunction
+from datetime import date, timedelta
+from types import SimpleNamespace
+from unittest import skipUnless
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import IntegrityError, connection, router
+from django.http import Http404
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+try:
+    import openpyxl
+except ImportError:
+    openpyxl = None
+
+from . import urls
+from .analytics import DEFAULT_THRESHOLDS, compute_risk, risk_report
+from .benchmark import ASYNC_VIEW_ROUTES, async_views, build_requests, find_regressions, measure_client, seed_data
+from .bitmaps import (
+    AttendanceBitmaps, _bitmaps, _course_lock, build_bitmaps, course_bitmaps, invalidate_bitmaps, sync_bitmaps,
+)
+from .caching import COMPETENCIES, ROSTER, STUDENTS, _page_key, _version_key, bump_versions
+from .events import SUBSCRIBER_QUEUE_SIZE, LocalBroker
+from .export import attendance_matrix_rows, write_xlsx
+from .metrics import render_prometheus
+from .query_budget import QueryBudgetExceeded, query_budget
+from .roster import import_roster, parse_roster
+from .schedule import todays_session
+from .snapshot import roster_snapshot
+from .models import (
+    Course, Student, AttendanceSession, AttendanceRecord, Competency, StudentAttendanceSummary, StudentCompetency,
+    _normalize_unicode, normalize_many, normalize_text,
+)
+from .search import FTS_TABLE, fts_available, get_prefix_index, search_students
+from .services import bulk_save_attendance, delete_records, rebuild_attendance_summaries
+from .tenancy import COURSE_COOKIE, course_context, default_course
+from .views import HISTORY_PAGE_SIZE, _budgeted_rows
+
+SEED_STUDENTS = 10_000
+SEED_SESSIONS = 500
+
+# Tablas que crecen como estudiantes × sesiones: nunca se pueden recorrer
+GROWING_TABLES = {
+    'attendance_attendancerecord',
+    'attendance_studentcompetency',
+}
+
+# Tablas con una fila por estudiante o sesión: los listados las recorren, pero
+# deben hacerlo en el orden de un índice y no ordenando con un B-tree temporal
+ROSTER_TABLES = {
+    'attendance_student',
+    'attendance_attendancesession',
+    'attendance_studentattendancesummary',
+    'attendance_sessionattendancesummary',
+}
+
+SCAN_RE = re.compile(r'\bSCAN (\w+)')
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}})
+class QueryPlanTests(TestCase):
+    """Verifica con EXPLAIN QUERY PLAN que las vistas no recorren tablas grandes completas."""
+
+    @classmethod
+    def setUpTestData(cls):
+        students = [
+            Student(first_name=f'Nombre{i}', last_name=f'Apellido{i}', email=f'estudiante{i}@eafit.edu.co')
+            for i in range(SEED_STUDENTS)
+        ]
+        for student in students:
+            student.update_normalized_fields()
+        Student.objects.bulk_create(students)
+
+        first_day = date.today() - timedelta(days=SEED_SESSIONS - 1)
+        AttendanceSession.objects.bulk_create([
+            AttendanceSession(date=first_day + timedelta(days=i)) for i in range(SEED_SESSIONS)
+        ])
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "INSERT INTO attendance_attendancerecord (student_id, session_id, is_present, version, created_at, updated_at) "
+                "SELECT s.id, ss.id, (s.id + ss.id) % 3 != 0, 0, datetime('now'), datetime('now') "
+                "FROM attendance_student s CROSS JOIN attendance_attendancesession ss "
+                "WHERE (s.id + ss.id) % 25 = 0"
+            )
+            cursor.execute(
+                "INSERT INTO attendance_studentcompetency (student_id, competency_id, is_achieved, notes, updated_at) "
+                "SELECT s.id, c.id, (s.id + c.id) % 2 = 0, '', datetime('now') "
+                "FROM attendance_student s CROSS JOIN attendance_competency c"
+            )
+        rebuild_attendance_summaries()
+
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+        cls.student = Student.objects.order_by('id').last()
+        cls.session = AttendanceSession.objects.get(date=date.today())
+
+    def assertNoFullScans(self, response, queries):
+        self.assertLess(response.status_code, 400)
+        with connection.cursor() as cursor:
+            for query in queries:
+                sql = query['sql']
+                if not sql.lstrip().upper().startswith('SELECT'):
+                    continue
+                cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+                plan = '\n'.join(row[-1] for row in cursor.fetchall())
+                self.assertPlanUsesIndexes(sql, plan)
+
+    def assertPlanUsesIndexes(self, sql, plan):
+        scanned = set(SCAN_RE.findall(plan))
+        growing = GROWING_TABLES & scanned
+        self.assertFalse(growing, f'Recorrido de {sorted(growing)}:\n{sql}\n{plan}')
+        if ROSTER_TABLES & scanned:
+            self.assertNotRegex(
+                plan, r'TEMP B-TREE FOR (RIGHT PART OF )?ORDER BY',
+                f'Listado ordenado sin índice:\n{sql}\n{plan}'
+            )
+
+    def assertGetPlans(self, url, **params):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url, params)
+        self.assertNoFullScans(response, ctx.captured_queries)
+
+    def test_index(self):
+        self.assertGetPlans(reverse('attendance:index'))
+
+    def test_history(self):
+        self.assertGetPlans(reverse('attendance:history'))
+        self.assertGetPlans(reverse('attendance:history'), **{'from': '2020-01-01', 'to': date.today().isoformat()})
+
+    def test_history_more(self):
+        self.assertGetPlans(reverse('attendance:history_more'), before=date.today().isoformat())
+
+    def test_session_detail(self):
+        self.assertGetPlans(reverse('attendance:session_detail', args=[self.session.id]))
+
+    def test_session_stats(self):
+        self.assertGetPlans(reverse('attendance:session_stats', args=[self.session.id]))
+
+    def test_edit_session(self):
+        self.assertGetPlans(reverse('attendance:edit_session', args=[self.session.id]))
+
+    def test_students_list(self):
+        self.assertGetPlans(reverse('attendance:students_list'))
+
+    def test_student_detail(self):
+        self.assertGetPlans(reverse('attendance:student_detail', args=[self.student.id]))
+
+    def test_students_search(self):
+        self.assertGetPlans(reverse('attendance:students_search'), q='apellido12')
+
+    def test_students_manage(self):
+        self.assertGetPlans(reverse('attendance:students_manage'))
+
+    def test_competency_matrix(self):
+        self.assertGetPlans(reverse('attendance:competency_matrix'))
+
+    def test_students_risk(self):
+        self.assertGetPlans(reverse('attendance:students_risk'))
+
+    def test_save_session_attendance(self):
+        ids = list(Student.objects.order_by('id').values_list('id', flat=True)[:50])
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(
+                reverse('attendance:save_session_attendance', args=[self.session.id]),
+                json.dumps({'attendance': {str(student_id): True for student_id in ids}}),
+                content_type='application/json',
+            )
+        self.assertNoFullScans(response, ctx.captured_queries)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}})
+class BenchmarkTests(TestCase):
+    """Verifica que el banco de pruebas cubra todas las rutas y detecte regresiones."""
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_data(students=20, sessions=5, competencies=3)
+
+    def test_every_route_is_benchmarked(self):
+        names = {pattern.name for pattern in urls.urlpatterns}
+        self.assertEqual({spec['name'] for spec in build_requests()}, names)
+
+    def test_requests_succeed(self):
+        results = {'client': measure_client(build_requests(), iterations=1, warmup=0)}
+        self.assertEqual(find_regressions(results, results), [])
+
+    def test_more_queries_is_a_regression(self):
+        results = {'client': measure_client(build_requests()[:1], iterations=1, warmup=0)}
+        baseline = json.loads(json.dumps(results))
+        baseline['client']['index']['queries'] -= 1
+        self.assertEqual(len(find_regressions(results, baseline)), 1)
+
+
+class MetricsTests(TestCase):
+    """Verifica el registro de métricas por ruta y el log de peticiones lentas."""
+
+    def test_request_is_recorded(self):
+        self.client.get(reverse('attendance:students_list'))
+        response = self.client.get(reverse('attendance:metrics'))
+        self.assertEqual(response.status_code, 200)
+        body = response.content.decode()
+        self.assertIn('attendance_request_duration_seconds_count{route="students_list"}', body)
+        self.assertIn('attendance_db_queries_bucket{route="students_list",le="+Inf"}', body)
+        self.assertIn('attendance_template_render_seconds_sum{route="students_list"}', body)
+        self.assertIn('attendance_responses_total{route="students_list",status="200"}', body)
+
+    def test_histogram_buckets_are_cumulative(self):
+        self.client.get(reverse('attendance:history'))
+        counts = [
+            int(line.rsplit(' ', 1)[1]) for line in render_prometheus().splitlines()
+            if line.startswith('attendance_db_queries_bucket{route="history"')
+        ]
+        self.assertEqual(counts, sorted(counts))
+
+    @override_settings(ATTENDANCE_SLOW_REQUEST_MS=0)
+    def test_slow_request_is_logged_with_sql(self):
+        with self.assertLogs('attendance.metrics', 'WARNING') as logs:
+            self.client.get(reverse('attendance:students_manage'))
+        self.assertIn('students_manage', logs.output[0])
+        self.assertIn('SELECT', logs.output[0])
+
+
+@override_settings(ATTENDANCE_QUERY_BUDGET='raise')
+class QueryBudgetTests(TestCase):
+    """Verifica la detección de N+1 y que las vistas con escrituras respeten su presupuesto."""
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_data(students=30, sessions=3, competencies=4)
+        cls.student = Student.objects.filter(is_active=True).order_by('id').last()
+
+    def test_repeated_select_is_reported(self):
+        with self.assertRaisesMessage(QueryBudgetExceeded, 'N+1'):
+            with query_budget(max=100):
+                for student in Student.objects.all()[:5]:
+                    student.attendance_count
+
+    def test_budget_is_enforced(self):
+        with self.assertRaisesMessage(QueryBudgetExceeded, '2 consultas (presupuesto 1)'):
+            with query_budget(max=1):
+                list(Student.objects.all())
+                list(Competency.objects.all())
+
+    @override_settings(ATTENDANCE_QUERY_BUDGET='warn')
+    def test_warn_mode_logs(self):
+        with self.assertLogs('attendance.query_budget', 'WARNING'):
+            with query_budget(max=0, label='prueba'):
+                list(Student.objects.all())
+
+    def test_save_attendance_creating_session(self):
+        AttendanceSession.objects.filter(date=date.today()).delete()
+        ids = Student.objects.filter(is_active=True).values_list('id', flat=True)
+        response = self.client.post(
+            reverse('attendance:save_attendance'),
+            json.dumps({'attendance': {str(student_id): True for student_id in ids}}),
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_save_student_competencies(self):
+        competencies = Competency.objects.values_list('id', flat=True)
+        response = self.client.post(
+            reverse('attendance:save_student_competencies', args=[self.student.id]),
+            json.dumps({'competencies': {str(competency_id): True for competency_id in competencies}}),
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['competencies_achieved'], len(competencies))
+
+    def test_students_manage_actions(self):
+        url = reverse('attendance:students_manage')
+        self.client.post(url, {'action': 'add', 'first_name': 'Ana', 'last_name': 'Pérez'})
+        self.client.post(url, {'action': 'deactivate', 'student_id': self.student.id})
+        self.client.post(url, {'action': 'activate', 'student_id': self.student.id})
+        self.client.post(url, {'action': 'delete', 'student_id': self.student.id})
+        roster = 'nombre,apellido,email\n' + ''.join(f'Nuevo{i},Estudiante{i},nuevo{i}@eafit.edu.co\n' for i in range(50))
+        response = self.client.post(url, {
+            'action': 'import',
+            'roster_file': SimpleUploadedFile('lista.csv', roster.encode()),
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Student.objects.filter(last_name__startswith='Estudiante').count(), 50)
+
+
+class SessionSyncTests(TestCase):
+    """Verifica el endpoint de sincronización por lotes de cambios."""
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_data(students=10, sessions=2, competencies=1)
+        cls.session = AttendanceSession.objects.get(date=date.today())
+        cls.student_ids = list(cls.session.records.values_list('student_id', flat=True)[:3])
+
+    def sync(self, session, changes, batch_id='lote-1'):
+        return self.client.post(
+            reverse('attendance:sync_session_attendance', args=[session.id]),
+            json.dumps({'batch_id': batch_id, 'changes': changes}),
+            content_type='application/json',
+        )
+
+    def test_replayed_batch_is_idempotent(self):
+        changes = {str(student_id): False for student_id in self.student_ids}
+        first = self.sync(self.session, changes).json()
+        replay = self.sync(self.session, changes).json()
+        self.assertEqual(first['batch_id'], 'lote-1')
+        self.assertEqual(replay['applied'], 0)
+        self.assertEqual(replay['version'], first['version'])
+        self.assertEqual(
+            self.session.records.filter(student_id__in=self.student_ids, is_present=False).count(),
+            len(self.student_ids),
+        )
+
+    def test_version_increases_with_changes(self):
+        version = AttendanceSession.objects.get(pk=self.session.pk).version
+        student_id = self.student_ids[0]
+        current = self.session.records.get(student_id=student_id).is_present
+        result = self.sync(self.session, {str(student_id): not current}).json()
+        self.assertEqual(result['applied'], 1)
+        self.assertEqual(result['version'], version + 1)
+
+    def test_past_session_is_rejected(self):
+        past = AttendanceSession.objects.exclude(pk=self.session.pk).first()
+        self.assertEqual(self.sync(past, {str(self.student_ids[0]): True}).status_code, 403)
+
+    def test_first_partial_sync_records_the_whole_roster(self):
+        course = self.session.course
+        self.session.delete()
+        session = AttendanceSession.objects.create(course=course, date=date.today())
+        active = Student.objects.filter(course=course, is_active=True)
+        present, absent = active.values_list('id', flat=True)[:2]
+        summary = StudentAttendanceSummary.objects.get(student_id=absent)
+
+        result = self.sync(session, {str(present): True, str(absent): False}).json()
+        self.assertEqual(session.records.count(), active.count())
+        self.assertEqual(session.records.filter(is_present=True).count(), 1)
+        self.assertEqual(
+            (result['present_count'], result['absent_count'], result['total_count']),
+            (1, active.count() - 1, active.count()),
+        )
+        untouched = active.exclude(id__in=[present, absent]).first()
+        self.assertFalse(session.records.get(student=untouched).is_present)
+        self.assertEqual(StudentAttendanceSummary.objects.get(student_id=absent).absent_count, summary.absent_count + 1)
+
+
+class OptimisticConcurrencyTests(TestCase):
+    """Verifica que las ediciones concurrentes de una sesión se rechacen solo si chocan."""
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_data(students=10, sessions=1, competencies=1)
+        cls.session = AttendanceSession.objects.get(date=date.today())
+        cls.first, cls.second = cls.session.records.values_list('student_id', flat=True)[:2]
+
+    def save(self, changes, version):
+        return self.client.post(
+            reverse('attendance:save_session_attendance', args=[self.session.id]),
+            json.dumps({'attendance': {str(k): v for k, v in changes.items()}, 'version': version}),
+            content_type='application/json',
+        )
+
+    def state(self, student_id):
+        return self.session.records.get(student_id=student_id).is_present
+
+    def test_stale_write_on_same_student_is_rejected(self):
+        base = AttendanceSession.objects.get(pk=self.session.pk).version
+        value = not self.state(self.first)
+        self.assertEqual(self.save({self.first: value}, base).status_code, 200)
+
+        response = self.save({self.first: not value}, base)
+        self.assertEqual(response.status_code, 409)
+        result = response.json()
+        self.assertEqual(result['version'], base + 1)
+        self.assertEqual(result['conflicts'], [{'student_id': self.first, 'is_present': value, 'version': base + 1}])
+        self.assertEqual(self.state(self.first), value)
+
+    def test_concurrent_edits_on_different_students_succeed(self):
+        base = AttendanceSession.objects.get(pk=self.session.pk).version
+        first_value, second_value = not self.state(self.first), not self.state(self.second)
+        self.assertEqual(self.save({self.first: first_value}, base).status_code, 200)
+        response = self.save({self.second: second_value}, base)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['version'], base + 2)
+        self.assertEqual((self.state(self.first), self.state(self.second)), (first_value, second_value))
+
+    def test_same_value_is_not_a_conflict(self):
+        base = AttendanceSession.objects.get(pk=self.session.pk).version
+        value = not self.state(self.first)
+        self.save({self.first: value}, base)
+        self.assertEqual(self.save({self.first: value}, base).status_code, 200)
+
+    def test_partial_edit_counts_the_whole_session(self):
+        course = self.session.course
+        self.session.delete()
+        self.session = AttendanceSession.objects.create(course=course, date=date.today())
+        active = Student.objects.filter(course=course, is_active=True)
+
+        result = self.save({self.first: True}, 0).json()
+        self.assertEqual(self.session.records.count(), active.count())
+        self.assertEqual((result['present_count'], result['absent_count']), (1, active.count() - 1))
+
+        result = self.save({self.second: True}, result['version']).json()
+        self.assertEqual((result['present_count'], result['absent_count']), (2, active.count() - 2))
+
+
+class SessionEventsTests(TestCase):
+    """Verifica el stream SSE de actualizaciones de una sesión."""
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_data(students=10, sessions=1, competencies=1)
+        cls.session = AttendanceSession.objects.get(date=date.today())
+        cls.student_id = cls.session.records.values_list('student_id', flat=True).first()
+
+    def url(self):
+        return reverse('attendance:session_events', args=[self.session.id])
+
+    def test_wsgi_sends_snapshot_and_closes(self):
+        response = self.client.get(self.url())
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        body = b''.join(response.streaming_content).decode()
+        self.assertIn('retry: 15000', body)
+        snapshot = json.loads(body.split('event: snapshot\ndata: ')[1])
+        self.assertEqual(snapshot['total_count'], 10)
+        self.assertEqual(len(snapshot['records']), 10)
+
+    async def test_live_stream_receives_committed_save(self):
+        response = await self.async_client.get(self.url())
+        stream = aiter(response.streaming_content)
+        self.assertTrue((await anext(stream)).startswith(b'retry:'))
+        self.assertIn(b'event: snapshot', await anext(stream))
+
+        is_present = not await self.session.records.filter(student_id=self.student_id).values_list(
+            'is_present', flat=True).aget()
+
+        def save():
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.post(
+                    reverse('attendance:sync_session_attendance', args=[self.session.id]),
+                    json.dumps({'changes': {str(self.student_id): is_present}}),
+                    content_type='application/json',
+                )
+
+        await sync_to_async(save)()
+        event = (await anext(stream)).decode()
+        await stream.aclose()
+        self.assertIn('event: attendance', event)
+        data = json.loads(event.split('data: ')[1])
+        self.assertEqual(data['changes'], {str(self.student_id): is_present})
+        self.assertEqual(data['total_count'], 10)
+
+    async def test_lagging_subscriber_is_dropped(self):
+        broker = LocalBroker()
+        subscription = broker.subscribe('canal')
+        for i in range(SUBSCRIBER_QUEUE_SIZE + 1):
+            subscription.deliver(f'mensaje {i}')
+        self.assertIsNone(await subscription.get(1))
+        subscription.close()
+        self.assertFalse(broker.has_subscribers('canal'))
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}})
+class AsyncViewsTests(TestCase):
+    """Verifica que las variantes async rendericen lo mismo que las vistas síncronas."""
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_data(students=15, sessions=4, competencies=3)
+
+    def test_async_variants_match_sync(self):
+        paths = [
+            spec['path'] for spec in build_requests() if spec['name'] in ASYNC_VIEW_ROUTES
+        ]
+        self.assertEqual(len(paths), len(ASYNC_VIEW_ROUTES))
+        expected = {path: self.client.get(path).content for path in paths}
+        with async_views():
+            for path in paths:
+                with self.subTest(path=path):
+                    response = self.client.get(path)
+                    self.assertTrue(iscoroutinefunction(response.resolver_match.func))
+                    self.assertEqual(response.content, expected[path])
+
+    def test_missing_student_is_404(self):
+        with async_views():
+            response = self.client.get(reverse('attendance:student_detail', args=[999_999]))
+        self.assertEqual(response.status_code, 404)
+
+
+class SessionCalendarTests(TestCase):
+    """Verifica el calendario de sesiones y la sesión del día sin escrituras."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.course = default_course()
+        cls.today = date.today()
+        cls.course.term_start = cls.today - timedelta(days=13)
+        cls.course.term_end = cls.today + timedelta(days=13)
+        cls.course.class_days = ','.join(str(day) for day in range(7))
+        cls.course.save()
+
+    def test_command_precreates_term_idempotently(self):
+        skipped = self.today + timedelta(days=1)
+        call_command('create_sessions', '--skip', skipped.isoformat(), stdout=io.StringIO())
+        sessions = AttendanceSession.objects.filter(course=self.course)
+        self.assertEqual(sessions.count(), 26)
+        self.assertFalse(sessions.filter(date=skipped).exists())
+
+        out = io.StringIO()
+        call_command('create_sessions', '--skip', skipped.isoformat(), stdout=out)
+        self.assertIn(' 0 sesiones nuevas', out.getvalue())
+        self.assertEqual(sessions.count(), 26)
+
+    def test_index_does_not_write_when_session_exists(self):
+        call_command('create_sessions', stdout=io.StringIO())
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('attendance:index'))
+        self.assertEqual(response.context['session'].date, self.today)
+        self.assertFalse([q for q in ctx.captured_queries if not q['sql'].startswith('SELECT')])
+
+    def test_missing_session_is_created_once(self):
+        first = todays_session(self.course)
+        AttendanceSession.objects.filter(pk=first.pk).delete()
+        second = todays_session(self.course)
+        self.assertNotEqual(first.pk, second.pk)
+        self.assertEqual(todays_session(self.course).pk, second.pk)
+        self.assertEqual(AttendanceSession.objects.filter(course=self.course, date=self.today).count(), 1)
+
+    def test_history_hides_future_sessions(self):
+        call_command('create_sessions', stdout=io.StringIO())
+        response = self.client.get(reverse('attendance:history'))
+        dates = [item['session']['date'] for item in response.context['sessions_data']]
+        self.assertTrue(dates)
+        self.assertLessEqual(max(dates), self.today)
+
+
+class RosterSnapshotTests(TestCase):
+    """Verifica la instantánea de estudiantes y su invalidación."""
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_data(students=8, sessions=2, competencies=2)
+        cls.course = default_course()
+
+    def setUp(self):
+        # El caché no vuelve atrás con la transacción de cada prueba
+        bump_versions(STUDENTS, course_id=self.course.id)
+
+    def student_queries(self, path):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(path)
+        return response, [q for q in ctx.captured_queries if 'FROM "attendance_student"' in q['sql']]
+
+    def test_views_render_from_snapshot(self):
+        self.client.get(reverse('attendance:index'))
+        for name in ('index', 'students_manage'):
+            with self.subTest(view=name):
+                response, queries = self.student_queries(reverse(f'attendance:{name}'))
+                self.assertEqual(queries, [])
+                self.assertContains(response, 'Nombre0 Apellido0')
+
+    def test_saving_attendance_keeps_snapshot(self):
+        snapshot = roster_snapshot(self.course)
+        self.client.post(
+            reverse('attendance:save_attendance'),
+            json.dumps({'attendance': {str(snapshot.active[0].id): True}}),
+            content_type='application/json',
+        )
+        self.assertIs(roster_snapshot(self.course), snapshot)
+
+    def test_deactivate_invalidates_snapshot(self):
+        student = roster_snapshot(self.course).active[0]
+        self.client.post(reverse('attendance:students_manage'), {'action': 'deactivate', 'student_id': student.id})
+        snapshot = roster_snapshot(self.course)
+        self.assertNotIn(student.id, [entry.id for entry in snapshot.active])
+        self.assertIn(student.id, [entry.id for entry in snapshot.inactive])
+
+        Student.objects.create(course=self.course, first_name='Zoe', last_name='Nueva')
+        self.assertIn('Zoe Nueva', [entry.full_name for entry in roster_snapshot(self.course).active])
+
+
+class AttendanceBitmapsTests(TestCase):
+    """Verifica el mapa de bits de asistencia contra las estadísticas de la base de datos."""
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_data(students=20, sessions=12, competencies=1, seed=3)
+        cls.course = default_course()
+        cls.student_id = Student.objects.get(last_name='Apellido0').id
+
+    def setUp(self):
+        invalidate_bitmaps(self.course.id)
+
+    def test_matches_database(self):
+        bitmaps = course_bitmaps(self.course)
+        for student in Student.objects.filter(course=self.course).with_attendance_stats():
+            self.assertEqual(bitmaps.attendance_percentage(student.id), student.attendance_percentage)
+        for session in AttendanceSession.objects.filter(course=self.course).with_attendance_stats():
+            expected = session.num_present < 0.9 * session.num_records
+            self.assertEqual(session.id in bitmaps.sessions_below(0.9), expected)
+
+    def test_absence_streaks(self):
+        student_id = self.student_id
+        sessions = course_bitmaps(self.course).session_ids
+        AttendanceRecord.objects.filter(student_id=student_id).update(is_present=True)
+        AttendanceRecord.objects.filter(student_id=student_id, session_id__in=sessions[2:5] + sessions[-2:]).update(
+            is_present=False
+        )
+        bitmaps = build_bitmaps(self.course)
+        self.assertEqual(bitmaps.longest_absence_streak(student_id), 3)
+        self.assertEqual(bitmaps.current_absence_streak(student_id), 2)
+
+    def test_current_streak_skips_sessions_without_records(self):
+        student_id = self.student_id
+        sessions = course_bitmaps(self.course).session_ids
+        AttendanceRecord.objects.filter(student_id=student_id).update(is_present=True)
+        AttendanceRecord.objects.filter(student_id=student_id, session_id__in=sessions[-5:-2]).update(is_present=False)
+        AttendanceRecord.objects.filter(student_id=student_id, session_id__in=[sessions[-4], sessions[-2]]).delete()
+        # La sesión de hoy creada de antemano, sin registros todavía
+        today = AttendanceSession.objects.get(course=self.course, date=date.today())
+        records = list(today.records.values_list('student_id', 'is_present'))
+        today.records.all().delete()
+
+        bitmaps = build_bitmaps(self.course)
+        self.assertNotIn(today.id, bitmaps.session_ids)
+        self.assertEqual(bitmaps.current_absence_streak(student_id), 2)
+        self.assertEqual(bitmaps.longest_absence_streak(student_id), 2)
+
+        AttendanceRecord.objects.bulk_create(
+            AttendanceRecord(student_id=record_student, session=today, is_present=is_present)
+            for record_student, is_present in records
+        )
+        sync_bitmaps(bitmaps, self.course)
+        rebuilt = build_bitmaps(self.course)
+        self.assertEqual(bitmaps.session_ids, rebuilt.session_ids)
+        self.assertEqual(bitmaps.session_counts(), rebuilt.session_counts())
+
+    def test_deletes_rebuild_maps_in_other_processes(self):
+        session = AttendanceSession.objects.filter(course=self.course).order_by('-date').first()
+        held = course_bitmaps(self.course)
+        held_entry = _bitmaps[self.course.id]
+        student = held.student_index[self.student_id]
+        self.assertTrue(held.recorded[student] >> held.session_index[session.id] & 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            delete_records(AttendanceRecord.objects.filter(student_id=self.student_id, session=session))
+        # Otro worker todavía tiene el mapa anterior en su memoria
+        _bitmaps[self.course.id] = held_entry
+        bitmaps = course_bitmaps(self.course)
+        self.assertIsNot(bitmaps, held)
+        self.assertFalse(bitmaps.recorded[student] >> bitmaps.session_index[session.id] & 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            session.delete()
+        self.assertNotIn(session.id, course_bitmaps(self.course).session_ids)
+
+    def test_building_one_course_does_not_block_others(self):
+        other = Course.objects.create(name='Otro curso', code='otro-mapa')
+        # Mientras se arma el mapa de otro curso (su lock tomado)
+        with _course_lock(other.id):
+            self.assertEqual(course_bitmaps(self.course).course_id, self.course.id)
+
+    def test_sync_after_save_and_dump(self):
+        bitmaps = course_bitmaps(self.course)
+        session = AttendanceSession.objects.filter(course=self.course).order_by('-date').first()
+        student_id = self.student_id
+        self.client.post(
+            reverse('attendance:save_attendance'),
+            json.dumps({'attendance': {str(student_id): False}}),
+            content_type='application/json',
+        )
+        # En las pruebas no corren los on_commit que cambian la versión
+        bump_versions(ROSTER, course_id=self.course.id)
+        bitmaps = course_bitmaps(self.course)
+        self.assertFalse(bitmaps.present[bitmaps.student_index[student_id]] >> bitmaps.session_index[session.id] & 1)
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'curso.bitmap')
+            bitmaps.dump(path)
+            loaded = AttendanceBitmaps.load(path)
+        self.assertEqual(loaded.percentages(), bitmaps.percentages())
+        self.assertEqual(loaded.session_counts(), bitmaps.session_counts())
+
+
+@skipUnless(numpy, 'requiere numpy')
+class StudentsRiskTests(TestCase):
+    """Verifica los indicadores de riesgo vectorizados y el panel de estudiantes en riesgo."""
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_data(students=15, sessions=10, competencies=2, seed=5)
+        cls.course = default_course()
+        cls.student = Student.objects.get(last_name='Apellido0')
+        sessions = AttendanceSession.objects.filter(course=cls.course).order_by('date')
+        AttendanceRecord.objects.filter(student=cls.student).update(is_present=True)
+        AttendanceRecord.objects.filter(student=cls.student, session__in=sessions[6:]).update(is_present=False)
+
+    def setUp(self):
+        invalidate_bitmaps(self.course.id)
+        bump_versions(ROSTER, STUDENTS, course_id=self.course.id)
+
+    def test_indicators(self):
+        present = numpy.array([
+            [1, 1, 1, 1, 0, 0, 0],
+            [1, 0, 0, 1, 0, 0, 1],
+            [0, 0, 1, 1, 1, 1, 1],
+        ], dtype=bool)
+        recorded = numpy.ones_like(present)
+        recorded[2, 0] = False
+        metrics, flags, correlation = compute_risk(
+            present, recorded, [10, 50, 90], window=3,
+            thresholds={'min_rate': 50, 'min_recent_rate': 50, 'max_current_streak': 3, 'min_trend': -10},
+        )
+        self.assertEqual(list(metrics['longest_streak']), [3, 2, 1])
+        self.assertEqual(list(metrics['current_streak']), [3, 0, 0])
+        self.assertLess(metrics['trend'][0], 0)
+        self.assertGreater(metrics['trend'][2], 0)
+        self.assertAlmostEqual(metrics['rate'][2], 5 / 6 * 100)
+        self.assertEqual(list(metrics['rolling_rate'][0]), [100, 100, 100, 100, 200 / 3, 100 / 3, 0])
+        self.assertEqual(list(metrics['recent_rate']), list(metrics['rolling_rate'][:, -1]))
+        self.assertEqual(flags[0], ['min_recent_rate', 'max_current_streak', 'min_trend'])
+        self.assertEqual(flags[2], [])
+        self.assertGreater(correlation, 0)
+
+    def test_dashboard_flags_absence_streak(self):
+        response = self.client.get(reverse('attendance:students_risk'))
+        rows = {row['student'].id: row for row in response.context['rows']}
+        self.assertEqual(rows[self.student.id]['current_streak'], 4)
+        self.assertIn('Racha de ausencias', rows[self.student.id]['flags'])
+        self.assertEqual(response.context['rows'][0]['student'].id, self.student.id)
+
+    def test_empty_session_today_keeps_absence_streak(self):
+        # La sesión de hoy creada de antemano, todavía sin registros
+        AttendanceRecord.objects.filter(session__course=self.course, session__date=date.today()).delete()
+        response = self.client.get(reverse('attendance:students_risk'))
+        rows = {row['student'].id: row for row in response.context['rows']}
+        self.assertEqual(rows[self.student.id]['current_streak'], 3)
+        self.assertIn('Racha de ausencias', rows[self.student.id]['flags'])
+
+    def test_current_streak_skips_unrecorded_sessions(self):
+        present = numpy.array([[1, 0, 0, 0, 0], [0, 0, 1, 0, 0]], dtype=bool)
+        recorded = numpy.array([[1, 1, 0, 1, 0], [1, 1, 1, 1, 0]], dtype=bool)
+        metrics, _, _ = compute_risk(present, recorded, [50, 50], window=3, thresholds=DEFAULT_THRESHOLDS)
+        self.assertEqual(list(metrics['current_streak']), [2, 1])
+        self.assertEqual(list(metrics['longest_streak']), [2, 2])
+        self.assertTrue((metrics['current_streak'] <= metrics['longest_streak']).all())
+
+    def test_report_is_cached_by_version(self):
+        with self.settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'risk'}}):
+            risk_report(self.course)
+            with CaptureQueriesContext(connection) as ctx:
+                risk_report(self.course)
+            self.assertEqual(len(ctx.captured_queries), 0)
+
+    def test_command(self):
+        out = io.StringIO()
+        call_command('students_at_risk', stdout=out)
+        self.assertIn('Nombre0 Apellido0', out.getvalue())
+
+
+class CompetencyMatrixTests(TestCase):
+    """Verifica la matriz de competencias y su guardado en bloque."""
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_data(students=12, sessions=1, competencies=4)
+        cls.students = list(Student.objects.filter(is_active=True, last_name__startswith='Apellido').order_by('id'))
+        cls.competencies = list(Competency.objects.filter(name__startswith='Competencia de prueba').order_by('id'))
+
+    def save(self, cells):
+        return self.client.post(
+            reverse('attendance:save_competency_matrix'),
+            json.dumps({'cells': cells}),
+            content_type='application/json',
+        )
+
+    def test_matrix_lists_every_cell(self):
+        response = self.client.get(reverse('attendance:competency_matrix'))
+        self.assertContains(response, 'class="matrix-checkbox"', count=len(response.context['rows']) * len(response.context['competencies']))
+
+    def test_bulk_save_writes_changed_cells_and_returns_totals(self):
+        cells = {
+            str(student.id): {str(competency.id): True for competency in self.competencies}
+            for student in self.students
+        }
+        before = StudentCompetency.objects.filter(is_achieved=True, student__in=self.students).count()
+        with CaptureQueriesContext(connection) as ctx:
+            result = self.save(cells).json()
+        inserts = [q for q in ctx.captured_queries if q['sql'].startswith('INSERT')]
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual(result['changed'], len(self.students) * len(self.competencies) - before)
+        self.assertEqual(set(result['totals'].values()), {len(self.competencies)})
+
+        self.assertEqual(self.save(cells).json()['changed'], 0)
+
+    def test_unknown_ids_are_rejected(self):
+        other = Course.objects.create(name='Otro curso', code='otro')
+        outsider = Student.objects.create(course=other, first_name='Ana', last_name='Ajena')
+        competency = str(self.competencies[0].id)
+        self.assertEqual(self.save({str(outsider.id): {competency: True}}).status_code, 404)
+        self.assertEqual(self.save({str(self.students[0].id): {'999999': True}}).status_code, 404)
+        self.assertFalse(StudentCompetency.objects.filter(student=outsider).exists())
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}})
+class CourseTenancyTests(TestCase):
+    """Verifica que cada curso solo vea sus estudiantes y sesiones."""
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_data(students=5, sessions=2, competencies=1)
+        cls.course = default_course()
+        cls.other = Course.objects.create(name='Otro curso', code='otro')
+        cls.other_student = Student.objects.create(course=cls.other, first_name='Zoe', last_name='Única')
+
+    def test_views_are_scoped_to_course(self):
+        index = reverse('attendance:index')
+        self.assertNotContains(self.client.get(index), 'Única')
+
+        response = self.client.get(index, {'course': 'otro'})
+        self.assertContains(response, 'Única')
+        self.assertEqual(response.cookies[COURSE_COOKIE].value, 'otro')
+        # La cookie recuerda el curso elegido
+        self.assertContains(self.client.get(reverse('attendance:students_list')), 'Única')
+        self.assertEqual(AttendanceSession.objects.filter(course=self.other, date=date.today()).count(), 1)
+
+        student = Student.objects.filter(course=self.course).first()
+        self.assertEqual(self.client.get(reverse('attendance:student_detail', args=[student.id])).status_code, 404)
+
+    def test_session_is_unique_per_course_and_date(self):
+        AttendanceSession.objects.create(course=self.other, date=date.today())
+        with self.assertRaises(IntegrityError):
+            AttendanceSession.objects.create(course=self.other, date=date.today())
+
+    def test_search_is_scoped_to_course(self):
+        for backend in ('fts5', 'trie'):
+            with self.subTest(backend=backend):
+                self.assertEqual(search_students('unica', backend=backend, course=self.course)[1], [])
+                results = search_students('unica', backend=backend, course=self.other)[1]
+                self.assertEqual([row[0] for row in results], [self.other_student.id])
+
+    def test_router_uses_course_database(self):
+        partitioned = Course(id=self.other.id, code='grande', database='grande')
+        with course_context(partitioned):
+            self.assertEqual(router.db_for_read(Student), 'grande')
+            self.assertEqual(router.db_for_write(AttendanceSession), 'grande')
+            self.assertEqual(router.db_for_read(Course), 'default')
+            # Un objeto ya cargado se queda en su base de datos
+            self.assertEqual(router.db_for_write(Student, instance=self.other_student), 'default')
+        self.assertEqual(router.db_for_read(Student), 'default')
+
+
+class BulkSaveAttendanceTests(TestCase):
+    """Verifica el guardado en bloque (upsert) de la asistencia de una sesión."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.course = Course.objects.create(name='Curso en bloque', code='bloque')
+        cls.students = Student.objects.bulk_create([
+            Student(course=cls.course, first_name=f'Ana{i}', last_name=f'Bloque{i}') for i in range(5)
+        ])
+        cls.session = AttendanceSession.objects.create(course=cls.course, date=date.today() - timedelta(days=1))
+
+    def records(self):
+        return dict(self.session.records.values_list('student_id', 'is_present'))
+
+    def test_writes_every_record_with_one_insert(self):
+        attendance = {str(student.id): i % 2 == 0 for i, student in enumerate(self.students)}
+        with CaptureQueriesContext(connection) as ctx:
+            counts = bulk_save_attendance(self.session, attendance)
+        inserts = [q for q in ctx.captured_queries if q['sql'].startswith('INSERT INTO "attendance_attendancerecord"')]
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual(counts, (3, 2))
+        self.assertEqual(self.records(), {student.id: i % 2 == 0 for i, student in enumerate(self.students)})
+
+    def test_resave_updates_in_place(self):
+        bulk_save_attendance(self.session, {student.id: True for student in self.students})
+        bulk_save_attendance(self.session, {self.students[0].id: False})
+        records = self.records()
+        self.assertEqual(len(records), len(self.students))
+        self.assertFalse(records[self.students[0].id])
+        self.assertTrue(records[self.students[1].id])
+
+    def test_unknown_student_writes_nothing(self):
+        outsider = Student.objects.create(first_name='Zoe', last_name='Ajena')
+        with self.assertRaises(Http404):
+            bulk_save_attendance(self.session, {self.students[0].id: True, outsider.id: True})
+        self.assertEqual(self.records(), {})
+
+    def test_view_returns_counts(self):
+        response = self.client.post(
+            reverse('attendance:save_attendance'),
+            json.dumps({'attendance': {str(self.students[0].id): True}}),
+            content_type='application/json',
+            headers={'cookie': f'{COURSE_COOKIE}=bloque'},
+        )
+        self.assertEqual(response.json()['present_count'], 1)
+        self.assertTrue(todays_session(self.course).records.get(student=self.students[0]).is_present)
+
+
+class StatsQuerySetTests(TestCase):
+    """Verifica que las estadísticas anotadas coincidan con las consultas por objeto."""
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_data(students=6, sessions=4, competencies=3, seed=2)
+        cls.course = default_course()
+
+    def test_student_stats_match_fallback(self):
+        students = Student.objects.filter(course=self.course).with_attendance_stats().with_competency_stats()
+        for annotated in students:
+            student = Student.objects.get(pk=annotated.pk)
+            with self.subTest(student=student.full_name):
+                self.assertEqual(annotated.attendance_count, student.attendance_count)
+                self.assertEqual(annotated.absence_count, student.absence_count)
+                self.assertEqual(annotated.attendance_percentage, student.attendance_percentage)
+                self.assertEqual(annotated.competencies_achieved, student.competencies_achieved)
+                self.assertEqual(annotated.competencies_total, student.competencies_total)
+
+    def test_session_stats_match_fallback(self):
+        for annotated in AttendanceSession.objects.filter(course=self.course).with_attendance_stats():
+            session = AttendanceSession.objects.get(pk=annotated.pk)
+            with self.subTest(session=session.date):
+                self.assertEqual(
+                    (annotated.present_count, annotated.absent_count, annotated.total_count),
+                    (session.present_count, session.absent_count, session.total_count),
+                )
+
+    def test_listing_uses_one_query(self):
+        with self.assertNumQueries(1):
+            for student in Student.objects.filter(course=self.course).with_attendance_stats().with_competency_stats():
+                student.attendance_percentage, student.competencies_achieved
+
+
+class AttendanceSummaryTests(TestCase):
+    """Verifica que los resúmenes incrementales coincidan con un recálculo completo."""
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_data(students=8, sessions=3, competencies=1, seed=4)
+        cls.course = default_course()
+        cls.session = AttendanceSession.objects.get(course=cls.course, date=date.today())
+        cls.students = list(Student.objects.filter(course=cls.course, last_name__startswith='Apellido').order_by('id'))
+
+    def assertNoDrift(self):
+        self.assertEqual(rebuild_attendance_summaries(dry_run=True), [])
+
+    def test_saves_and_edits(self):
+        bulk_save_attendance(self.session, {student.id: True for student in self.students})
+        self.assertNoDrift()
+        bulk_save_attendance(self.session, {student.id: False for student in self.students[:3]})
+        self.assertNoDrift()
+        new_session = AttendanceSession.objects.create(course=self.course, date=date.today() - timedelta(days=30))
+        bulk_save_attendance(new_session, {self.students[0].id: True, self.students[1].id: False})
+        self.assertNoDrift()
+
+    def test_deactivation_and_deletes(self):
+        url = reverse('attendance:students_manage')
+        self.client.post(url, {'action': 'deactivate', 'student_id': self.students[0].id})
+        self.assertNoDrift()
+        self.client.post(url, {'action': 'delete', 'student_id': self.students[1].id})
+        self.assertNoDrift()
+        AttendanceSession.objects.filter(course=self.course).order_by('date').first().delete()
+        self.assertNoDrift()
+
+    def test_admin_record_changes(self):
+        admin_user = User.objects.create_superuser('admin', 'admin@example.com', 'clave')
+        self.client.force_login(admin_user)
+        record = self.session.records.get(student=self.students[2])
+        self.client.post(reverse('admin:attendance_attendancerecord_change', args=[record.pk]), {
+            'student': record.student_id,
+            'session': record.session_id,
+            'is_present': '' if record.is_present else 'on',
+        })
+        self.assertNotEqual(AttendanceRecord.objects.get(pk=record.pk).is_present, record.is_present)
+        self.assertNoDrift()
+
+        self.client.post(reverse('admin:attendance_attendancerecord_delete', args=[record.pk]), {'post': 'yes'})
+        self.assertFalse(AttendanceRecord.objects.filter(pk=record.pk).exists())
+        self.assertNoDrift()
+
+        self.client.post(reverse('admin:attendance_attendancerecord_add'), {
+            'student': record.student_id,
+            'session': record.session_id,
+            'is_present': 'on',
+        })
+        self.assertTrue(AttendanceRecord.objects.filter(student=record.student_id, session=record.session_id).exists())
+        self.assertNoDrift()
+
+        self.client.post(reverse('admin:attendance_attendancerecord_changelist'), {
+            'action': 'delete_selected',
+            '_selected_action': list(self.session.records.values_list('pk', flat=True)[:4]),
+            'post': 'yes',
+        })
+        self.assertEqual(self.session.records.count(), len(self.students) - 4)
+        self.assertNoDrift()
+
+
+class VersionedCacheTests(TestCase):
+    """Verifica que las versiones del caché de páginas se compartan entre procesos."""
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_data(students=3, sessions=1, competencies=1)
+        cls.course = default_course()
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.versions_dir = directory.name
+        caches_setting = {
+            'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'paginas'},
+            'versions': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': directory.name},
+        }
+        self.enterContext(override_settings(CACHES=caches_setting))
+
+    def test_bump_in_another_process_invalidates_pages(self):
+        url = reverse('attendance:students_list')
+        self.assertContains(self.client.get(url), 'Apellido0')
+        Student.objects.filter(last_name='Apellido0').update(last_name='Renombrado')
+        self.assertContains(self.client.get(url), 'Apellido0')
+
+        # Otro worker: mismo directorio de versiones, su propia memoria
+        other = FileBasedCache(self.versions_dir, {})
+        other.set(_version_key(ROSTER, self.course.id), 'otra-version', timeout=None)
+        self.assertContains(self.client.get(url), 'Renombrado')
+
+    def test_snapshot_follows_bump_in_another_process(self):
+        student = roster_snapshot(self.course).active[0]
+        Student.objects.filter(pk=student.id).update(first_name='Renombrado')
+        self.assertIn(student, roster_snapshot(self.course).active)
+
+        other = FileBasedCache(self.versions_dir, {})
+        other.set(_version_key(STUDENTS, self.course.id), 'otra-version', timeout=None)
+        entry = next(entry for entry in roster_snapshot(self.course).active if entry.id == student.id)
+        self.assertEqual(entry.first_name, 'Renombrado')
+
+    def test_page_key_includes_course(self):
+        other = Course.objects.create(name='Otro curso', code='otro')
+        request = SimpleNamespace(
+            course=self.course, resolver_match=SimpleNamespace(view_name='attendance:history'), get_full_path=lambda: '/history/'
+        )
+        key = _page_key(request, [COMPETENCIES])
+        request.course = other
+        self.assertNotEqual(_page_key(request, [COMPETENCIES]), key)
+
+
+class ConditionalGetTests(TestCase):
+    """Verifica las respuestas 304 de las vistas de lectura y la API de estadísticas."""
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_data(students=4, sessions=2, competencies=1)
+        cls.session = AttendanceSession.objects.get(course=default_course(), date=date.today())
+        cls.student_id = cls.session.records.values_list('student_id', flat=True).first()
+
+    def save(self, is_present):
+        with self.captureOnCommitCallbacks(execute=True):
+            bulk_save_attendance(self.session, {self.student_id: is_present})
+
+    def test_unchanged_page_is_not_modified(self):
+        url = reverse('attendance:history')
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get(url, headers={'if-none-match': response['ETag']}).status_code, 304)
+        self.assertEqual(
+            self.client.get(url, headers={'if-modified-since': response['Last-Modified']}).status_code, 304
+        )
+
+    def test_save_changes_etag(self):
+        url = reverse('attendance:session_detail', args=[self.session.id])
+        etag = self.client.get(url)['ETag']
+        is_present = self.session.records.get(student_id=self.student_id).is_present
+        self.save(not is_present)
+        self.assertEqual(self.client.get(url, headers={'if-none-match': etag}).status_code, 200)
+
+    def test_session_stats(self):
+        url = reverse('attendance:session_stats', args=[self.session.id])
+        response = self.client.get(url)
+        stats = response.json()
+        self.assertEqual(stats['total'], self.session.records.count())
+        self.assertEqual(stats['present_count'], self.session.records.filter(is_present=True).count())
+        self.assertEqual(self.client.get(url, headers={'if-none-match': response['ETag']}).status_code, 304)
+
+        self.save(not self.session.records.get(student_id=self.student_id).is_present)
+        changed = self.client.get(url, headers={'if-none-match': response['ETag']})
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed.json()['present_count'], stats['present_count'])
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}})
+class HistoryPaginationTests(TestCase):
+    """Verifica la paginación por llave del historial y su filtro de fechas."""
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_data(students=2, sessions=45, competencies=1)
+        cls.dates = list(
+            AttendanceSession.objects.filter(course=default_course()).order_by('-date').values_list('date', flat=True)
+        )
+
+    def more(self, **params):
+        return self.client.get(reverse('attendance:history_more'), params).json()
+
+    def test_pages_cover_every_session_once(self):
+        response = self.client.get(reverse('attendance:history'))
+        seen = [item['session']['date'] for item in response.context['sessions_data']]
+        before = response.context['next_before']
+        self.assertEqual(len(seen), HISTORY_PAGE_SIZE)
+        while before:
+            page = self.more(before=before.isoformat())
+            seen += [date.fromisoformat(session['date']) for session in page['sessions']]
+            before = page['next_before'] and date.fromisoformat(page['next_before'])
+        self.assertEqual(seen, self.dates)
+
+    def test_date_filter(self):
+        date_from, date_to = self.dates[30], self.dates[10]
+        response = self.client.get(reverse('attendance:history'), {'from': date_from, 'to': date_to})
+        dates = [item['session']['date'] for item in response.context['sessions_data']]
+        self.assertEqual(dates, self.dates[10:30])
+        page = self.more(before=dates[-1].isoformat(), **{'from': date_from.isoformat()})
+        self.assertEqual([session['date'] for session in page['sessions']], [date_from.isoformat()])
+        self.assertIsNone(page['next_before'])
+
+    def test_invalid_date_is_rejected(self):
+        response = self.client.get(reverse('attendance:history_more'), {'before': 'ayer'})
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(ATTENDANCE_QUERY_BUDGET='raise')
+class AttendanceExportTests(TestCase):
+    """Verifica la exportación de la matriz de asistencia en CSV y XLSX."""
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_data(students=3, sessions=2, competencies=1)
+        cls.course = default_course()
+        cls.student = Student.objects.get(last_name='Apellido0')
+
+    def export(self, **params):
+        response = self.client.get(reverse('attendance:export_attendance'), params)
+        self.assertEqual(response.status_code, 200)
+        return list(csv.reader(io.StringIO(b''.join(response.streaming_content).decode())))
+
+    def test_csv_matrix(self):
+        header, *rows = self.export()
+        sessions = AttendanceSession.objects.filter(course=self.course).order_by('date')
+        self.assertEqual(header[3:-3], [session.date.isoformat() for session in sessions])
+        self.assertEqual(len(rows), Student.objects.filter(course=self.course, is_active=True).count())
+
+        row = next(row for row in rows if row[0] == 'Apellido0')
+        expected = [
+            str(int(self.student.attendance_records.get(session=session).is_present)) for session in sessions
+        ]
+        self.assertEqual(row[3:-3], expected)
+        self.assertEqual(row[-3], str(expected.count('1')))
+
+    def test_future_session_records_are_skipped(self):
+        future = AttendanceSession.objects.create(course=self.course, date=date.today() + timedelta(days=7))
+        AttendanceRecord.objects.create(student=self.student, session=future, is_present=True)
+        header, *rows = self.export()
+        self.assertNotIn(future.date.isoformat(), header)
+        self.assertEqual(len(rows), Student.objects.filter(course=self.course, is_active=True).count())
+
+    def test_inactive_students(self):
+        Student.objects.filter(pk=self.student.pk).update(is_active=False)
+        self.assertNotIn('Apellido0', [row[0] for row in self.export()])
+        self.assertIn('Apellido0', [row[0] for row in self.export(inactive='1')])
+
+    @skipUnless(openpyxl, 'requiere openpyxl')
+    def test_xlsx_matches_csv(self):
+        with tempfile.TemporaryFile() as output:
+            write_xlsx(attendance_matrix_rows(self.course), output)
+            output.seek(0)
+            sheet = openpyxl.load_workbook(output, read_only=True)['Asistencia']
+            rows = [['' if value is None else value for value in row] for row in sheet.iter_rows(values_only=True)]
+        self.assertEqual(rows, list(attendance_matrix_rows(self.course)))
+
+    @skipUnless(openpyxl, 'requiere openpyxl')
+    def test_xlsx_view_within_budget(self):
+        response = self.client.get(reverse('attendance:export_attendance'), {'format': 'xlsx'})
+        self.assertEqual(response.status_code, 200)
+        sheet = openpyxl.load_workbook(io.BytesIO(b''.join(response.streaming_content)), read_only=True)['Asistencia']
+        self.assertEqual(len(list(sheet.iter_rows())), Student.objects.filter(course=self.course, is_active=True).count() + 1)
+
+    def test_budget_covers_the_stream(self):
+        def rows():
+            # Una consulta por fila: lo que el presupuesto debe detectar
+            for student in Student.objects.filter(course=self.course):
+                yield [student.attendance_records.count()]
+
+        stream = _budgeted_rows(rows(), 'default')
+        with self.assertRaises(QueryBudgetExceeded):
+            list(stream)
+
+
+class RosterImportTests(TestCase):
+    """Verifica la lectura de listas CSV/JSON y la deduplicación al importarlas."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.course = Course.objects.create(name='Curso importado', code='importado')
+        cls.juan = Student.objects.create(
+            course=cls.course, first_name='Juan', last_name='Pérez', email='juan1@x.com'
+        )
+        cls.maria = Student.objects.create(course=cls.course, first_name='María', last_name='Gómez', is_active=False)
+
+    def import_csv(self, content, **kwargs):
+        return import_roster(parse_roster(content, 'lista.csv'), self.course, **kwargs)
+
+    def test_parse_aliases_and_formats(self):
+        csv_rows = parse_roster('Nombre,Apellidos,Correo\nAna,López,ana@x.com\n', 'lista.csv')
+        json_rows = parse_roster(b'[{"first_name": "Ana", "last_name": "L\\u00f3pez", "email": "ana@x.com"}]')
+        self.assertEqual(csv_rows, json_rows)
+        self.assertEqual(csv_rows[0]['last_name'], 'López')
+        with self.assertRaises(ValueError):
+            parse_roster('{"nombre": "Ana"}', 'lista.json')
+
+    def test_same_name_with_other_email_is_a_new_student(self):
+        report = self.import_csv('nombre,apellido,email\nJuan,Pérez,juan2@x.com\n')
+        self.assertEqual(len(report['created']), 1)
+        self.juan.refresh_from_db()
+        self.assertEqual(self.juan.email, 'juan1@x.com')
+        self.assertEqual(Student.objects.filter(course=self.course, first_name='Juan').count(), 2)
+
+    def test_matches_by_email_then_by_name(self):
+        report = self.import_csv(
+            'nombre,apellido,email,github\n'
+            'Juan,Perez,JUAN1@x.com,juanp\n'
+            'maria,gomez,maria@x.com,\n'
+            'Luis,,luis@x.com,\n'
+        )
+        self.assertEqual(report['created'], [])
+        self.assertEqual(len(report['updated']), 2)
+        self.assertEqual(report['skipped'], [{'line': 3, 'reason': 'Nombre y apellido son obligatorios'}])
+
+        self.juan.refresh_from_db()
+        self.maria.refresh_from_db()
+        self.assertEqual((self.juan.last_name, self.juan.github_username), ('Pérez', 'juanp'))
+        self.assertEqual((self.maria.email, self.maria.is_active), ('maria@x.com', True))
+
+        # Una fila sin email coincide por nombre con el estudiante que sí lo tiene
+        self.assertEqual(self.import_csv('nombre,apellido\nJuan,Pérez\n')['unchanged'], 1)
+
+    def test_dry_run_writes_nothing(self):
+        with self.assertNumQueries(1):
+            report = self.import_csv('nombre,apellido\nAna,López\nJuan,Pérez\n', dry_run=True)
+        self.assertEqual(len(report['created']), 1)
+        self.assertFalse(Student.objects.filter(course=self.course, first_name='Ana').exists())
+
+
+class NormalizeTextTests(TestCase):
+    """Verifica que la normalización rápida coincida con la normalización Unicode completa."""
+
+    def test_matches_full_normalization(self):
+        samples = [
+            ''.join(chr(code) for code in range(32, 0x180)),
+            'José Núñez', 'ÇAĞLAR Şahin', 'Ἀθηνᾶ', 'Łukasz Żółć', 'naïve café', 'ABC',
+        ]
+        for text in samples:
+            with self.subTest(text=text[:20]):
+                self.assertEqual(normalize_text(text), _normalize_unicode(text))
+
+    def test_accents_and_case(self):
+        self.assertEqual(normalize_text('Ñandú PÉREZ'), 'nandu perez')
+        self.assertEqual(normalize_text(''), '')
+        self.assertEqual(normalize_text(None), '')
+
+    def test_normalize_many_keeps_order(self):
+        self.assertEqual(normalize_many(['Álvaro', None, 'Zoë', 'Álvaro']), ['alvaro', '', 'zoe', 'alvaro'])
+
+
+class StudentSearchTests(TestCase):
+    """Verifica la búsqueda sin acentos con FTS5 y con el índice de prefijos."""
+
+    BACKENDS = ('fts5', 'trie')
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.course = Course.objects.create(name='Curso de búsqueda', code='busqueda')
+        cls.jose = Student.objects.create(
+            course=cls.course, first_name='José', last_name='Núñez Álvarez', email='jnunez@eafit.edu.co'
+        )
+        cls.josefina = Student.objects.create(course=cls.course, first_name='Josefina', last_name='Ruiz')
+        Student.objects.create(course=cls.course, first_name='Josué', last_name='Retirado', is_active=False)
+
+    def setUp(self):
+        bump_versions(STUDENTS, course_id=self.course.id)
+
+    def search(self, query, backend):
+        return [row[0] for row in search_students(query, backend=backend, course=self.course)[1]]
+
+    def test_backends_agree(self):
+        queries = {
+            'jose': {self.jose.id, self.josefina.id},
+            'JOSÉ núñ': {self.jose.id},
+            'alvarez': {self.jose.id},
+            'jnunez': {self.jose.id},
+            'josue': set(),
+            '': set(),
+        }
+        for backend in self.BACKENDS:
+            for query, expected in queries.items():
+                with self.subTest(backend=backend, query=query):
+                    self.assertEqual(set(self.search(query, backend)), expected)
+
+    def test_index_follows_renames(self):
+        self.josefina.last_name = 'Peña'
+        self.josefina.save()
+        for backend in self.BACKENDS:
+            with self.subTest(backend=backend):
+                self.assertEqual(self.search('pena', backend), [self.josefina.id])
+                self.assertEqual(self.search('ruiz', backend), [])
+
+    def test_saving_attendance_keeps_index(self):
+        index = get_prefix_index(self.course)
+        session = AttendanceSession.objects.create(course=self.course, date=date.today())
+        with self.captureOnCommitCallbacks(execute=True):
+            bulk_save_attendance(session, {self.jose.id: True})
+        self.assertIs(get_prefix_index(self.course), index)
+
+    def test_endpoint(self):
+        response = self.client.get(
+            reverse('attendance:students_search'), {'q': 'nunez'}, headers={'cookie': f'{COURSE_COOKIE}=busqueda'}
+        )
+        self.assertEqual(response.json()['results'], [
+            {'id': self.jose.id, 'full_name': 'José Núñez Álvarez', 'email': 'jnunez@eafit.edu.co'}
+        ])
+
+
+class StudentFtsMigrationTests(TransactionTestCase):
+    """Verifica que ninguna migración deje el índice FTS5 de estudiantes sin sus triggers."""
+
+    # Las demás pruebas necesitan los datos que cargan las migraciones
+    serialized_rollback = True
+
+    def fts_triggers(self):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'attendance_student'")
+            return {name for name, in cursor.fetchall()}
+
+    def test_triggers_survive_every_migration(self):
+        if not fts_available(connection.alias):
+            self.skipTest('SQLite sin FTS5')
+        expected = {f'{FTS_TABLE}_{suffix}' for suffix in ('ai', 'ad', 'au')}
+        executor = MigrationExecutor(connection)
+        leaf = executor.loader.graph.leaf_nodes('attendance')[0]
+        plan = [node for node in executor.loader.graph.forwards_plan(leaf) if node[0] == 'attendance']
+        first = plan.index(('attendance', '0015_student_fts'))
+
+        executor.migrate([plan[first - 1]])
+        try:
+            for target in plan[first:]:
+                executor = MigrationExecutor(connection)
+                executor.migrate([target])
+                with self.subTest(migration=target[1]):
+                    self.assertEqual(self.fts_triggers() & expected, expected)
+        finally:
+            MigrationExecutor(connection).migrate([leaf])
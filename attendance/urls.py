@@ -1,21 +1,45 @@
+from django.conf import settings
 from django.urls import path
 from . import views
 
 app_name = 'attendance'
 
+
+def _view(name):
+    """Retorna la variante ``async`` de la vista si ATTENDANCE_ASYNC_VIEWS está activo."""
+    if getattr(settings, 'ATTENDANCE_ASYNC_VIEWS', False):
+        return getattr(views, f'{name}_async')
+    return getattr(views, name)
+
+
 urlpatterns = [
     # Asistencia
-    path('', views.index, name='index'),
+    path('', _view('index'), name='index'),
     path('save/', views.save_attendance, name='save_attendance'),
-    path('history/', views.history, name='history'),
-    path('session/<int:session_id>/', views.session_detail, name='session_detail'),
+    path('history/', _view('history'), name='history'),
+    path('history/more/', views.history_more, name='history_more'),
+    path('export/', views.export_attendance, name='export_attendance'),
+    path('session/<int:session_id>/', _view('session_detail'), name='session_detail'),
     path('session/<int:session_id>/edit/', views.edit_session, name='edit_session'),
     path('session/<int:session_id>/save/', views.save_session_attendance, name='save_session_attendance'),
+    path('session/<int:session_id>/stats/', views.session_stats, name='session_stats'),
+    path('session/<int:session_id>/sync/', views.sync_session_attendance, name='sync_session_attendance'),
+    path('session/<int:session_id>/events/', views.session_events, name='session_events'),
     
     # Estudiantes
-    path('students/', views.students_list, name='students_list'),
+    path('students/', _view('students_list'), name='students_list'),
     path('students/manage/', views.students_manage, name='students_manage'),
-    path('student/<int:student_id>/', views.student_detail, name='student_detail'),
+    path('students/import/', views.students_import, name='students_import'),
+    path('students/search/', views.students_search, name='students_search'),
+    path('students/risk/', views.students_risk, name='students_risk'),
+    path('student/<int:student_id>/', _view('student_detail'), name='student_detail'),
     path('student/<int:student_id>/competencies/save/', views.save_student_competencies, name='save_student_competencies'),
     path('student/<int:student_id>/update/', views.update_student_profile, name='update_student_profile'),
+    path('competencies/', views.competency_matrix, name='competency_matrix'),
+    path('competencies/save/', views.save_competency_matrix, name='save_competency_matrix'),
+    
+    # Caché y métricas
+    path('cache/stats/', views.cache_stats_view, name='cache_stats'),
+    # Sin barra final a propósito: /metrics es la ruta por defecto de los scrapers de Prometheus
+    path('metrics', views.metrics_view, name='metrics'),
 ]
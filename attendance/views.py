@@ -1,24 +1,50 @@
+import asyncio
 import json
+import tempfile
 from datetime import date
 
-from django.http import JsonResponse
-from django.shortcuts import render, get_object_or_404, redirect
-from django.views.decorators.http import require_http_methods
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.db import transaction
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.shortcuts import aget_object_or_404, render, get_object_or_404, redirect
+from django.template.loader import render_to_string
+from django.views.decorators.http import condition, require_http_methods
 from django.views.decorators.csrf import csrf_exempt
 
-from .models import Student, AttendanceSession, AttendanceRecord, Competency, StudentCompetency
+from .conditional import (
+    async_condition, competency_matrix_etag, history_etag, history_last_modified, students_list_etag, students_list_last_modified,
+    students_risk_etag,
+    session_etag, session_last_modified, session_stats_etag, student_etag, student_last_modified,
+)
+from .analytics import risk_report
+from .caching import (
+    ROSTER, STUDENTS, COMPETENCIES, arender_cached, bump_versions, cache_stats, day_scope, render_cached, student_scope,
+)
+from .events import get_broker, session_channel, session_snapshot, stream_session
+from .export import attendance_matrix_rows, stream_csv, write_xlsx
+from .metrics import render_prometheus
+from .models import Student, AttendanceSession, AttendanceRecord, Competency, StudentCompetency, StudentAttendanceSummary
+from .roster import import_roster, parse_roster
+from .schedule import atodays_session, todays_session
+from .search import SEARCH_LIMIT, search_students
+from .snapshot import roster_snapshot
+from .query_budget import query_budget
+from .services import (
+    AttendanceConflict, apply_attendance_changes, bulk_save_attendance, bulk_save_competencies,
+    save_competency_grid,
+)
 
 
+# Dos consultas más el día que no estaba en el calendario (ver attendance.schedule)
+@query_budget(max=5)
 def index(request):
     """Vista principal: muestra el listado de estudiantes para tomar asistencia del día."""
     today = date.today()
-    students = Student.objects.filter(is_active=True)
+    students = roster_snapshot(request.course).active
     
-    # Obtener o crear la sesión del día
-    session, created = AttendanceSession.objects.get_or_create(
-        date=today,
-        defaults={'description': f'Clase del {today.strftime("%d/%m/%Y")}'}
-    )
+    # Sesión del día del curso (precreada por el calendario)
+    session = todays_session(request.course, today)
     
     # Obtener registros existentes para hoy
     existing_records = {
@@ -26,6 +52,10 @@ def index(request):
         for record in session.records.all()
     }
     
+    return render(request, 'attendance/index.html', _index_context(today, session, students, existing_records))
+
+
+def _index_context(today, session, students, existing_records):
     # Preparar datos de estudiantes con su estado de asistencia
     students_data = []
     for student in students:
@@ -34,7 +64,7 @@ def index(request):
             'is_present': existing_records.get(student.id, False)
         })
     
-    context = {
+    return {
         'students_data': students_data,
         'session': session,
         'today': today,
@@ -42,36 +72,23 @@ def index(request):
         'present_count': sum(1 for s in students_data if s['is_present']),
         'absent_count': sum(1 for s in students_data if not s['is_present']),
     }
-    return render(request, 'attendance/index.html', context)
 
 
+@query_budget(max=15)
 @csrf_exempt
 @require_http_methods(["POST"])
 def save_attendance(request):
     """API endpoint para guardar la asistencia via AJAX."""
     try:
         data = json.loads(request.body)
-        today = date.today()
         
-        # Obtener o crear la sesión del día
-        session, _ = AttendanceSession.objects.get_or_create(
-            date=today,
-            defaults={'description': f'Clase del {today.strftime("%d/%m/%Y")}'}
-        )
+        # Sesión del día del curso (precreada por el calendario)
+        session = todays_session(request.course)
         
         attendance_data = data.get('attendance', {})
         
-        for student_id, is_present in attendance_data.items():
-            student = get_object_or_404(Student, id=int(student_id))
-            AttendanceRecord.objects.update_or_create(
-                student=student,
-                session=session,
-                defaults={'is_present': is_present}
-            )
-        
-        # Calcular estadísticas actualizadas
-        present_count = session.records.filter(is_present=True).count()
-        absent_count = session.records.filter(is_present=False).count()
+        # Guardar todos los registros en bloque y calcular estadísticas
+        present_count, absent_count = bulk_save_attendance(session, attendance_data)
         
         return JsonResponse({
             'success': True,
@@ -85,47 +102,213 @@ def save_attendance(request):
         return JsonResponse({'success': False, 'error': str(e)}, status=500)
 
 
-def history(request):
-    """Vista para mostrar el historial de sesiones de asistencia."""
-    sessions = AttendanceSession.objects.all().prefetch_related('records', 'records__student')
+HISTORY_PAGE_SIZE = 20
+
+
+def _parse_date(value):
+    """Convierte una fecha ISO (YYYY-MM-DD) opcional; lanza ValueError si es inválida."""
+    return date.fromisoformat(value) if value else None
+
+
+def _history_queryset(course, before=None, date_from=None, date_to=None):
+    """Consulta de una página del historial del curso más una fila para saber si hay otra."""
+    sessions = AttendanceSession.objects.filter(course=course).held().with_attendance_summary().order_by('-date')
+    if before:
+        sessions = sessions.filter(date__lt=before)
+    if date_from:
+        sessions = sessions.filter(date__gte=date_from)
+    if date_to:
+        sessions = sessions.filter(date__lte=date_to)
+    
+    return sessions.values(
+        'id', 'date', 'description', 'num_present', 'num_absent', 'num_records'
+    )[:HISTORY_PAGE_SIZE + 1]
+
+
+def _history_rows(rows):
+    """Convierte las filas de ``_history_queryset`` en ``(sessions_data, next_before)``."""
+    next_before = rows[HISTORY_PAGE_SIZE - 1]['date'] if len(rows) > HISTORY_PAGE_SIZE else None
     
     sessions_data = []
-    for session in sessions:
-        total = session.records.count()
-        present = session.present_count
+    for row in rows[:HISTORY_PAGE_SIZE]:
+        total = row['num_records']
+        present = row['num_present']
         sessions_data.append({
-            'session': session,
+            'session': row,
             'total': total,
             'present': present,
-            'absent': session.absent_count,
+            'absent': row['num_absent'],
             'percentage': round((present / total * 100) if total > 0 else 0, 1)
         })
+    return sessions_data, next_before
+
+
+def _history_filters(request):
+    """Rango de fechas del historial; un rango inválido se ignora."""
+    try:
+        return _parse_date(request.GET.get('from')), _parse_date(request.GET.get('to'))
+    except ValueError:
+        return None, None
+
+
+def _history_page(course, before=None, date_from=None, date_to=None):
+    """
+    Obtiene una página del historial con paginación por llave (keyset) sobre ``date``.
+
+    Solo se consultan las columnas de la sesión y los conteos precalculados,
+    sin instanciar modelos. Retorna ``(sessions_data, next_before)``, donde
+    ``next_before`` es la fecha a usar para la siguiente página o ``None``.
+    """
+    return _history_rows(list(_history_queryset(course, before, date_from, date_to)))
+
+
+@query_budget(max=3)
+@condition(etag_func=history_etag, last_modified_func=history_last_modified)
+def history(request):
+    """Vista para mostrar el historial de sesiones de asistencia."""
+    date_from, date_to = _history_filters(request)
+    
+    def build_context():
+        sessions_data, next_before = _history_page(request.course, date_from=date_from, date_to=date_to)
+        return {
+            'sessions_data': sessions_data,
+            'next_before': next_before,
+            'date_from': date_from,
+            'date_to': date_to,
+        }
+    
+    return render_cached(request, 'attendance/history.html', [ROSTER, day_scope(date.today())], build_context)
+
+
+@query_budget(max=3)
+@require_http_methods(["GET", "HEAD"])
+@condition(etag_func=history_etag, last_modified_func=history_last_modified)
+def history_more(request):
+    """API endpoint para cargar la siguiente página del historial ("cargar más")."""
+    try:
+        before = _parse_date(request.GET.get('before'))
+        date_from = _parse_date(request.GET.get('from'))
+        date_to = _parse_date(request.GET.get('to'))
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'Fecha inválida'}, status=400)
+    
+    sessions_data, next_before = _history_page(request.course, before, date_from, date_to)
+    
+    return JsonResponse({
+        'success': True,
+        'html': render_to_string('attendance/session_cards.html', {'sessions_data': sessions_data}, request),
+        'sessions': [
+            {
+                'id': item['session']['id'],
+                'date': item['session']['date'].isoformat(),
+                'present': item['present'],
+                'absent': item['absent'],
+                'percentage': item['percentage'],
+            }
+            for item in sessions_data
+        ],
+        'next_before': next_before.isoformat() if next_before else None,
+    })
+
+
+# Sesiones y estudiantes (con sus registros): dos consultas sin importar el tamaño
+EXPORT_QUERY_BUDGET = 2
+
+
+def _budgeted_rows(rows, using):
+    """
+    Recorre ``rows`` dentro del presupuesto de la exportación. El CSV se genera
+    mientras se envía la respuesta, después de que termina la vista, así que el
+    presupuesto acompaña al generador y no puede ser un decorador.
+    """
+    with query_budget(max=EXPORT_QUERY_BUDGET, using=using, label='export_attendance'):
+        yield from rows
+
+
+@require_http_methods(["GET"])
+def export_attendance(request):
+    """Exporta la matriz de asistencia estudiante × sesión (CSV por defecto, XLSX opcional)."""
+    export_format = request.GET.get('format', 'csv')
+    rows = _budgeted_rows(
+        attendance_matrix_rows(request.course, include_inactive=request.GET.get('inactive') == '1'),
+        request.course.db_alias,
+    )
+    
+    if export_format == 'xlsx':
+        output = tempfile.TemporaryFile()
+        try:
+            write_xlsx(rows, output)
+        except RuntimeError as e:
+            output.close()
+            return JsonResponse({'success': False, 'error': str(e)}, status=501)
+        output.seek(0)
+        return FileResponse(output, as_attachment=True, filename='asistencia.xlsx')
+    
+    if export_format != 'csv':
+        return JsonResponse({'success': False, 'error': 'Formato no soportado'}, status=400)
     
-    return render(request, 'attendance/history.html', {'sessions_data': sessions_data})
+    response = StreamingHttpResponse(stream_csv(rows), content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = 'attachment; filename="asistencia.csv"'
+    return response
 
 
+@query_budget(max=4)
+@condition(etag_func=session_etag, last_modified_func=session_last_modified)
 def session_detail(request, session_id):
     """Vista para ver el detalle de una sesión específica."""
-    session = get_object_or_404(AttendanceSession, id=session_id)
-    records = session.records.select_related('student').order_by('student__last_name', 'student__first_name')
+    session = get_object_or_404(
+        AttendanceSession.objects.with_attendance_summary(), id=session_id, course=request.course
+    )
+    records = _session_records(session_id)
+    return render(request, 'attendance/session_detail.html', _session_detail_context(session, records))
+
+
+def _session_records(session_id):
+    return AttendanceRecord.objects.filter(session_id=session_id).select_related('student').order_by(
+        'student__last_name_normalized', 'student__first_name'
+    )
+
+
+def _session_detail_context(session, records):
     today = date.today()
     
     # Solo se puede editar si la sesión es del día actual
     can_edit = session.date == today
     
-    context = {
+    return {
         'session': session,
         'records': records,
         'present_count': session.present_count,
         'absent_count': session.absent_count,
         'can_edit': can_edit,
     }
-    return render(request, 'attendance/session_detail.html', context)
 
 
+@query_budget(max=3)
+@require_http_methods(["GET", "HEAD"])
+@condition(etag_func=session_stats_etag, last_modified_func=session_last_modified)
+def session_stats(request, session_id):
+    """API endpoint de solo lectura con las estadísticas de una sesión."""
+    session = get_object_or_404(
+        AttendanceSession.objects.with_attendance_summary(), id=session_id, course=request.course
+    )
+    total = session.total_count
+    present = session.present_count
+    
+    return JsonResponse({
+        'session_id': session.id,
+        'date': session.date.isoformat(),
+        'present_count': present,
+        'absent_count': session.absent_count,
+        'total': total,
+        'percentage': round((present / total * 100) if total > 0 else 0, 1),
+    })
+
+
+@query_budget(max=3)
 def edit_session(request, session_id):
     """Vista para editar la asistencia de una sesión (solo si es del día actual)."""
-    session = get_object_or_404(AttendanceSession, id=session_id)
+    session = get_object_or_404(AttendanceSession, id=session_id, course=request.course)
     today = date.today()
     
     # Verificar que la sesión sea del día actual
@@ -139,7 +322,7 @@ def edit_session(request, session_id):
             'error': 'Solo puedes editar sesiones del día actual.'
         })
     
-    students = Student.objects.filter(is_active=True)
+    students = roster_snapshot(request.course).active
     
     # Obtener registros existentes para esta sesión
     existing_records = {
@@ -167,12 +350,13 @@ def edit_session(request, session_id):
     return render(request, 'attendance/edit_session.html', context)
 
 
+@query_budget(max=14)
 @csrf_exempt
 @require_http_methods(["POST"])
 def save_session_attendance(request, session_id):
     """API endpoint para guardar la asistencia de una sesión específica via AJAX."""
     try:
-        session = get_object_or_404(AttendanceSession, id=session_id)
+        session = get_object_or_404(AttendanceSession, id=session_id, course=request.course)
         today = date.today()
         
         # Verificar que la sesión sea del día actual
@@ -185,39 +369,147 @@ def save_session_attendance(request, session_id):
         data = json.loads(request.body)
         attendance_data = data.get('attendance', {})
         
-        for student_id, is_present in attendance_data.items():
-            student = get_object_or_404(Student, id=int(student_id))
-            AttendanceRecord.objects.update_or_create(
-                student=student,
-                session=session,
-                defaults={'is_present': is_present}
-            )
+        # Con la versión que vio el cliente la escritura es optimista (409 si hay conflicto)
+        base_version = data.get('version')
+        if base_version is not None and not isinstance(base_version, int):
+            return JsonResponse({'success': False, 'error': 'Datos inválidos'}, status=400)
         
-        # Calcular estadísticas actualizadas
-        present_count = session.records.filter(is_present=True).count()
-        absent_count = session.records.filter(is_present=False).count()
+        # La página envía solo las casillas cambiadas: las estadísticas se
+        # toman del resumen de la sesión y no de los datos recibidos
+        version, _, summary = apply_attendance_changes(session, attendance_data, base_version)
         
         return JsonResponse({
             'success': True,
             'message': 'Asistencia actualizada correctamente',
-            'present_count': present_count,
-            'absent_count': absent_count,
+            'present_count': summary['present_count'],
+            'absent_count': summary['absent_count'],
+            'version': version,
+        })
+    except AttendanceConflict as conflict:
+        return _conflict_response(conflict)
+    except json.JSONDecodeError:
+        return JsonResponse({'success': False, 'error': 'Datos inválidos'}, status=400)
+    except Exception as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=500)
+
+
+def _conflict_response(conflict):
+    return JsonResponse({
+        'success': False,
+        'error': 'Otro usuario modificó la asistencia de algunos estudiantes. Revisa y vuelve a guardar.',
+        'version': conflict.version,
+        'conflicts': [
+            {'student_id': student_id, 'is_present': is_present, 'version': version}
+            for student_id, is_present, version in conflict.conflicts
+        ],
+    }, status=409)
+
+
+@query_budget(max=15)
+@csrf_exempt
+@require_http_methods(["POST"])
+def sync_session_attendance(request, session_id):
+    """
+    API endpoint idempotente para el diario de cambios sin conexión del cliente.
+
+    Recibe un lote ``{"batch_id": ..., "base_version": ..., "changes": {student_id: is_present}}``
+    con solo los estudiantes que cambiaron, lo aplica en bloque y retorna la
+    nueva versión de la sesión y sus totales. Si ``base_version`` está
+    presente y otro usuario cambió alguno de esos estudiantes, responde 409.
+    """
+    try:
+        session = get_object_or_404(AttendanceSession, id=session_id, course=request.course)
+        
+        # Verificar que la sesión sea del día actual
+        if session.date != date.today():
+            return JsonResponse({
+                'success': False,
+                'error': 'Solo puedes editar sesiones del día actual.'
+            }, status=403)
+        
+        data = json.loads(request.body)
+        changes = data.get('changes', {})
+        base_version = data.get('base_version')
+        if not isinstance(changes, dict) or (base_version is not None and not isinstance(base_version, int)):
+            return JsonResponse({'success': False, 'error': 'Datos inválidos'}, status=400)
+        
+        version, changed, summary = apply_attendance_changes(session, changes, base_version)
+        
+        return JsonResponse({
+            'success': True,
+            'batch_id': data.get('batch_id'),
+            'version': version,
+            'applied': len(changed),
+            **summary,
         })
+    except AttendanceConflict as conflict:
+        return _conflict_response(conflict)
     except json.JSONDecodeError:
         return JsonResponse({'success': False, 'error': 'Datos inválidos'}, status=400)
     except Exception as e:
         return JsonResponse({'success': False, 'error': str(e)}, status=500)
 
 
+# Espera entre reconexiones del navegador cuando el stream no puede quedar abierto (WSGI)
+EVENTS_POLL_RETRY_MS = 15000
+
+
+@query_budget(max=2, label='session_events')
+def _session_snapshot(session_id, course_id):
+    return session_snapshot(session_id, course_id)
+
+
+@require_http_methods(["GET", "HEAD"])
+async def session_events(request, session_id):
+    """
+    Stream de Server-Sent Events con las actualizaciones de una sesión.
+
+    Envía primero el estado completo (``snapshot``) y luego un evento
+    ``attendance`` por cada escritura confirmada, con los estudiantes que
+    cambiaron y los nuevos totales. La conexión solo queda abierta bajo ASGI;
+    bajo WSGI cada conexión ocuparía un hilo, así que se envía el estado
+    actual y el navegador se reconecta tras ``EVENTS_POLL_RETRY_MS``.
+    """
+    live = isinstance(request, ASGIRequest)
+    # Suscribirse antes de leer el estado para no perder escrituras intermedias
+    channel = session_channel(request.course.id, session_id)
+    subscription = get_broker().subscribe(channel) if live else None
+    try:
+        snapshot = await sync_to_async(_session_snapshot)(session_id, request.course.id)
+    except AttendanceSession.DoesNotExist:
+        if subscription is not None:
+            subscription.close()
+        raise Http404('Sesión no encontrada')
+    
+    if live:
+        content = stream_session(subscription, snapshot)
+    else:
+        content = [f'retry: {EVENTS_POLL_RETRY_MS}\n\n', snapshot]
+    response = StreamingHttpResponse(content, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
 # ========================================
 # Vistas de Estudiantes y Competencias
 # ========================================
 
+@query_budget(max=5)
+@condition(etag_func=students_list_etag, last_modified_func=students_list_last_modified)
 def students_list(request):
     """Vista para mostrar el listado de estudiantes."""
-    students = Student.objects.filter(is_active=True).prefetch_related('student_competencies')
-    total_competencies = Competency.objects.count()
+    def build_context():
+        return _students_list_context(_active_students_with_stats(request.course), Competency.objects.count())
     
+    return render_cached(request, 'attendance/students_list.html', [ROSTER, COMPETENCIES], build_context)
+
+
+def _active_students_with_stats(course):
+    return Student.objects.filter(course=course, is_active=True).with_attendance_summary().with_competency_stats()
+
+
+def _students_list_context(students, total_competencies):
     students_data = []
     for student in students:
         students_data.append({
@@ -227,21 +519,72 @@ def students_list(request):
             'total_competencies': total_competencies,
         })
     
-    return render(request, 'attendance/students_list.html', {
+    return {
         'students_data': students_data,
         'total_students': len(students_data),
+    }
+
+
+@query_budget(max=2)
+@require_http_methods(["GET"])
+def students_search(request):
+    """API endpoint de búsqueda de estudiantes (sin acentos) para autocompletado."""
+    try:
+        limit = min(max(int(request.GET.get('limit', SEARCH_LIMIT)), 1), 100)
+    except ValueError:
+        limit = SEARCH_LIMIT
+    
+    backend, results = search_students(request.GET.get('q', ''), limit=limit, course=request.course)
+    
+    return JsonResponse({
+        'backend': backend,
+        'results': [
+            {
+                'id': student_id,
+                'full_name': f'{first_name} {last_name}',
+                'email': email,
+            }
+            for student_id, first_name, last_name, email in results
+        ],
     })
 
 
+# Sin caché: armar el mapa de bits del curso (4), la lista de estudiantes,
+# las competencias (2) y Last-Modified (3)
+@query_budget(max=10)
+@condition(etag_func=students_risk_etag, last_modified_func=students_list_last_modified)
+def students_risk(request):
+    """Vista de estudiantes en riesgo: asistencia reciente, rachas de ausencias y tendencia."""
+    try:
+        report = risk_report(request.course)
+    except RuntimeError as e:
+        # numpy es opcional: la página explica qué falta
+        return render(request, 'attendance/students_risk.html', {'error': str(e)})
+    
+    return render(request, 'attendance/students_risk.html', report)
+
+
+@query_budget(max=6)
+@condition(etag_func=student_etag, last_modified_func=student_last_modified)
 def student_detail(request, student_id):
     """Vista para ver el detalle de un estudiante con sus competencias."""
-    student = get_object_or_404(Student, id=student_id)
-    competencies = Competency.objects.all()
+    def build_context():
+        student = get_object_or_404(
+            Student.objects.with_attendance_summary().with_competency_stats(), id=student_id, course=request.course
+        )
+        return _student_detail_context(student, Competency.objects.all(), student.student_competencies.all())
     
+    return render_cached(
+        request, 'attendance/student_detail.html',
+        [student_scope(student_id), COMPETENCIES], build_context
+    )
+
+
+def _student_detail_context(student, competencies, student_competencies):
     # Obtener las competencias del estudiante
     student_competency_map = {
         sc.competency_id: sc 
-        for sc in student.student_competencies.all()
+        for sc in student_competencies
     }
     
     # Preparar datos de competencias
@@ -254,7 +597,7 @@ def student_detail(request, student_id):
             'notes': sc.notes if sc else '',
         })
     
-    context = {
+    return {
         'student': student,
         'competencies_data': competencies_data,
         'attendance_count': student.attendance_count,
@@ -263,25 +606,20 @@ def student_detail(request, student_id):
         'competencies_achieved': student.competencies_achieved,
         'total_competencies': len(competencies_data),
     }
-    return render(request, 'attendance/student_detail.html', context)
 
 
+@query_budget(max=4)
 @csrf_exempt
 @require_http_methods(["POST"])
 def save_student_competencies(request, student_id):
     """API endpoint para guardar las competencias de un estudiante via AJAX."""
     try:
-        student = get_object_or_404(Student, id=student_id)
+        student = get_object_or_404(Student, id=student_id, course=request.course)
         data = json.loads(request.body)
         competencies_data = data.get('competencies', {})
         
-        for competency_id, is_achieved in competencies_data.items():
-            competency = get_object_or_404(Competency, id=int(competency_id))
-            StudentCompetency.objects.update_or_create(
-                student=student,
-                competency=competency,
-                defaults={'is_achieved': is_achieved}
-            )
+        # Guardar todas las competencias en bloque
+        bulk_save_competencies(student, competencies_data)
         
         return JsonResponse({
             'success': True,
@@ -294,12 +632,88 @@ def save_student_competencies(request, student_id):
         return JsonResponse({'success': False, 'error': str(e)}, status=500)
 
 
+# Celdas por petición de la matriz. SQLite admite 999 parámetros por consulta,
+# así que bulk_create inserta de a 199 celdas: 4000 celdas son hasta 21 INSERT.
+GRID_MAX_CELLS = 4000
+
+
+@query_budget(max=6)
+@condition(etag_func=competency_matrix_etag, last_modified_func=students_list_last_modified)
+def competency_matrix(request):
+    """Vista de la matriz estudiante × competencia del curso para calificar en bloque."""
+    def build_context():
+        students = list(Student.objects.filter(course=request.course, is_active=True))
+        competencies = list(Competency.objects.all())
+        achieved = set(
+            StudentCompetency.objects.filter(
+                student__course=request.course, student__is_active=True, is_achieved=True,
+            ).values_list('student_id', 'competency_id')
+        )
+        
+        rows = []
+        for student in students:
+            cells = [(competency.id, (student.id, competency.id) in achieved) for competency in competencies]
+            rows.append({
+                'student': student,
+                'cells': cells,
+                'achieved': sum(1 for _, is_achieved in cells if is_achieved),
+            })
+        
+        return {
+            'rows': rows,
+            'competencies': competencies,
+            'total_students': len(rows),
+            'max_cells': GRID_MAX_CELLS,
+        }
+    
+    return render_cached(request, 'attendance/competency_matrix.html', [ROSTER, COMPETENCIES], build_context)
+
+
+@query_budget(max=25)
+@csrf_exempt
+@require_http_methods(["POST"])
+def save_competency_matrix(request):
+    """
+    API endpoint para guardar en bloque celdas de la matriz de competencias.
+
+    Recibe ``{"cells": {student_id: {competency_id: is_achieved}}}`` con solo
+    las celdas que cambiaron y retorna las competencias logradas por cada
+    estudiante enviado.
+    """
+    try:
+        data = json.loads(request.body)
+        grid = data.get('cells', {})
+        if not isinstance(grid, dict) or not all(isinstance(row, dict) for row in grid.values()):
+            return JsonResponse({'success': False, 'error': 'Datos inválidos'}, status=400)
+        if sum(len(row) for row in grid.values()) > GRID_MAX_CELLS:
+            return JsonResponse({
+                'success': False,
+                'error': f'Se pueden guardar hasta {GRID_MAX_CELLS} celdas por petición',
+            }, status=400)
+        
+        changed, totals = save_competency_grid(request.course, grid)
+        
+        return JsonResponse({
+            'success': True,
+            'message': 'Competencias guardadas correctamente',
+            'changed': changed,
+            'totals': {str(student_id): achieved for student_id, achieved in totals.items()},
+        })
+    except Http404 as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=404)
+    except (json.JSONDecodeError, ValueError):
+        return JsonResponse({'success': False, 'error': 'Datos inválidos'}, status=400)
+    except Exception as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=500)
+
+
+@query_budget(max=2)
 @csrf_exempt
 @require_http_methods(["POST"])
 def update_student_profile(request, student_id):
     """API endpoint para actualizar datos del perfil del estudiante (email, github)."""
     try:
-        student = get_object_or_404(Student, id=student_id)
+        student = get_object_or_404(Student, id=student_id, course=request.course)
         data = json.loads(request.body)
         
         email = data.get('email', '').strip()
@@ -322,11 +736,27 @@ def update_student_profile(request, student_id):
         return JsonResponse({'success': False, 'error': str(e)}, status=500)
 
 
+@query_budget(max=0)
+def cache_stats_view(request):
+    """API endpoint con los aciertos y fallos del caché de páginas."""
+    return JsonResponse(cache_stats())
+
+
+@query_budget(max=0)
+def metrics_view(request):
+    """Métricas de rendimiento por ruta en formato de texto de Prometheus."""
+    return HttpResponse(render_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+@query_budget(max=7)
 def students_manage(request):
-    """Vista para gestionar estudiantes (añadir/retirar)."""
+    """Vista para gestionar estudiantes (añadir/retirar/importar)."""
     if request.method == 'POST':
         action = request.POST.get('action')
         
+        if action == 'import':
+            return students_import(request)
+        
         if action == 'add':
             first_name = request.POST.get('first_name', '').strip()
             last_name = request.POST.get('last_name', '').strip()
@@ -334,35 +764,152 @@ def students_manage(request):
             github_username = request.POST.get('github_username', '').strip() or None
             
             if first_name and last_name:
-                Student.objects.create(
-                    first_name=first_name,
-                    last_name=last_name,
-                    email=email,
-                    github_username=github_username,
-                    is_active=True
-                )
+                with transaction.atomic(using=request.course.db_alias):
+                    student = Student.objects.create(
+                        course=request.course,
+                        first_name=first_name,
+                        last_name=last_name,
+                        email=email,
+                        github_username=github_username,
+                        is_active=True
+                    )
+                    StudentAttendanceSummary.objects.create(student=student)
         
         elif action == 'deactivate':
             student_id = request.POST.get('student_id')
             if student_id:
-                Student.objects.filter(id=student_id).update(is_active=False)
+                Student.objects.filter(id=student_id, course=request.course).update(is_active=False)
+                bump_versions(student_scope(student_id), ROSTER, STUDENTS)
         
         elif action == 'activate':
             student_id = request.POST.get('student_id')
             if student_id:
-                Student.objects.filter(id=student_id).update(is_active=True)
+                Student.objects.filter(id=student_id, course=request.course).update(is_active=True)
+                bump_versions(student_scope(student_id), ROSTER, STUDENTS)
         
         elif action == 'delete':
             student_id = request.POST.get('student_id')
             if student_id:
-                Student.objects.filter(id=student_id).delete()
+                # La señal pre_delete descuenta sus registros de los resúmenes
+                Student.objects.filter(id=student_id, course=request.course).delete()
         
         return redirect('attendance:students_manage')
     
-    active_students = Student.objects.filter(is_active=True)
-    inactive_students = Student.objects.filter(is_active=False)
+    return _render_students_manage(request)
+
+
+def _render_students_manage(request, **extra_context):
+    roster = roster_snapshot(request.course)
     
     return render(request, 'attendance/students_manage.html', {
-        'active_students': active_students,
-        'inactive_students': inactive_students,
+        'active_students': roster.active,
+        'inactive_students': roster.inactive,
+        **extra_context,
     })
+
+
+@query_budget(max=7)
+@require_http_methods(["POST"])
+def students_import(request):
+    """Vista para importar una lista de estudiantes desde un archivo CSV o JSON."""
+    upload = request.FILES.get('roster_file')
+    dry_run = bool(request.POST.get('dry_run'))
+    
+    if not upload:
+        return _render_students_manage(request, import_error='Selecciona un archivo CSV o JSON.')
+    
+    try:
+        rows = parse_roster(upload.read(), upload.name)
+    except ValueError as e:
+        return _render_students_manage(request, import_error=str(e))
+    
+    report = import_roster(rows, request.course, dry_run=dry_run)
+    return _render_students_manage(request, import_report=report, import_dry_run=dry_run)
+
+
+# ========================================
+# Vistas asíncronas (ASGI)
+# ========================================
+# Variantes ``async def`` de las vistas de lectura más usadas; las rutas las
+# usan si ``settings.ATTENDANCE_ASYNC_VIEWS`` está activo (ver urls.py). Las
+# consultas independientes se lanzan juntas con ``asyncio.gather`` y el
+# contexto se materializa antes de renderizar la plantilla.
+
+async def _alist(queryset):
+    return [obj async for obj in queryset]
+
+
+@query_budget(max=5)
+async def index_async(request):
+    """Variante asíncrona de ``index``."""
+    today = date.today()
+    session = await atodays_session(request.course, today)
+    roster, existing_records = await asyncio.gather(
+        sync_to_async(roster_snapshot)(request.course),
+        _alist(session.records.values_list('student_id', 'is_present')),
+    )
+    return render(request, 'attendance/index.html', _index_context(today, session, roster.active, dict(existing_records)))
+
+
+@query_budget(max=3)
+@async_condition(etag_func=history_etag, last_modified_func=history_last_modified)
+async def history_async(request):
+    """Variante asíncrona de ``history``."""
+    date_from, date_to = _history_filters(request)
+    
+    async def build_context():
+        rows = await _alist(_history_queryset(request.course, date_from=date_from, date_to=date_to))
+        sessions_data, next_before = _history_rows(rows)
+        return {
+            'sessions_data': sessions_data,
+            'next_before': next_before,
+            'date_from': date_from,
+            'date_to': date_to,
+        }
+    
+    return await arender_cached(request, 'attendance/history.html', [ROSTER, day_scope(date.today())], build_context)
+
+
+@query_budget(max=4)
+@async_condition(etag_func=session_etag, last_modified_func=session_last_modified)
+async def session_detail_async(request, session_id):
+    """Variante asíncrona de ``session_detail``."""
+    session, records = await asyncio.gather(
+        aget_object_or_404(AttendanceSession.objects.with_attendance_summary(), id=session_id, course=request.course),
+        _alist(_session_records(session_id)),
+    )
+    return render(request, 'attendance/session_detail.html', _session_detail_context(session, records))
+
+
+@query_budget(max=5)
+@async_condition(etag_func=students_list_etag, last_modified_func=students_list_last_modified)
+async def students_list_async(request):
+    """Variante asíncrona de ``students_list``."""
+    async def build_context():
+        students, total_competencies = await asyncio.gather(
+            _alist(_active_students_with_stats(request.course)),
+            Competency.objects.acount(),
+        )
+        return _students_list_context(students, total_competencies)
+    
+    return await arender_cached(request, 'attendance/students_list.html', [ROSTER, COMPETENCIES], build_context)
+
+
+@query_budget(max=6)
+@async_condition(etag_func=student_etag, last_modified_func=student_last_modified)
+async def student_detail_async(request, student_id):
+    """Variante asíncrona de ``student_detail``."""
+    async def build_context():
+        student, competencies, student_competencies = await asyncio.gather(
+            aget_object_or_404(
+                Student.objects.with_attendance_summary().with_competency_stats(), id=student_id, course=request.course
+            ),
+            _alist(Competency.objects.all()),
+            _alist(StudentCompetency.objects.filter(student_id=student_id)),
+        )
+        return _student_detail_context(student, competencies, student_competencies)
+    
+    return await arender_cached(
+        request, 'attendance/student_detail.html',
+        [student_scope(student_id), COMPETENCIES], build_context
+    )